@@ -0,0 +1,102 @@
+"""
+Compare mapping ARNs to their delete procedures and resource IDs by re-splitting the ARN
+string at every step (as b3d did before ARNs were parsed once) against parsing each ARN
+once into an Arn and dispatching through the memoized (service, type) lookup. Run with:
+
+    python benchmarks/arn_mapping.py
+"""
+import itertools
+import time
+from b3d import b3d_, dispatch
+from b3d.utils import arn as arn_
+
+
+ARNS = 1_000_000
+REPEAT = 3
+TEMPLATES = [
+    "arn:aws:ec2:us-east-1:123456789012:instance/i-{:017x}",
+    "arn:aws:ec2:us-east-1:123456789012:volume/vol-{:017x}",
+    "arn:aws:ec2:us-east-1:123456789012:security-group/sg-{:017x}",
+    "arn:aws:s3:::b3d-benchmark-{}",
+    "arn:aws:lambda:us-east-1:123456789012:function:b3d-benchmark-{}",
+    "arn:aws:kms:us-east-1:123456789012:key/{:032x}",
+    "arn:aws:ssm:us-east-1:123456789012:parameter/b3d-benchmark-{}",
+    "arn:aws:apigateway:us-east-1::/restapis/{:010x}",
+    "arn:aws:apigateway:us-east-1::/restapis/{:010x}/stages/test",
+    "arn:aws:iam::123456789012:role/b3d-benchmark-{}",
+    "arn:aws:sns:us-east-1:123456789012:b3d-benchmark-{}",
+]
+
+
+def _legacy_parse_arn(arn: str):
+    splt = arn.split(":")
+    if splt[2] == "apigateway":
+        resource_path = splt[-1].split("/")
+        if len(resource_path) > 3 and resource_path[3] == "stages":
+            return "apigateway", "stages"
+        return "apigateway", resource_path[1]
+    if splt[2] == "s3":
+        return "s3", "bucket"
+    if splt[2] == "lambda":
+        return "lambda", splt[-2]
+    return splt[2], splt[5].split("/")[0]
+
+
+def _legacy_map_arn(arn: str):
+    parsed_arn = _legacy_parse_arn(arn)
+    try:
+        return b3d_.DELETE_PROTOCOL_OBJECT_MAP[parsed_arn[0]][parsed_arn[1]]
+    except KeyError:
+        return b3d_.DELETE_PROTOCOL_OBJECT_MAP["unsupported-service"]["unsupported-resource"]
+
+
+def _legacy_resource_id(arn: str) -> str:
+    # S3.Bucket and Lambda.Function used to override extract_resource_id_from_arn
+    if arn.split(":")[2] in ["s3", "lambda"]:
+        return arn.split(":")[-1]
+    return arn.split("/")[-1]
+
+
+def run_legacy(arns):
+    """
+    Parse each ARN for the type filter and again for dispatch, then split it once more for
+    each of the delete procedure's query and destroy steps
+    """
+
+    for arn in arns:
+        _legacy_parse_arn(arn)
+        _legacy_map_arn(arn)
+        _legacy_resource_id(arn)
+        _legacy_resource_id(arn)
+
+
+def run_parse_once(arns):
+    """
+    Parse each ARN once and share the result between the type filter, the dispatch and the
+    delete procedure's query and destroy steps
+    """
+
+    for parsed_arn, _ in dispatch.map_arns(arn_.parse(arn) for arn in arns):
+        _ = (parsed_arn.service, parsed_arn.resource_type)
+        _ = parsed_arn.resource_id
+        _ = parsed_arn.resource_id
+
+
+def main():
+    """
+    Time both approaches over the same ARNs and print a summary
+    """
+
+    arns = [t.format(i) for i, t in zip(range(ARNS), itertools.cycle(TEMPLATES))]
+
+    for name, run in [("re-split", run_legacy), ("parse-once", run_parse_once)]:
+        elapsed = []
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            run(arns)
+            elapsed.append(time.perf_counter() - start)
+        print(f"{name:>10}: {min(elapsed):.2f}s for {ARNS} ARNs (best of {REPEAT})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Measure how long it takes a fresh interpreter to import b3d and look up a delete procedure,
+with the lazy delete-module registry and with the eager filesystem scan it replaced. Each case
+runs in its own subprocess, so every import is cold. Run with:
+
+    python benchmarks/import_time.py
+"""
+import subprocess
+import sys
+
+
+RUNS = 10
+
+CASES = [
+    ("import b3d (lazy registry)", "import b3d"),
+    (
+        "import b3d + scan every delete module (eager)",
+        "import b3d; b3d.utils.build_resource_map('b3d.delete')"
+    ),
+    (
+        "import b3d + look up S3 bucket (lazy registry)",
+        "import b3d; b3d.dispatch.map_arn('arn:aws:s3:::b3d-benchmark')"
+    ),
+]
+
+TIMER = """
+import time
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+"""
+
+
+def _time(statement: str) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", TIMER.format(statement=statement)], check=True, capture_output=True, text=True
+    )
+    return float(out.stdout)
+
+
+def main():
+    """
+    Time each case in fresh interpreters and print the best run of each
+    """
+
+    for name, statement in CASES:
+        best = min(_time(statement) for _ in range(RUNS))
+        print(f"{name:>48}: {best * 1000:.1f}ms (best of {RUNS})")
+
+
+if __name__ == "__main__":
+    main()
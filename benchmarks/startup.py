@@ -0,0 +1,79 @@
+"""
+Measure the cold-start cost of a short-lived teardown process: how long it takes to import b3d,
+to make the first (discovery) API call, and to make the first delete-phase API call against each
+supported service after DISCOVERY_LATENCY seconds of discovery, with and without b3d.prewarm().
+
+Each case runs in a fresh interpreter. API calls are answered by botocore's Stubber, so no
+credentials or network access are needed and only client-side costs are measured. Run with:
+
+    python benchmarks/startup.py
+"""
+import subprocess
+import sys
+
+
+RUNS = 5
+DISCOVERY_LATENCY = 1.0
+
+SCRIPT = """
+import time
+start = time.perf_counter()
+
+import b3d
+imported = time.perf_counter()
+
+if {prewarm}:
+    b3d.prewarm()
+
+from botocore.stub import Stubber
+
+
+def call(service, operation):
+    cl = b3d.Engine().client(service, "us-east-1")
+    with Stubber(cl) as stubber:
+        stubber.add_response(operation, {{}})
+        getattr(cl, operation)()
+
+
+call("resourcegroupstaggingapi", "get_resources")
+first_call = time.perf_counter()
+
+# Stand-in for discovery, which mostly waits on the network
+time.sleep({latency})
+
+deletes = time.perf_counter()
+for service, operation in [
+    ("apigateway", "get_rest_apis"), ("ec2", "describe_instances"), ("iam", "get_account_summary"),
+    ("kms", "list_keys"), ("lambda", "list_functions"), ("s3", "list_buckets"), ("ssm", "describe_parameters")
+]:
+    call(service, operation)
+end = time.perf_counter()
+
+print(imported - start, first_call - start, end - deletes)
+"""
+
+
+def _run(prewarm: bool):
+    out = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(prewarm=prewarm, latency=DISCOVERY_LATENCY)],
+        check=True, capture_output=True, text=True
+    )
+    return [float(t) for t in out.stdout.split()]
+
+
+def main():
+    """
+    Run each case in fresh interpreters and print the best run of each measurement
+    """
+
+    for prewarm in [False, True]:
+        runs = [_run(prewarm) for _ in range(RUNS)]
+        import_time, first_call, first_deletes = (min(ts) * 1000 for ts in zip(*runs))
+        print(
+            f"prewarm={prewarm!s:<5}  import b3d: {import_time:.1f}ms  first API call: {first_call:.1f}ms  "
+            f"first call to each delete service: {first_deletes:.1f}ms (best of {RUNS})"
+        )
+
+
+if __name__ == "__main__":
+    main()
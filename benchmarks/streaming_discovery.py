@@ -0,0 +1,91 @@
+"""
+Compare time-to-first-delete and peak memory of batch and streaming discovery.
+
+Discovery sources are simulated in-process: a paginated tagging source that takes
+PAGE_LATENCY seconds per page of PAGE_SIZE resources, and an IAM scan that takes
+IAM_LATENCY seconds. Each delete takes DELETE_LATENCY seconds. Run with:
+
+    python benchmarks/streaming_discovery.py
+"""
+import time
+import tracemalloc
+from b3d import b3d_
+
+
+PAGES = 50
+PAGE_SIZE = 100
+PAGE_LATENCY = 0.02
+IAM_LATENCY = 1.0
+DELETE_LATENCY = 0.0005
+
+
+def _tagging_source():
+    for page in range(PAGES):
+        time.sleep(PAGE_LATENCY)
+        # Mimic a GetResources page, whose tag mappings are much larger than the ARNs themselves
+        mappings = [
+            {
+                "ResourceARN": f"arn:aws:ec2:us-east-1:123456789012:volume/vol-{page:04d}{i:013d}",
+                "Tags": [{"Key": "Name", "Value": "B3DTEST_benchmark"}, {"Key": "Team", "Value": "x" * 64}]
+            }
+            for i in range(PAGE_SIZE)
+        ]
+        for mapping in mappings:
+            yield mapping["ResourceARN"]
+
+
+def _iam_source():
+    time.sleep(IAM_LATENCY)
+    return [f"arn:aws:iam::123456789012:role/b3d-benchmark-{i}" for i in range(100)]
+
+
+SOURCES = [("resourcegroupstaggingapi", _tagging_source), ("iam", _iam_source)]
+
+
+def _delete(_arn: str):
+    time.sleep(DELETE_LATENCY)
+
+
+def run_batch():
+    """
+    Materialize every source before the first delete, as delete_resources does by default
+    """
+
+    start = time.perf_counter()
+    first_delete = None
+    arns, _ = b3d_._run_discovery_sources(SOURCES)
+    for arn in arns:
+        _delete(arn)
+        first_delete = first_delete or time.perf_counter() - start
+    return first_delete, time.perf_counter() - start
+
+
+def run_stream():
+    """
+    Delete ARNs as the sources produce them, as delete_resources(stream=True) does
+    """
+
+    start = time.perf_counter()
+    first_delete = None
+    for arn, _ in b3d_._stream_discovery_sources(SOURCES):
+        _delete(arn)
+        first_delete = first_delete or time.perf_counter() - start
+    return first_delete, time.perf_counter() - start
+
+
+def main():
+    """
+    Run both modes and print a summary
+    """
+
+    print(f"{'mode':<8}{'first delete (s)':>18}{'total (s)':>12}{'peak memory (KiB)':>20}")
+    for name, run in [("batch", run_batch), ("stream", run_stream)]:
+        tracemalloc.start()
+        first_delete, total = run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:<8}{first_delete:>18.3f}{total:>12.3f}{peak / 1024:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,24 @@
 """Gives users direct access to method."""
-from b3d.b3d_ import delete_resources
+from importlib import import_module
+from b3d.b3d_ import (
+    delete_resources, delete_resources_batch, delete_resources_matching, delete_resources_multi_region,
+    prewarm, record_resources
+)
+from b3d.aws.rate_limit import Limit, RateLimiter
+from b3d.engine import Engine, default_engine
+from b3d.inventory import Inventory
+from b3d.utils.client_config import ClientConfig
+from b3d.utils.s3_options import S3Options
+from b3d.utils.registry import register
+
+# Names whose modules are only imported the first time they are accessed, since they pull in heavy
+# standard library modules (e.g. asyncio) that most callers never need
+_LAZY_ATTRIBUTES = {
+    "delete_resources_async": "b3d.aio"
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(import_module(_LAZY_ATTRIBUTES[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
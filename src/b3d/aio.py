@@ -0,0 +1,240 @@
+"""
+asyncio API for deleting collections of AWS resources. boto3 calls are blocking, so they are run on
+a thread pool owned by each call, while waiting (e.g. for instances to terminate) happens on the
+event loop.
+"""
+from __future__ import annotations
+import asyncio
+import collections
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from types import ModuleType
+from typing import AsyncIterator, Callable, List, Optional, Sequence, Tuple
+from b3d import aws, b3d_
+from b3d.dispatch import TypeFilter, destroy_groups, group_by_type, map_arns, unsupported_summary
+from b3d.engine import Engine, resolve as resolve_engine
+from b3d.utils import log_msg
+from b3d.utils.arn import Arn
+from b3d.utils.lazy import lazy_import
+from b3d.utils.s3_options import S3Options
+
+boto3 = lazy_import("boto3")
+
+
+# Default number of groups of resources that delete_resources_async destroys at once
+DEFAULT_MAX_CONCURRENCY = 8
+# Marks the end of a single task's output on the shared queue
+_DONE = object()
+
+
+class AsyncHelpers:
+    """
+    Awaitable variants of the functions of a helper module (e.g. b3d.aws.ec2), which run on
+    <executor> (the event loop's default executor if None), e.g.
+    await AsyncHelpers(aws.ec2).get_instance(cl, instance_id)
+    """
+
+    def __init__(self, module: ModuleType, executor: Optional[Executor] = None):
+        self._module = module
+        self._executor = executor
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._module, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(attr, *args, **kwargs)
+            )
+        return call
+
+
+async def wait_for_instances_terminated(
+        cl: boto3.client,
+        instance_ids: List[str],
+        executor: Optional[Executor] = None,
+        poll_interval: float = aws.ec2.TERMINATED_POLL_INTERVAL,
+        max_polls: int = aws.ec2.TERMINATED_MAX_POLLS
+) -> AsyncIterator[Tuple[str, bool]]:
+    """
+    Awaitable variant of aws.ec2.wait_for_instances_terminated, which waits between polls with
+    asyncio.sleep rather than blocking a thread
+    """
+
+    ec2 = AsyncHelpers(aws.ec2, executor)
+    pending = set(instance_ids)
+    for poll in range(max_polls):
+        if poll > 0:
+            await asyncio.sleep(poll_interval)
+
+        for instance_id in await ec2.terminated_instance_ids(cl, sorted(pending)):
+            pending.discard(instance_id)
+            yield instance_id, True
+
+        if not pending:
+            return
+
+    for instance_id in sorted(pending):
+        yield instance_id, False
+
+
+class _Sweep:
+    """
+    State shared by the tasks of a single delete_resources_async call: each task puts (None, (<arn>,
+    <report>)) entries on a queue, or an (<exception>, None) entry if it fails, followed by _DONE
+    once it finishes
+    """
+
+    def __init__(
+            self, region: str, dry: bool, engine: Engine, max_concurrency: int, timeout: Optional[float]
+    ):
+        self.region = region
+        self.dry = dry
+        self.engine = engine
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.reports = asyncio.Queue()
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """
+        Run a blocking function on the executor, once one of the concurrency slots is free
+        """
+
+        async with self.semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, functools.partial(fn, *args, **kwargs)
+            )
+
+    async def destroy(self, arns: List[Arn], obj, after: Sequence[asyncio.Future] = ()):
+        """
+        Destroy a group of resources of the same type with its delete object's destroy_many, once every
+        task in <after> has finished, cancelling the destroy if it takes more than <timeout> seconds
+        """
+
+        try:
+            if len(after) > 0:
+                await asyncio.wait(after)
+            try:
+                pairs = await asyncio.wait_for(
+                    self.run(lambda: list(obj.destroy_many(arns, self.region, self.dry, engine=self.engine))),
+                    self.timeout
+                )
+            except asyncio.TimeoutError:
+                pairs = [(arn, [log_msg.log_msg_timeout(str(arn), self.timeout)]) for arn in arns]
+            for pair in pairs:
+                await self.reports.put((None, pair))
+        except Exception as e:  # pylint: disable=broad-except
+            await self.reports.put((e, None))
+        finally:
+            await self.reports.put(_DONE)
+
+    async def destroy_instances(self, arns: List[Arn], instance_procedure):
+        """
+        Destroy a batch of EC2 instances (see EC2.Instance.destroy_many), waiting on all of them at
+        once for up to <timeout> seconds
+        """
+
+        try:
+            cl = self.engine.client("ec2", self.region)
+            finished, terminating = await self.run(instance_procedure.begin_termination, cl, arns, self.dry)
+            for pair in finished:
+                await self.reports.put((None, pair))
+
+            async def _wait():
+                async for instance_id, terminated in wait_for_instances_terminated(
+                    cl, list(terminating), self.executor
+                ):
+                    pair = instance_procedure.termination_report(terminating.pop(instance_id), terminated)
+                    await self.reports.put((None, pair))
+
+            try:
+                await asyncio.wait_for(_wait(), self.timeout)
+            except asyncio.TimeoutError:
+                for instance_id in sorted(terminating):
+                    pair = instance_procedure.termination_report(terminating[instance_id], False, self.timeout)
+                    await self.reports.put((None, pair))
+        except Exception as e:  # pylint: disable=broad-except
+            await self.reports.put((e, None))
+        finally:
+            await self.reports.put(_DONE)
+
+
+async def delete_resources_async(
+        tag_key: str,
+        tag_value: str,
+        region: str = "us-east-1",
+        dry=True,
+        iam_cache: bool = False,
+        resource_types: Optional[List[str]] = None,
+        exclude_resource_types: Optional[List[str]] = None,
+        engine: Optional[Engine] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        timeout: Optional[float] = None,
+        s3_options: Optional[S3Options] = None
+) -> AsyncIterator[list]:
+    """
+    Delete all resources with some (<tag_key>, <tag_value>) tag pair, given some region, yielding the
+    same reports as delete_resources as each resource is destroyed. Up to <max_concurrency> groups of
+    resources (see dispatch.destroy_groups) are destroyed at once, on a thread pool owned by this call;
+    the destroy of a group may make several API calls in turn. EC2 instances are waited on with
+    asyncio.sleep. If <timeout> is given, the destroy of each group of resources destroyed together
+    (see dispatch.destroy_groups) is cancelled after that many seconds and reported as a failure for
+    each of them; the blocking call that was running keeps going on its thread, but nothing further
+    is started for it. Closing or cancelling the iteration cancels every pending destroy. S3 buckets
+    are emptied and deleted with the settings of <s3_options>, as in delete_resources.
+    """
+
+    engine = resolve_engine(engine)
+    sweep = _Sweep(region, dry, engine, max_concurrency, timeout)
+    type_filter = TypeFilter(resource_types, exclude_resource_types)
+    instance_procedure = b3d_.DELETE_PROTOCOL_OBJECT_MAP["ec2"]["instance"]
+    held_back_procedures = {
+        b3d_.DELETE_PROTOCOL_OBJECT_MAP["ec2"]["security-group"], b3d_.DELETE_PROTOCOL_OBJECT_MAP["ec2"]["volume"]
+    }
+    tasks = []
+
+    try:
+        resource_arns, discovery_failures = await sweep.run(
+            b3d_.get_all_resources_with_tag, tag_key, tag_value, region, iam_cache, type_filter, engine
+        )
+        for failure in discovery_failures:
+            yield [failure]
+
+        # Resources of the same type are destroyed together (see dispatch.destroy_groups), and instances
+        # are started first, so that waiting on them overlaps the other destroys. Security groups and
+        # volumes can't be deleted while an instance still uses them, so they wait for every instance.
+        unsupported = collections.Counter()
+        groups = destroy_groups(group_by_type(map_arns(resource_arns, s3_options), instance_procedure), unsupported)
+        instance_tasks = []
+        for obj, arns in groups:
+            if obj is instance_procedure:
+                instance_tasks.append(asyncio.ensure_future(sweep.destroy_instances(arns, obj)))
+                tasks.append(instance_tasks[-1])
+            elif obj in held_back_procedures:
+                tasks.append(asyncio.ensure_future(sweep.destroy(arns, obj, list(instance_tasks))))
+            else:
+                tasks.append(asyncio.ensure_future(sweep.destroy(arns, obj)))
+
+        remaining = len(tasks)
+        while remaining > 0:
+            entry = await sweep.reports.get()
+            if entry is _DONE:
+                remaining -= 1
+                continue
+            err, pair = entry
+            if err is not None:
+                raise err
+            _, report = pair
+            # Some reports are empty (e.g. KMS keys that have already been scheduled for deletion)
+            if len(report) > 0:
+                yield report
+
+        for report in unsupported_summary(unsupported):
+            yield report
+    finally:
+        for task in tasks:
+            task.cancel()
+        sweep.executor.shutdown(wait=False)
@@ -1,2 +1,2 @@
 """ AWS service helper functions module """
-from b3d.aws import api_gateway, ec2, iam, kms, lambda_, resource_groups_tagging, s3, ssm
+from b3d.aws import api_gateway, ec2, iam, kms, lambda_, rate_limit, resource_groups_tagging, retry, s3, ssm
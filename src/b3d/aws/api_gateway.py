@@ -1,9 +1,12 @@
 """
 ApiGateway helper functions
 """
-import boto3
-import b3q
+from __future__ import annotations
 from b3d.aws import helpers
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
+b3q = lazy_import("b3q")
 
 
 def get_rest_api(cl: boto3.client, api_id: str):
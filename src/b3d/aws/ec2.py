@@ -1,9 +1,24 @@
 """
 EC2 helper functions
 """
-import boto3
-import b3q
+from __future__ import annotations
+import time
+from typing import Iterator, List, Dict, Tuple
 from b3d.aws import helpers
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
+b3q = lazy_import("b3q")
+
+
+# Maximum number of values sent in a single describe_* filter
+FILTER_MAX_VALUES = 200
+# Maximum number of instance IDs in a single terminate_instances call
+TERMINATE_MAX_INSTANCES = 1000
+# Seconds between polls of instances that are being terminated, and the number of polls made before
+# giving up on them (the same as the instance_terminated waiter)
+TERMINATED_POLL_INTERVAL = 15
+TERMINATED_MAX_POLLS = 40
 
 
 @helpers.attempt_api_call_multiple_times
@@ -25,6 +40,78 @@ def delete_instance(cl: boto3.client, instance_id: str, dry: bool):
     return resp
 
 
+@helpers.attempt_api_call_multiple_times
+def terminate_instances(cl: boto3.client, instance_ids: List[str], dry: bool):
+    """
+    Terminate up to TERMINATE_MAX_INSTANCES instances in a single call, without waiting for them
+    """
+
+    if dry:
+        return helpers.dry_run_success_resp()
+
+    return helpers.make_call_catch_err(
+        cl.terminate_instances, InstanceIds=instance_ids
+    )
+
+
+def terminated_instance_ids(cl: boto3.client, instance_ids: List[str]) -> List[str]:
+    """
+    Return those of some instances that are terminated (or no longer exist), in the order given. If
+    they can't be described, none of them are returned, so a failed poll is made again like one that
+    found nothing terminated.
+    """
+
+    resp = describe_instances_by_ids(cl, instance_ids)
+    if resp["ResponseMetadata"]["HTTPStatusCode"] != 200:
+        return []
+
+    states = {instance["InstanceId"]: instance["State"]["Name"] for instance in resp["Instances"]}
+    return [instance_id for instance_id in instance_ids if states.get(instance_id, "terminated") == "terminated"]
+
+
+def wait_for_instances_terminated(
+        cl: boto3.client,
+        instance_ids: List[str],
+        poll_interval: float = TERMINATED_POLL_INTERVAL,
+        max_polls: int = TERMINATED_MAX_POLLS
+) -> Iterator[Tuple[str, bool]]:
+    """
+    Poll some instances with describe_instances until all of them are terminated, yielding
+    (<instance_id>, True) for each instance as soon as it is terminated (or no longer exists).
+    Instances still not terminated after <max_polls> polls are yielded as (<instance_id>, False).
+    """
+
+    pending = set(instance_ids)
+    for poll in range(max_polls):
+        if poll > 0:
+            time.sleep(poll_interval)
+
+        for instance_id in terminated_instance_ids(cl, sorted(pending)):
+            pending.discard(instance_id)
+            yield instance_id, True
+
+        if len(pending) == 0:
+            return
+
+    for instance_id in sorted(pending):
+        yield instance_id, False
+
+
+def instance_not_terminated_resp(instance_id: str, waited: float) -> Dict:
+    """
+    Produce a failure response for an instance that was still not terminated after waiting for it
+    """
+    return {
+        "ResponseMetadata": {
+            "HTTPStatusCode": 408
+        },
+        "Error": {
+            "Code": "InstanceNotTerminated",
+            "Message": f"Instance {instance_id} was not terminated after {waited:.0f} seconds"
+        }
+    }
+
+
 def get_instance(cl: boto3.client, instance_id: str):
     """
     Describe an instance, if it exists
@@ -191,3 +278,59 @@ def get_all_instances_with_security_group_id(cl: boto3.client, security_group_id
             )
 
     return ret
+
+
+def get_enabled_regions(cl: boto3.client):
+    """
+    Return the names of all regions that are enabled for this account. Raises the ClientError of
+    a failed call, since no regions is not a usable answer.
+    """
+
+    return [r["RegionName"] for r in cl.describe_regions(AllRegions=False).get("Regions", [])]
+
+
+@helpers.attempt_api_call_multiple_times
+def _describe_instances_page(cl: boto3.client, **kwargs) -> Dict:
+    """
+    Describe a single page of instances
+    """
+
+    return helpers.make_call_catch_err(
+        cl.describe_instances, **kwargs
+    )
+
+
+def describe_instances_by_ids(cl: boto3.client, instance_ids: List[str]) -> Dict:
+    """
+    Describe some instances, skipping any that no longer exist. Returns a response listing all of
+    them under its "Instances" key, or the response of the first page that could not be described.
+    """
+
+    ret = []
+    for i in range(0, len(instance_ids), FILTER_MAX_VALUES):
+        kwargs = {"Filters": [{"Name": "instance-id", "Values": instance_ids[i:i + FILTER_MAX_VALUES]}]}
+        while True:
+            resp = _describe_instances_page(cl, **kwargs)
+            if resp["ResponseMetadata"]["HTTPStatusCode"] != 200:
+                return resp
+            ret.extend(instance for r in resp.get("Reservations", []) for instance in r.get("Instances", []))
+            if not resp.get("NextToken"):
+                break
+            kwargs["NextToken"] = resp["NextToken"]
+
+    return {"Instances": ret, "ResponseMetadata": {"HTTPStatusCode": 200}}
+
+
+def describe_volumes_by_ids(cl: boto3.client, volume_ids: List[str]) -> List[Dict]:
+    """
+    Describe some volumes, skipping any that no longer exist
+    """
+
+    ret = []
+    paginator = cl.get_paginator("describe_volumes")
+    for i in range(0, len(volume_ids), FILTER_MAX_VALUES):
+        for page in paginator.paginate(
+            Filters=[{"Name": "volume-id", "Values": volume_ids[i:i + FILTER_MAX_VALUES]}]
+        ):
+            ret.extend(page.get("Volumes", []))
+    return ret
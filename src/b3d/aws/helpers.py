@@ -1,9 +1,13 @@
 """
 Helper functions for this module
 """
-import time
-from botocore.exceptions import ClientError
-import boto3
+from __future__ import annotations
+from typing import Iterable
+from b3d.aws import retry
+from b3d.utils.lazy import lazy_import
+
+botocore_exceptions = lazy_import("botocore.exceptions")
+boto3 = lazy_import("boto3")
 
 
 def make_call_catch_err(fn: callable, **kwargs):
@@ -13,10 +17,35 @@ def make_call_catch_err(fn: callable, **kwargs):
 
     try:
         return fn(**kwargs)
-    except ClientError as ce:
+    except botocore_exceptions.ClientError as ce:
         return ce.response
 
 
+def load_service_models(services: Iterable[str], session: boto3.Session):
+    """
+    Load everything that creating (and paginating with) a client of each of some services needs
+    into a boto3 session, which caches it for every client created from it later. Services whose
+    models can't be loaded are skipped.
+    """
+
+    session = session._session  # pylint: disable=protected-access
+    loader = session.get_component("data_loader")
+
+    # Resolving credentials and endpoints happens once per session, when its first client is created
+    session.get_credentials()
+    session.get_component("endpoint_resolver")
+    loader.load_data("partitions")
+    loader.load_data("_retry")
+    for service in services:
+        try:
+            # Called with the same arguments as botocore's client creator, so that it hits the loader's cache
+            model = loader.load_service_model(service, "service-2", api_version=None)
+            loader.load_service_model(service, "endpoint-rule-set-1", api_version=None)
+            loader.load_service_model(service, "paginators-1", model["metadata"]["apiVersion"])
+        except Exception:  # pylint: disable=broad-except
+            continue
+
+
 def wait_on_condition(cl: boto3.client, condition: str, **kwargs):
     """
     Instantiate and run a waiter object
@@ -31,24 +60,12 @@ def attempt_api_call_multiple_times(func):
     Sometimes the AWS API needs time to catch up when doing multiple
     delete / detach calls in sequence. This function can be added as
     a decorator for any API call that returns a ["ResponseMetadata"]["HTTPStatusCode"]
-    key path in its response dictionary.
+    key path in its response dictionary. Failed calls are retried according to the
+    default retry policy, depending on their error codes (see retry.RetryPolicy).
     """
 
     def wrap(*args, **kwargs):
-
-        resp = {}
-        attempts = 0
-
-        while attempts < 3:
-
-            resp = func(*args, **kwargs)
-            if resp["ResponseMetadata"]["HTTPStatusCode"] in [200, 202, 204]:
-                return resp
-
-            attempts += 1
-            time.sleep(10)
-
-        return resp
+        return retry.call_with_retries(lambda: func(*args, **kwargs))
     return wrap
 
 
@@ -1,10 +1,22 @@
 """
 IAM helper functions
 """
+from __future__ import annotations
 from typing import List, Dict, Tuple
-import boto3
-import b3q
+from concurrent.futures import ThreadPoolExecutor
 from b3d.aws import helpers
+from b3d.utils.cache import TagIndexCache
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
+
+
+# Upper bound on concurrent list_policy_tags calls made while building a tag index
+POLICY_TAGS_MAX_WORKERS = 4
+# IAM is global, so calls that opt in with iam_cache=True share a single tag index in this process.
+# Its TTL (in seconds) can be changed via TAG_INDEX_CACHE.ttl, and TAG_INDEX_CACHE.clear() forces a
+# rebuild. Entities created after the index was built are only seen once it has expired.
+TAG_INDEX_CACHE = TagIndexCache(ttl=300.0)
 
 
 @helpers.attempt_api_call_multiple_times
@@ -30,49 +42,26 @@ def get_policy(cl: boto3.client, policy_arn: str) -> dict:
     return None if resp["ResponseMetadata"]["HTTPStatusCode"] != 200 else resp
 
 
-def get_all_policies(cl: boto3.client, scope: str = "Local", prefix: str = "/"):
-    """
-    Get all policies in some region
-    """
-    return list(b3q.get(
-        cl.list_policies, attribute="Policies", arguments={"PathPrefix": prefix, "Scope": scope}
-    ))
-
-
-def policy_has_tags(cl: boto3.client, policy_arn: str, tags: List[Tuple]) -> bool:
+def get_all_policy_arns_with_tags(cl: boto3.client, tags: List[Tuple], index: Dict = None) -> List[str]:
     """
-    Determine whether a policy is associated with any in some list of tag pairs
+    Get all policies associated with this AWS account that at least one tag from <tags>
+    is attached to
     """
 
-    policy_data = get_policy(cl, policy_arn)
-    if policy_data is None:
-        return False
-
-    for tag_key, tag_value in tags:
-        for t in policy_data["Policy"].get("Tags", []):
+    if index is None:
+        index = build_tag_index(cl, entity_types=("LocalManagedPolicy",))
+    return arns_with_tags(index["policy"], tags)
 
-            if t["Key"] == tag_key and t["Value"] == tag_value:
-                return True
 
-    return False
-
-
-def get_all_policy_arns_with_tags(cl: boto3.client, tags: List[Tuple]) -> List[str]:
+def list_policy_tags(cl: boto3.client, policy_arn: str) -> List[Dict]:
     """
-    Get all policies associated with this AWS account that at least one tag from <tags>
-    is attached to
+    List all tags attached to a policy
     """
 
-    ret = []
-    all_policies = get_all_policies(cl)
-    for p in all_policies:
-
-        policy_arn = p.get("Arn", None)
-        if policy_arn is not None:
-            if policy_has_tags(cl, policy_arn, tags):
-                ret.append(policy_arn)
-
-    return ret
+    resp = helpers.make_call_catch_err(
+        cl.list_policy_tags, PolicyArn=policy_arn
+    )
+    return [] if resp["ResponseMetadata"]["HTTPStatusCode"] != 200 else resp.get("Tags", [])
 
 
 def list_entities_policy_attached(cl: boto3.client, policy_arn: str) -> dict:
@@ -172,15 +161,6 @@ def get_role(cl: boto3.client, role_name: str) -> dict:
     return None if resp["ResponseMetadata"]["HTTPStatusCode"] != 200 else resp
 
 
-def get_all_roles(cl: boto3.client, prefix: str = "/") -> List[Dict]:
-    """
-    List all roles associated with this AWS account
-    """
-    return list(b3q.get(
-        cl.list_roles, attribute="Roles", arguments={"PathPrefix": prefix}
-    ))
-
-
 def role_has_permissions_boundary(cl: boto3.client, role_name: str) -> bool:
     """
     Determine whether a role has a permissions boundary
@@ -213,41 +193,14 @@ def list_attached_role_policies(cl: boto3.client, role_name: str):
     )
 
 
-def role_has_tags(cl: boto3.client, role_name: str, tags: List[Tuple]) -> bool:
-    """
-    Determine whether any in some list of tag key / value pairs is associated with
-    some role
-    """
-
-    role_data = get_role(cl, role_name)
-    if role_data is None:
-        return False
-
-    for tag_key, tag_value in tags:
-        for t in role_data["Role"].get("Tags", []):
-
-            # For Role resources, tag key is always a single string (not a list)
-            if t["Key"] == tag_key and t["Value"] == tag_value:
-                return True
-
-    return False
-
-
-def get_all_role_arns_with_tags(cl: boto3.client, tags: List[Tuple]) -> List[str]:
+def get_all_role_arns_with_tags(cl: boto3.client, tags: List[Tuple], index: Dict = None) -> List[str]:
     """
     Return the ARNs of all roles that have at least one tag from the tags list
     """
 
-    ret = []
-    all_roles = get_all_roles(cl)
-    for r in all_roles:
-
-        role_name = r.get("RoleName", None)
-        if role_name is not None:
-            if role_has_tags(cl, role_name, tags):
-                ret.append(r.get("Arn"))
-
-    return ret
+    if index is None:
+        index = build_tag_index(cl, entity_types=("Role",))
+    return arns_with_tags(index["role"], tags)
 
 
 @helpers.attempt_api_call_multiple_times
@@ -319,15 +272,6 @@ def get_user_access_keys(cl: boto3.client, user_name: str) -> List[Dict]:
     return [] if resp["ResponseMetadata"]["HTTPStatusCode"] != 200 else resp.get("AccessKeyMetadata", [])
 
 
-def get_all_users(cl: boto3.client) -> List[Dict]:
-    """
-    List all users for this AWS account
-    """
-    return list(b3q.get(
-        cl.list_users, attribute="Users"
-    ))
-
-
 @helpers.attempt_api_call_multiple_times
 def delete_user(cl: boto3.client, user_name: str, dry: bool) -> dict:
     """
@@ -450,52 +394,128 @@ def delete_user_permissions_boundary(cl: boto3.client, user_name: str, dry: bool
     )
 
 
-def user_has_tags(cl: boto3.client, user_name: str, tags: List[Tuple]) -> bool:
+def get_all_user_arns_with_tags(cl: boto3.client, tags: List[Tuple], index: Dict = None) -> List[str]:
     """
-    Determine whether any in some list of tag key / value pairs is associated with
-    some user profile
+    Return the ARNs of all users that have at least one tag from the tags list
     """
 
-    user_data = get_user(cl, user_name)
-    if user_data is None:
-        return False
+    if index is None:
+        index = build_tag_index(cl, entity_types=("User",))
+    return arns_with_tags(index["user"], tags)
 
-    for tag_key, tag_value in tags:
-        for t in user_data["User"].get("Tags", []):
 
-            # For User resources, tag key is always a single string (not a list)
-            if t["Key"] == tag_key and t["Value"] == tag_value:
-                return True
+@helpers.attempt_api_call_multiple_times
+def detach_policy_from_group(cl: boto3.client, group_name: str, policy_arn: str, dry: bool):
+    """
+    Detach a policy from a group
+    """
 
-    return False
+    if dry:
+        return helpers.dry_run_success_resp()
+
+    return helpers.make_call_catch_err(
+        cl.detach_group_policy, GroupName=group_name, PolicyArn=policy_arn
+    )
 
 
-def get_all_user_arns_with_tags(cl: boto3.client, tags: List[Tuple]) -> List[str]:
+def get_account_authorization_details(cl: boto3.client, entity_types: Tuple[str, ...]) -> Dict[str, List[Dict]]:
     """
-    Return the ARNs of all users that have at least one tag from the tags list
+    Retrieve a snapshot of every IAM entity of the given types (e.g. "User", "Role",
+    "LocalManagedPolicy") using a single paginated GetAccountAuthorizationDetails pull
     """
 
-    ret = []
-    all_users = get_all_users(cl)
-    for u in all_users:
+    details = {"UserDetailList": [], "RoleDetailList": [], "Policies": []}
+    for page in cl.get_paginator("get_account_authorization_details").paginate(Filter=entity_types):
+        for key, entities in details.items():
+            entities.extend(page.get(key, []))
+
+    return details
 
-        user_name = u.get("UserName", None)
-        if user_name is not None:
-            if user_has_tags(cl, user_name, tags):
-                ret.append(u.get("Arn"))
 
-    return ret
+def build_tag_index(
+        cl: boto3.client, entity_types: Tuple[str, ...] = ("User", "Role", "LocalManagedPolicy")
+) -> Dict[str, Dict[str, List[Dict]]]:
+    """
+    Build an in-memory index of IAM users, roles and customer managed policies, keyed on
+    entity kind ("user", "role", "policy") and then on ARN, with the tags of each entity as
+    values. Users and roles carry their tags in the GetAccountAuthorizationDetails snapshot.
+    Policies only fall back to a list_policy_tags call when the snapshot has no tags for them.
+    """
 
+    details = get_account_authorization_details(cl, list(entity_types))
 
-@helpers.attempt_api_call_multiple_times
-def detach_policy_from_group(cl: boto3.client, group_name: str, policy_arn: str, dry: bool):
+    index = {
+        "user": {u["Arn"]: u.get("Tags", []) for u in details["UserDetailList"]},
+        "role": {r["Arn"]: r.get("Tags", []) for r in details["RoleDetailList"]},
+        "policy": {p["Arn"]: p.get("Tags", []) for p in details["Policies"]}
+    }
+
+    untagged_policy_arns = [arn for arn, tags in index["policy"].items() if len(tags) == 0]
+    if len(untagged_policy_arns) > 0:
+        with ThreadPoolExecutor(max_workers=POLICY_TAGS_MAX_WORKERS) as executor:
+            for arn, tags in zip(
+                untagged_policy_arns,
+                executor.map(lambda arn: list_policy_tags(cl, arn), untagged_policy_arns)
+            ):
+                index["policy"][arn] = tags
+
+    return index
+
+
+def arns_with_tags(entities: Dict[str, List[Dict]], tags: List[Tuple]) -> List[str]:
     """
-    Detach a policy from a group
+    Return the ARNs of all entities in one kind of a tag index that have at least one tag
+    from the tags list
     """
 
-    if dry:
-        return helpers.dry_run_success_resp()
+    tag_pairs = set(tags)
+    return [
+        arn for arn, entity_tags in entities.items()
+        if any((t["Key"], t["Value"]) in tag_pairs for t in entity_tags)
+    ]
 
-    return helpers.make_call_catch_err(
-        cl.detach_group_policy, GroupName=group_name, PolicyArn=policy_arn
-    )
+
+def get_tag_index(cl: boto3.client, use_cache: bool = False) -> Dict[str, Dict[str, List[Dict]]]:
+    """
+    Return a tag index for all users, roles and policies, built from a fresh scan unless
+    <use_cache> is True, in which case the process-level cached index is reused
+    """
+
+    if not use_cache:
+        return build_tag_index(cl)
+    return TAG_INDEX_CACHE.get(lambda: build_tag_index(cl))
+
+
+def tag_values(index: Dict[str, Dict[str, List[Dict]]], tag_key: str) -> List[str]:
+    """
+    Return every value of some tag key that is attached to an entity in a tag index
+    """
+    return list(dict.fromkeys(
+        t["Value"] for entities in index.values() for tags in entities.values() for t in tags if t["Key"] == tag_key
+    ))
+
+
+def get_all_entities_with_tags(
+        cl: boto3.client, tags: List[Tuple], index: Dict = None, use_cache: bool = False
+) -> List[Dict]:
+    """
+    Return the ARNs and tags of all users, roles and policies that have at least one tag from
+    the tags list, using a single tag index for all three entity kinds
+    """
+
+    if index is None:
+        index = get_tag_index(cl, use_cache=use_cache)
+    return [
+        {"Arn": arn, "Tags": index[kind][arn]}
+        for kind in ["user", "role", "policy"] for arn in arns_with_tags(index[kind], tags)
+    ]
+
+
+def get_all_arns_with_tags(
+        cl: boto3.client, tags: List[Tuple], index: Dict = None, use_cache: bool = False
+) -> List[str]:
+    """
+    Return the ARNs of all users, roles and policies that have at least one tag from the
+    tags list, using a single tag index for all three entity kinds
+    """
+    return [e["Arn"] for e in get_all_entities_with_tags(cl, tags, index=index, use_cache=use_cache)]
@@ -1,8 +1,11 @@
 """
 KMS helper functions
 """
-import boto3
+from __future__ import annotations
 from b3d.aws import helpers
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
 
 
 def get_key(cl: boto3.client, key_id: str):
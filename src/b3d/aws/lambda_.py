@@ -1,8 +1,11 @@
 """
 Lambda helper functions
 """
-import boto3
+from __future__ import annotations
 from b3d.aws import helpers
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
 
 
 @helpers.attempt_api_call_multiple_times
@@ -0,0 +1,261 @@
+"""
+Client-side rate limiting of AWS API calls, keyed on service and operation class, with concurrency
+that adapts to throttling
+"""
+from __future__ import annotations
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+from b3d.aws import retry
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
+
+
+# Operations whose names start with one of these only read state, every other operation is a write
+READ_OPERATION_PREFIXES = ("Describe", "Get", "List", "Head", "Lookup", "Search", "Select", "Query", "Scan")
+
+
+class Limit(NamedTuple):
+    """
+    Limits for one (<service>, <operation class>) pair: calls are started at no more than <rate> per
+    second, after an initial burst of up to <burst> calls (no rate limit if <rate> is None), and at most
+    <max_concurrency> calls are in flight at once. Concurrency starts at <initial_concurrency> and
+    is adjusted between <min_concurrency> and <max_concurrency> as calls succeed or are throttled.
+    """
+
+    rate: Optional[float] = None
+    burst: int = 1
+    initial_concurrency: int = 4
+    min_concurrency: int = 1
+    max_concurrency: int = 32
+
+
+# Limits for each (<service>, <operation class>) pair, where the operation class is "read" or "write".
+# IAM and API Gateway writes share small account-wide quotas, and EC2 refills its bucket of mutating
+# actions at 5 per second (see https://docs.aws.amazon.com/AWSEC2/latest/APIReference/throttling.html)
+DEFAULT_LIMITS = {
+    ("iam", "write"): Limit(rate=10.0, burst=10, initial_concurrency=4, max_concurrency=8),
+    ("apigateway", "write"): Limit(rate=2.0, burst=5, initial_concurrency=2, max_concurrency=4),
+    ("ec2", "write"): Limit(rate=5.0, burst=200, initial_concurrency=8, max_concurrency=32)
+}
+# Limit for any pair without an entry in the limits of a RateLimiter
+DEFAULT_LIMIT = Limit()
+# Request context entry that carries the key a call was counted under from before-call to after-call
+_CONTEXT_KEY = "b3d_rate_limit_key"
+
+
+def operation_class(operation_name: str) -> str:
+    """
+    Classify an API operation (e.g. "DeleteUser") as a "read" or a "write"
+    """
+    return "read" if operation_name.startswith(READ_OPERATION_PREFIXES) else "write"
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that holds up to <burst> tokens and refills at <rate> tokens per second
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """
+        Take a token, waiting for one if the bucket is empty, and return the seconds waited
+        """
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    @property
+    def tokens(self) -> float:
+        """
+        The number of tokens currently in the bucket
+        """
+
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class AimdController:
+    """
+    Bounds the number of calls in flight with an additive-increase / multiplicative-decrease limit.
+    Each successful call raises the limit by <increase> / <limit>, so it grows by about <increase>
+    for every <limit> successful calls, and each throttled call multiplies it by <decrease>.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, increase: float = 1.0, decrease: float = 0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.limit = float(initial)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> float:
+        """
+        Wait until a call may start, and return the seconds waited
+        """
+
+        start = time.monotonic()
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        return time.monotonic() - start
+
+    def release(self, throttled: bool):
+        """
+        Record that a call finished, adjusting the limit depending on whether it was throttled
+        """
+
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+            else:
+                self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+            self._cond.notify_all()
+
+
+class _Stats:
+    """
+    Counters for the calls made under one (<service>, <operation class>) pair
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.throttled = 0
+        self.errors = 0
+        self.waited = 0.0
+
+
+class RateLimiter:
+    """
+    Rate limits and adaptive concurrency limits for API calls, with one token bucket and one AIMD
+    controller per (<service>, <operation class>) pair. Pairs use their entry of <limits> (DEFAULT_LIMITS
+    if None), or <default> if they have none. Once installed on a client, the client's calls wait for
+    a token and a free slot before they are sent, and are counted once they finish.
+    """
+
+    def __init__(
+            self, limits: Optional[Dict[Tuple[str, str], Limit]] = None, default: Limit = DEFAULT_LIMIT
+    ):
+        self.limits = DEFAULT_LIMITS if limits is None else dict(limits)
+        self.default = default
+        self._buckets = {}
+        self._controllers = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _state(self, key: Tuple[str, str]) -> Tuple[Optional[TokenBucket], AimdController, _Stats]:
+        try:
+            return self._buckets[key], self._controllers[key], self._stats[key]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if key not in self._stats:
+                limit = self.limits.get(key, self.default)
+                self._buckets[key] = None if limit.rate is None else TokenBucket(limit.rate, limit.burst)
+                self._controllers[key] = AimdController(
+                    limit.initial_concurrency, limit.min_concurrency, limit.max_concurrency
+                )
+                self._stats[key] = _Stats()
+            return self._buckets[key], self._controllers[key], self._stats[key]
+
+    def acquire(self, service: str, operation_name: str) -> Tuple[str, str]:
+        """
+        Wait until a call of some operation may start, and return the key it was counted under
+        """
+
+        key = (service, operation_class(operation_name))
+        bucket, controller, stats = self._state(key)
+        waited = controller.acquire()
+        if bucket is not None:
+            waited += bucket.acquire()
+        with self._lock:
+            stats.waited += waited
+        return key
+
+    def release(self, key: Tuple[str, str], error_code: Optional[str]):
+        """
+        Record that a call counted under some key finished, with some error code (None if it succeeded)
+        """
+
+        _, controller, stats = self._state(key)
+        throttled = error_code in retry.THROTTLING_ERRORS
+        controller.release(throttled)
+        with self._lock:
+            stats.calls += 1
+            stats.throttled += throttled
+            stats.errors += error_code is not None
+
+    def install(self, cl: boto3.client):
+        """
+        Make every call of a client wait for this limiter
+        """
+
+        service = cl.meta.service_model.service_name
+
+        # The request context is shared by the events of a single call
+        def _before_call(model, context, **_):
+            context[_CONTEXT_KEY] = self.acquire(service, model.name)
+
+        def _after_call(parsed, context, **_):
+            if _CONTEXT_KEY in context:
+                self.release(context.pop(_CONTEXT_KEY), (parsed or {}).get("Error", {}).get("Code"))
+
+        def _after_call_error(exception, context, **_):
+            if _CONTEXT_KEY in context:
+                self.release(context.pop(_CONTEXT_KEY), type(exception).__name__)
+
+        cl.meta.events.register("before-call", _before_call)
+        cl.meta.events.register("after-call", _after_call)
+        cl.meta.events.register("after-call-error", _after_call_error)
+
+    def metrics(self) -> Dict[str, Dict]:
+        """
+        Return the current state of every (<service>, <operation class>) pair that has made calls,
+        keyed on "<service>:<operation class>"
+        """
+
+        with self._lock:
+            keys = sorted(self._stats)
+        metrics = {}
+        for key in keys:
+            bucket, controller, stats = self._state(key)
+            metrics[f"{key[0]}:{key[1]}"] = {
+                "rate": None if bucket is None else bucket.rate,
+                "tokens": None if bucket is None else round(bucket.tokens, 3),
+                "concurrency_limit": round(controller.limit, 3),
+                "in_flight": controller.in_flight,
+                "calls": stats.calls,
+                "throttled": stats.throttled,
+                "errors": stats.errors,
+                "waited": round(stats.waited, 3)
+            }
+        return metrics
+
+
+# Limiter shared by every engine that isn't given its own, since AWS quotas apply per account
+DEFAULT_RATE_LIMITER = RateLimiter()
@@ -1,18 +1,70 @@
 """
 ResourceGroupsTaggingApi helper functions
 """
-import boto3
-import b3q
+from __future__ import annotations
+from typing import Iterator, List, Dict, Optional
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
+
+
+# GetResources accepts at most this many values in a single tag filter
+TAG_FILTER_MAX_VALUES = 20
+# Largest page size and number of resource type filters that GetResources accepts
+RESOURCES_PER_PAGE = 100
+RESOURCE_TYPE_FILTERS_MAX = 100
 
 
 def get_resources_by_tag(cl: boto3.client, tag_key: str, tag_value: str):
     """
     Retrieve the ARNs of all resources associated with some tag pair
     """
+    return [r["ResourceARN"] for r in get_resources_by_tag_values(cl, tag_key, [tag_value])]
+
+
+def get_resources_by_tag_values(
+        cl: boto3.client, tag_key: str, tag_values: List[str], resource_types: Optional[List[str]] = None
+) -> List[Dict]:
+    """
+    Retrieve the ARNs and tags of all resources whose <tag_key> tag has any of some list of
+    values. Values are sent in as few GetResources queries as the tag filter limits allow, and
+    every page of each query is read.
+    """
+    return list(iter_resources_by_tag_values(cl, tag_key, tag_values, resource_types))
+
+
+def iter_resources_by_tag_values(
+        cl: boto3.client, tag_key: str, tag_values: List[str], resource_types: Optional[List[str]] = None
+) -> Iterator[Dict]:
+    """
+    Lazily retrieve the ARNs and tags of all resources whose <tag_key> tag has any of some list
+    of values, fetching each page of results only once the previous one has been consumed. If
+    <resource_types> is given, only resources of those types (e.g. "ec2:instance") are returned,
+    so an empty list returns nothing.
+    """
+
+    if resource_types is not None and len(resource_types) == 0:
+        return
+
+    arguments = {"ResourcesPerPage": RESOURCES_PER_PAGE}
+    if resource_types is not None:
+        arguments["ResourceTypeFilters"] = resource_types[:RESOURCE_TYPE_FILTERS_MAX]
+
+    paginator = cl.get_paginator("get_resources")
+    for i in range(0, len(tag_values), TAG_FILTER_MAX_VALUES):
+        for page in paginator.paginate(
+            TagFilters=[{"Key": tag_key, "Values": tag_values[i:i + TAG_FILTER_MAX_VALUES]}], **arguments
+        ):
+            for r in page.get("ResourceTagMappingList", []):
+                yield {"ResourceARN": r["ResourceARN"], "Tags": r.get("Tags", [])}
+
+
+def get_tag_values(cl: boto3.client, tag_key: str) -> List[str]:
+    """
+    Retrieve every value of some tag key that is in use in this region
+    """
 
-    response = b3q.get(
-        cl.get_resources,
-        arguments={"TagFilters": [{"Key": tag_key, "Values": [tag_value]}]},
-        attribute="ResourceTagMappingList"
-    )
-    return [r["ResourceARN"] for r in response]
+    ret = []
+    for page in cl.get_paginator("get_tag_values").paginate(Key=tag_key):
+        ret.extend(page.get("TagValues", []))
+    return ret
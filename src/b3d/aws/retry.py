@@ -0,0 +1,137 @@
+"""
+Retry policy for delete / detach calls, keyed on the error code of each failed response
+"""
+import random
+import time
+from typing import Callable, Dict, FrozenSet, NamedTuple, Optional
+
+
+# Error codes that retrying won't fix: the resource is gone, or the caller may not delete it
+PERMANENT_ERRORS = frozenset([
+    "AccessDenied", "AccessDeniedException", "AuthFailure", "InvalidClientTokenId", "UnauthorizedOperation",
+    "UnrecognizedClientException", "NoSuchEntity", "NoSuchBucket", "NotFound", "NotFoundException",
+    "ResourceNotFoundException", "ParameterNotFound", "InvalidGroup.NotFound", "InvalidInstanceID.NotFound",
+    "InvalidVolume.NotFound", "InvalidParameterValue", "InvalidParameterCombination", "ValidationError",
+    "ValidationException", "KMSInvalidStateException", "MalformedPolicyDocument", "UnmodifiableEntity"
+])
+
+# Error codes for requests that were rate limited
+THROTTLING_ERRORS = frozenset([
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottled", "RequestThrottledException",
+    "RequestLimitExceeded", "TooManyRequestsException", "SlowDown", "EC2ThrottledException",
+    "ProvisionedThroughputExceededException", "BandwidthLimitExceeded"
+])
+
+# Error codes for resources that are still in use by, or not yet released from, something being torn
+# down, and for changes that AWS hasn't finished propagating
+DEPENDENCY_ERRORS = frozenset([
+    "DependencyViolation", "DeleteConflict", "ResourceInUse", "ResourceInUseException", "InvalidGroup.InUse",
+    "VolumeInUse", "IncorrectState", "IncorrectInstanceState", "BucketNotEmpty", "ConflictException",
+    "OperationAbortedException", "ConcurrentModification", "ConcurrentModificationException"
+])
+
+# Error codes that are worth retrying even though some services return them with a 4xx status
+TRANSIENT_ERRORS = frozenset([
+    "RequestTimeout", "RequestTimeoutException", "InternalError", "InternalFailure", "ServiceUnavailable"
+])
+
+# Response status codes of calls that succeeded
+SUCCESS_STATUS_CODES = (200, 202, 204)
+
+
+class RetryPolicy(NamedTuple):
+    """
+    How failed calls are retried, given their error codes. Permanent errors are returned at once.
+    Throttling errors are retried with exponential backoff and full jitter, i.e. after a random delay
+    of up to <throttle_base> * 2 ** <retry>, capped at <throttle_cap> seconds. Dependency errors
+    are polled every <dependency_interval> seconds. Server errors (5xx responses, or no response)
+    are retried with the throttling backoff, and any other client error (4xx response) is treated
+    as permanent. A call stops retrying once another delay would take it past <max_elapsed> seconds,
+    and, unless it is waiting on a dependency (which is expected to take a while but not forever),
+    once it has made <max_attempts> attempts.
+    """
+
+    max_attempts: int = 10
+    max_elapsed: float = 30.0
+    throttle_base: float = 0.5
+    throttle_cap: float = 20.0
+    dependency_interval: float = 2.0
+    permanent_errors: FrozenSet[str] = PERMANENT_ERRORS
+    throttling_errors: FrozenSet[str] = THROTTLING_ERRORS
+    dependency_errors: FrozenSet[str] = DEPENDENCY_ERRORS
+    transient_errors: FrozenSet[str] = TRANSIENT_ERRORS
+
+    def classify(self, resp: Dict) -> str:
+        """
+        Classify a failed response as "permanent", "throttling", "dependency" or "transient" (a server
+        error)
+        """
+
+        code = resp.get("Error", {}).get("Code", "")
+        if code in self.permanent_errors:
+            return "permanent"
+        if code in self.throttling_errors:
+            return "throttling"
+        if code in self.dependency_errors:
+            return "dependency"
+        if code not in self.transient_errors and 400 <= resp.get("ResponseMetadata", {}).get("HTTPStatusCode", 0) < 500:
+            return "permanent"
+        return "transient"
+
+    def delay(self, category: str, retry: int) -> Optional[float]:
+        """
+        Return how long to wait before retry number <retry> (counting from 0) of a call that failed
+        with some category of error, or None if it shouldn't be retried
+        """
+
+        if category == "permanent":
+            return None
+        if category == "dependency":
+            # Bounded only by max_elapsed, since how long a dependency takes to release isn't up to the caller
+            return self.dependency_interval
+        if retry + 1 >= self.max_attempts:
+            return None
+        return random.uniform(0, min(self.throttle_cap, self.throttle_base * 2 ** retry))
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+def set_default_policy(policy: RetryPolicy):
+    """
+    Replace the policy used by every call that is retried with call_with_retries
+    """
+
+    global DEFAULT_RETRY_POLICY  # pylint: disable=global-statement
+    DEFAULT_RETRY_POLICY = policy
+
+
+def call_with_retries(
+        fn: Callable[[], Dict], policy: Optional[RetryPolicy] = None, sleep: Callable[[float], None] = time.sleep
+) -> Dict:
+    """
+    Call <fn> until it returns a successful response, or <policy> (DEFAULT_RETRY_POLICY if None)
+    gives up on it, and return the last response. The number of retries made and seconds spent
+    waiting are recorded under the response's "RetryStats" key.
+    """
+
+    policy = DEFAULT_RETRY_POLICY if policy is None else policy
+    start = time.monotonic()
+    retries, slept = 0, 0.0
+
+    while True:
+        resp = fn()
+        if resp["ResponseMetadata"]["HTTPStatusCode"] in SUCCESS_STATUS_CODES:
+            break
+
+        delay = policy.delay(policy.classify(resp), retries)
+        # Time spent sleeping is counted even if <sleep> doesn't actually wait
+        if delay is None or max(time.monotonic() - start, slept) + delay > policy.max_elapsed:
+            break
+
+        sleep(delay)
+        retries += 1
+        slept += delay
+
+    resp["RetryStats"] = {"retries": retries, "slept": round(slept, 3)}
+    return resp
@@ -1,8 +1,16 @@
 """
 S3 helper functions
 """
-import boto3
+from __future__ import annotations
+from typing import Dict, Iterator, List, Optional, Tuple
 from b3d.aws import helpers
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
+
+
+# Largest number of keys that a single delete_objects call accepts, and that list calls return per page
+DELETE_OBJECTS_MAX_KEYS = 1000
 
 
 def get_bucket(cl: boto3.client, bucket_name: str) -> bool:
@@ -30,21 +38,49 @@ def delete_bucket(cl: boto3.client, bucket_name: str, dry: bool) -> dict:
     )
 
 
-def get_objects_in_bucket(cl: boto3.client, bucket_name: str) -> list:
+def _listing_failed(resp: Dict, failures: Optional[List[Dict]] = None):
     """
-    List all objects in a bucket
+    Record the response of a page that could not be listed, if the caller asked for them
     """
 
-    resp = helpers.make_call_catch_err(
-        cl.list_objects, Bucket=bucket_name
-    )
-    return [obj.get("Key") for obj in resp.get("Contents", [])]
+    if failures is not None:
+        failures.append(resp)
+
+
+def get_object_key_pages(
+        cl: boto3.client, bucket_name: str, prefix: str = "", delimiter: Optional[str] = None,
+        failures: Optional[List[Dict]] = None
+) -> Iterator[Tuple[List[str], List[str]]]:
+    """
+    Page through the objects in a bucket under some prefix with list_objects_v2, yielding the
+    (<keys>, <common prefixes>) of each page of up to DELETE_OBJECTS_MAX_KEYS objects. Common prefixes
+    are only listed if <delimiter> is given. Stops at the first page that can't be listed, whose
+    response is appended to <failures> if given.
+    """
+
+    kwargs = {"Bucket": bucket_name, "Prefix": prefix, "MaxKeys": DELETE_OBJECTS_MAX_KEYS}
+    if delimiter is not None:
+        kwargs["Delimiter"] = delimiter
+
+    while True:
+        resp = helpers.make_call_catch_err(cl.list_objects_v2, **kwargs)
+        if resp["ResponseMetadata"]["HTTPStatusCode"] != 200:
+            _listing_failed(resp, failures)
+            return
+        yield (
+            [obj["Key"] for obj in resp.get("Contents", [])],
+            [common["Prefix"] for common in resp.get("CommonPrefixes", [])]
+        )
+        if not resp.get("IsTruncated"):
+            return
+        kwargs["ContinuationToken"] = resp["NextContinuationToken"]
 
 
 @helpers.attempt_api_call_multiple_times
 def delete_objects(cl: boto3.client, bucket_name: str, objects: list, dry: bool) -> dict:
     """
-    Delete specified objects in a bucket
+    Delete specified objects (at most DELETE_OBJECTS_MAX_KEYS) in a bucket. Objects that could not
+    be deleted are listed under the response's "Errors" key.
     """
 
     if dry:
@@ -53,5 +89,162 @@ def delete_objects(cl: boto3.client, bucket_name: str, objects: list, dry: bool)
     return helpers.make_call_catch_err(
         cl.delete_objects,
         Bucket=bucket_name,
-        Delete={"Objects": [{"Key": k} for k in objects]}
+        Delete={"Objects": [{"Key": k} for k in objects], "Quiet": True}
     )
+
+
+def is_versioned(cl: boto3.client, bucket_name: str) -> bool:
+    """
+    Determine if versioning has ever been enabled on a bucket, so it may hold noncurrent versions
+    and delete markers
+    """
+
+    resp = helpers.make_call_catch_err(
+        cl.get_bucket_versioning, Bucket=bucket_name
+    )
+    return resp.get("Status") in ("Enabled", "Suspended")
+
+
+def get_object_version_pages(
+        cl: boto3.client, bucket_name: str, failures: Optional[List[Dict]] = None
+) -> Iterator[List[Dict]]:
+    """
+    Page through the versions and delete markers in a bucket with list_object_versions, yielding
+    pages of up to DELETE_OBJECTS_MAX_KEYS {"Key": ..., "VersionId": ...} entries. Each page starts
+    at the (key, version) marker where the previous one ended, so a key with more versions than fit
+    in a page is paged through like any other. Stops at the first page that can't be listed, whose
+    response is appended to <failures> if given.
+    """
+
+    kwargs = {"Bucket": bucket_name, "MaxKeys": DELETE_OBJECTS_MAX_KEYS}
+
+    while True:
+        resp = helpers.make_call_catch_err(cl.list_object_versions, **kwargs)
+        if resp["ResponseMetadata"]["HTTPStatusCode"] != 200:
+            _listing_failed(resp, failures)
+            return
+        yield [
+            {"Key": version["Key"], "VersionId": version["VersionId"]}
+            for version in resp.get("Versions", []) + resp.get("DeleteMarkers", [])
+        ]
+        if not resp.get("IsTruncated"):
+            return
+        kwargs["KeyMarker"] = resp["NextKeyMarker"]
+        kwargs["VersionIdMarker"] = resp["NextVersionIdMarker"]
+
+
+@helpers.attempt_api_call_multiple_times
+def delete_object_versions(
+        cl: boto3.client, bucket_name: str, versions: List[Dict], dry: bool, bypass_governance_retention: bool = False
+) -> dict:
+    """
+    Delete specified object versions and delete markers (at most DELETE_OBJECTS_MAX_KEYS) in a bucket,
+    given as {"Key": ..., "VersionId": ...} entries. If <bypass_governance_retention> is True, versions
+    under Object Lock governance retention are deleted too. Versions that could not be deleted are
+    listed under the response's "Errors" key.
+    """
+
+    if dry:
+        return helpers.dry_run_success_resp()
+
+    kwargs = {"Bucket": bucket_name, "Delete": {"Objects": versions, "Quiet": True}}
+    if bypass_governance_retention:
+        kwargs["BypassGovernanceRetention"] = True
+
+    return helpers.make_call_catch_err(cl.delete_objects, **kwargs)
+
+
+def get_multipart_upload_pages(
+        cl: boto3.client, bucket_name: str, failures: Optional[List[Dict]] = None
+) -> Iterator[List[Dict]]:
+    """
+    Page through the in-progress multipart uploads in a bucket with list_multipart_uploads, yielding
+    pages of up to DELETE_OBJECTS_MAX_KEYS {"Key": ..., "UploadId": ...} entries. Each page starts at
+    the (key, upload) marker where the previous one ended. Stops at the first page that can't be
+    listed, whose response is appended to <failures> if given.
+    """
+
+    kwargs = {"Bucket": bucket_name, "MaxUploads": DELETE_OBJECTS_MAX_KEYS}
+
+    while True:
+        resp = helpers.make_call_catch_err(cl.list_multipart_uploads, **kwargs)
+        if resp["ResponseMetadata"]["HTTPStatusCode"] != 200:
+            _listing_failed(resp, failures)
+            return
+        yield [{"Key": upload["Key"], "UploadId": upload["UploadId"]} for upload in resp.get("Uploads", [])]
+        if not resp.get("IsTruncated"):
+            return
+        kwargs["KeyMarker"] = resp["NextKeyMarker"]
+        kwargs["UploadIdMarker"] = resp["NextUploadIdMarker"]
+
+
+@helpers.attempt_api_call_multiple_times
+def abort_multipart_upload(cl: boto3.client, bucket_name: str, upload: Dict, dry: bool) -> dict:
+    """
+    Abort an in-progress multipart upload, given as a {"Key": ..., "UploadId": ...} entry, discarding
+    the parts uploaded so far
+    """
+
+    if dry:
+        return helpers.dry_run_success_resp()
+
+    return helpers.make_call_catch_err(
+        cl.abort_multipart_upload, Bucket=bucket_name, Key=upload["Key"], UploadId=upload["UploadId"]
+    )
+
+
+def get_lifecycle_rule_ids(cl: boto3.client, bucket_name: str) -> List[str]:
+    """
+    List the IDs of the lifecycle rules of a bucket, if it has a lifecycle configuration
+    """
+
+    resp = helpers.make_call_catch_err(
+        cl.get_bucket_lifecycle_configuration, Bucket=bucket_name
+    )
+    return [rule.get("ID") for rule in resp.get("Rules", [])]
+
+
+@helpers.attempt_api_call_multiple_times
+def put_expiration_lifecycle(cl: boto3.client, bucket_name: str, rule_id: str, dry: bool) -> dict:
+    """
+    Replace the lifecycle configuration of a bucket with rules that expire everything in it: current
+    and noncurrent versions after a day, then the delete markers they leave behind, and multipart
+    uploads a day after they were started. The main rule has ID <rule_id>.
+    """
+
+    if dry:
+        return helpers.dry_run_success_resp()
+
+    return helpers.make_call_catch_err(
+        cl.put_bucket_lifecycle_configuration,
+        Bucket=bucket_name,
+        LifecycleConfiguration={"Rules": [
+            {
+                "ID": rule_id,
+                "Status": "Enabled",
+                "Filter": {"Prefix": ""},
+                "Expiration": {"Days": 1},
+                "NoncurrentVersionExpiration": {"NoncurrentDays": 1},
+                "AbortIncompleteMultipartUpload": {"DaysAfterInitiation": 1}
+            },
+            {
+                "ID": f"{rule_id}-delete-markers",
+                "Status": "Enabled",
+                "Filter": {"Prefix": ""},
+                "Expiration": {"ExpiredObjectDeleteMarker": True}
+            }
+        ]}
+    )
+
+
+def is_empty(cl: boto3.client, bucket_name: str) -> bool:
+    """
+    Determine if a bucket holds no object versions, delete markers or multipart uploads (False if
+    it can't be listed)
+    """
+
+    versions = helpers.make_call_catch_err(cl.list_object_versions, Bucket=bucket_name, MaxKeys=1)
+    uploads = helpers.make_call_catch_err(cl.list_multipart_uploads, Bucket=bucket_name, MaxUploads=1)
+    return all(resp["ResponseMetadata"]["HTTPStatusCode"] == 200 for resp in [versions, uploads]) and not any([
+        versions.get("Versions"), versions.get("DeleteMarkers"), uploads.get("Uploads")
+    ])
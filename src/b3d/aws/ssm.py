@@ -1,8 +1,16 @@
 """
 SSM helper functions
 """
-import boto3
+from __future__ import annotations
+from typing import List
 from b3d.aws import helpers
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
+
+
+# Largest number of parameters that a single get_parameters or delete_parameters call accepts
+PARAMETERS_MAX_NAMES = 10
 
 
 def get_parameter(cl: boto3.client, parameter_name: str):
@@ -16,6 +24,20 @@ def get_parameter(cl: boto3.client, parameter_name: str):
     return None if resp["ResponseMetadata"]["HTTPStatusCode"] != 200 else resp
 
 
+def get_existing_parameter_names(cl: boto3.client, parameter_names: List[str]) -> List[str]:
+    """
+    Return those of some parameters (at most PARAMETERS_MAX_NAMES) that exist, in the order given
+    """
+
+    resp = helpers.make_call_catch_err(
+        cl.get_parameters, Names=parameter_names
+    )
+    if resp["ResponseMetadata"]["HTTPStatusCode"] != 200:
+        return []
+    invalid = set(resp.get("InvalidParameters", []))
+    return [name for name in parameter_names if name not in invalid]
+
+
 @helpers.attempt_api_call_multiple_times
 def delete_parameter(cl: boto3.client, parameter_name: str, dry: bool):
     """
@@ -28,3 +50,18 @@ def delete_parameter(cl: boto3.client, parameter_name: str, dry: bool):
     return helpers.make_call_catch_err(
         cl.delete_parameter, Name=parameter_name
     )
+
+
+@helpers.attempt_api_call_multiple_times
+def delete_parameters(cl: boto3.client, parameter_names: List[str], dry: bool):
+    """
+    Delete several parameters (at most PARAMETERS_MAX_NAMES) with one call. Parameters that don't
+    exist are listed under the response's "InvalidParameters" key.
+    """
+
+    if dry:
+        return helpers.dry_run_success_resp()
+
+    return helpers.make_call_catch_err(
+        cl.delete_parameters, Names=parameter_names
+    )
@@ -2,126 +2,889 @@
 Boto3 utility library that supports deletion of collections of AWS resources
 (such as temporary resources created during unit tests).
 """
-from typing import Iterator
-import boto3
-from b3d import aws, utils
+from __future__ import annotations
+import collections
+import fnmatch
+import functools
+import threading
+from typing import Any, Iterable, Iterator, List, Dict, Tuple, Callable, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from b3d import aws, planner, utils
+from b3d.dispatch import (
+    TypeFilter, destroy_groups, group_by_type, map_arns, unsupported_summary
+)
+from b3d.engine import Engine, resolve as resolve_engine
+from b3d.inventory import Inventory
+from b3d.utils import log_msg
+from b3d.utils.arn import Arn
+from b3d.utils.client_config import ClientConfig, split_client_config
+from b3d.utils.s3_options import S3Options
 
 
-DELETE_PROTOCOL_OBJECT_MAP = utils.build_resource_map("b3d.delete")
+# Delete modules are imported lazily, the first time one of their resource types is looked up
+DELETE_PROTOCOL_OBJECT_MAP = utils.registry.DELETE_REGISTRY
+# Upper bound on the number of discovery sources that are queried concurrently
+DISCOVERY_MAX_WORKERS = 4
+# Number of resources in the same level of a delete plan that are destroyed at once, unless the
+# caller gives max_workers
+PLAN_MAX_WORKERS = 8
+# Upper bound on the number of regions (plus the global IAM sweep) processed concurrently
+MULTI_REGION_MAX_WORKERS = 8
+# Number of discovered ARNs that streaming discovery may hold ahead of the deletes
+STREAM_BUFFER_SIZE = 256
 
 
-def _get_all_resources_with_tag(tag_key: str, tag_value: str, region: str):
+
+def _run_discovery_sources(
+        sources: List[Tuple[str, Callable[[], Iterable]]], max_workers: int = DISCOVERY_MAX_WORKERS
+) -> Tuple[List, List[Dict]]:
+    """
+    Run each (<name>, <source>) discovery source on a bounded thread pool. Results are merged in
+    the order the sources were supplied and de-duplicated, keeping the first occurrence of each ARN.
+    A source that raises produces a failure log message instead of discarding the ARNs found by the
+    other sources.
+    """
+
+    arns = []
+    failures = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Sources may be lazy, so they are drained on the worker threads
+        futures = [(name, executor.submit(lambda source=source: list(source()))) for name, source in sources]
+        for name, future in futures:
+            try:
+                arns.extend(future.result())
+            except Exception as e:  # pylint: disable=broad-except
+                failures.append(log_msg.log_msg_discovery_failure(name, e))
+
+    return list(dict.fromkeys(arns)), failures
+
+
+def _stream_discovery_source(
+        name: str, source: Callable[[], Iterable]
+) -> Iterator[Tuple[Optional[str], Optional[Dict]]]:
+    """
+    Yield (<arn>, None) for each ARN produced by a discovery source, or a single (None, <failure>)
+    pair if the source raises
+    """
+
+    try:
+        for arn in source():
+            yield arn, None
+    except Exception as e:  # pylint: disable=broad-except
+        yield None, log_msg.log_msg_discovery_failure(name, e)
+
+
+def _stream_discovery_sources(
+        sources: List[Tuple[str, Callable[[], Iterable]]],
+        max_workers: int = DISCOVERY_MAX_WORKERS,
+        buffer_size: int = STREAM_BUFFER_SIZE
+) -> Iterator[Tuple[Optional[Arn], Optional[Dict]]]:
+    """
+    Run each (<name>, <source>) discovery source on a bounded thread pool and yield (<arn>, None)
+    pairs as soon as any source produces a new ARN, or (None, <failure>) pairs for sources that
+    fail. At most <buffer_size> ARNs are held ahead of the consumer, so sources only fetch further
+    pages as the consumer catches up.
+    """
+
+    # Only global (IAM) resources can be found by more than one source, so they are the only ARNs
+    # that need remembering in order to de-duplicate the stream
+    seen = set()
+    for arn, failure in utils.concurrency.merge_generators(
+        [functools.partial(_stream_discovery_source, name, source) for name, source in sources],
+        max_workers, buffer_size
+    ):
+        if failure is not None:
+            yield None, failure
+        elif not arn.is_global:
+            yield arn, None
+        elif arn not in seen:
+            seen.add(arn)
+            yield arn, None
+
+
+def _regional_discovery_sources(
+        tag_key: str,
+        tag_value: str,
+        region: str,
+        type_filter: TypeFilter = TypeFilter(),
+        engine: Optional[Engine] = None
+) -> List[Tuple[str, Callable]]:
+    """
+    Build the discovery sources for resources that live in a single region
+    """
+
+    resource_groups_tagging_client = resolve_engine(engine).client("resourcegroupstaggingapi", region)
+
+    return [
+        # Retrieve ARNs of all objects with the supplied name/tag pair using the ResourceGroupsTaggingApi.
+        # Note that this API does not support *all* AWS resource types, so some manual ARN querying is
+        # performed by the global (IAM) source.
+        (
+            "resourcegroupstaggingapi",
+            lambda: type_filter.parse_selected(
+                r["ResourceARN"] for r in aws.resource_groups_tagging.iter_resources_by_tag_values(
+                    resource_groups_tagging_client, tag_key, [tag_value], type_filter.resource_type_filters()
+                )
+            )
+        )
+    ]
+
+
+def _global_discovery_sources(
+        tag_key: str,
+        tag_value: str,
+        region: str,
+        iam_cache: bool = False,
+        type_filter: TypeFilter = TypeFilter(),
+        engine: Optional[Engine] = None
+) -> List[Tuple[str, Callable]]:
+    """
+    Build the discovery sources for global (IAM) resources, which are the same in every region
+    """
+
+    iam_client = resolve_engine(engine).client("iam", region)
+    tags = [(tag_key, tag_value)]
+
+    return [
+        # Retrieve ARNs of all IAM Users, Roles and Policies with supplied key/value tag pair from a
+        # single GetAccountAuthorizationDetails snapshot
+        (
+            "iam",
+            lambda: list(type_filter.parse_selected(
+                aws.iam.get_all_arns_with_tags(iam_client, tags, use_cache=iam_cache)
+            ))
+        )
+    ]
+
+
+def get_all_resources_with_tag(
+        tag_key: str,
+        tag_value: str,
+        region: str,
+        iam_cache: bool = False,
+        type_filter: TypeFilter = TypeFilter(),
+        engine: Optional[Engine] = None
+) -> Tuple[List[Arn], List[Dict]]:
+    """
+    Retrieve the ARNs of all resources with some (<tag_key>, <tag_value>) tag pair, along with
+    log messages for any discovery source that failed. If <iam_cache> is True, IAM entities are
+    looked up in the process-level IAM tag index rather than rescanned.
+    """
+
+    return _run_discovery_sources(
+        _regional_discovery_sources(tag_key, tag_value, region, type_filter, engine) +
+        _global_discovery_sources(tag_key, tag_value, region, iam_cache, type_filter, engine)
+    )
+
+
+def _normalize_tags(tags: List[Union[Tuple[str, str], str]], tag_key: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    Turn a list of (<tag_key>, <tag_value>) pairs and/or bare tag values (which are paired
+    with <tag_key>) into a de-duplicated list of tag pairs, keeping their order
+    """
+
+    pairs = []
+    for tag in tags:
+        if isinstance(tag, str):
+            if tag_key is None:
+                raise ValueError(f"Tag value {tag} was supplied without a tag key")
+            pairs.append((tag_key, tag))
+        else:
+            pairs.append(tuple(tag))
+
+    return list(dict.fromkeys(pairs))
+
+
+def _matched_tags(resources: List[Dict], arn_key: str, ranks: Dict[Tuple[str, str], int]) -> List[Tuple]:
+    """
+    Pair each resource ARN with the earliest (by rank) of the searched-for tag pairs that the
+    resource carries, dropping resources that carry none of them
+    """
 
     ret = []
+    for resource in resources:
+        present = [(t["Key"], t["Value"]) for t in resource["Tags"] if (t["Key"], t["Value"]) in ranks]
+        if len(present) > 0:
+            ret.append((utils.arn.parse(resource[arn_key]), min(present, key=ranks.get)))
+    return ret
+
+
+def _get_all_resources_with_tags(
+        tags: List[Tuple[str, str]],
+        region: str,
+        iam_cache: bool = False,
+        iam_index: Optional[Dict] = None,
+        type_filter: TypeFilter = TypeFilter(),
+        engine: Optional[Engine] = None
+) -> Tuple[Dict[Arn, Tuple[str, str]], List[Dict]]:
+    """
+    Retrieve the ARNs of all resources with any of several tag pairs in a single discovery pass,
+    mapped to the tag pair that matched each of them, along with log messages for any discovery
+    source that failed. The ResourceGroupsTaggingApi is queried once per tag key, with values
+    chunked to the API limits, and IAM entities are matched against a single tag index (which
+    is <iam_index>, if one has already been retrieved).
+    """
+
+    engine = resolve_engine(engine)
+    resource_groups_tagging_client = engine.client("resourcegroupstaggingapi", region)
+    iam_client = engine.client("iam", region)
+    ranks = {tag: i for i, tag in enumerate(tags)}
+
+    values_by_key = {}
+    for key, value in tags:
+        values_by_key.setdefault(key, []).append(value)
+
+    def _tagging_source(key: str, values: List[str]) -> List[Tuple]:
+        return _matched_tags(
+            aws.resource_groups_tagging.get_resources_by_tag_values(
+                resource_groups_tagging_client, key, values, type_filter.resource_type_filters()
+            ),
+            "ResourceARN", ranks
+        )
+
+    def _iam_source() -> List[Tuple]:
+        return _matched_tags(
+            aws.iam.get_all_entities_with_tags(iam_client, tags, index=iam_index, use_cache=iam_cache),
+            "Arn", ranks
+        )
+
+    # Tag filters for different keys are ANDed by the ResourceGroupsTaggingApi, so each key needs its
+    # own query, whereas all values of one key are ORed within the same filter
+    sources = [
+        (f"resourcegroupstaggingapi ({key})", functools.partial(_tagging_source, key, values))
+        for key, values in values_by_key.items()
+    ] + [("iam", _iam_source)]
+
+    matches, failures = _run_discovery_sources(sources)
+    resource_tags = {}
+    for arn, tag in matches:
+        if type_filter.selects_arn(arn):
+            resource_tags.setdefault(arn, tag)
+
+    return resource_tags, failures
+
+
+def prewarm(
+        resource_types: Optional[List[str]] = None,
+        exclude_resource_types: Optional[List[str]] = None,
+        engine: Optional[Engine] = None
+) -> threading.Thread:
+    """
+    Start a daemon thread that imports boto3, the delete modules and the service models needed to
+    destroy some "<service>" or "<service>:<resource_type>" specs (every supported type by default),
+    so that the first destroy of each type doesn't have to load them. Models are loaded into the
+    session of <engine> (the default engine if None). Returns the started thread.
+    """
+    return _start_prewarm(TypeFilter(resource_types, exclude_resource_types), engine)
+
+
+def _start_prewarm(type_filter: TypeFilter, engine: Optional[Engine] = None) -> threading.Thread:
+    """
+    Start a daemon thread that loads what destroying the resource types selected by a filter needs
+    """
+
+    selected = [
+        (service, resource_type)
+        for service, resources in DELETE_PROTOCOL_OBJECT_MAP.items()
+        if service != "unsupported-service"
+        for resource_type in resources
+        if type_filter.selects(service, resource_type)
+    ]
+
+    def _prewarm():
+        for service, resource_type in selected:
+            try:
+                DELETE_PROTOCOL_OBJECT_MAP.lookup(service, resource_type)
+            except Exception:  # pylint: disable=broad-except
+                # A delete procedure that fails to import is reported when it is first used
+                continue
+        try:
+            aws.helpers.load_service_models(
+                dict.fromkeys(service for service, _ in selected), resolve_engine(engine).session
+            )
+        except Exception:  # pylint: disable=broad-except
+            # Whatever couldn't be loaded here (e.g. missing botocore data) is loaded when it is first used
+            pass
+
+    thread = threading.Thread(target=_prewarm, name="b3d-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def delete_resources(  # pylint: disable=too-many-arguments
+        tag_key: str,
+        tag_value: str,
+        region: str = "us-east-1",
+        dry=True,
+        iam_cache: bool = False,
+        stream: bool = False,
+        resource_types: Optional[List[str]] = None,
+        exclude_resource_types: Optional[List[str]] = None,
+        inventory: Optional[Inventory] = None,
+        prewarm_models: bool = False,
+        engine: Optional[Engine] = None,
+        client_config: Optional[Union[ClientConfig, Dict[str, ClientConfig]]] = None,
+        max_workers: Optional[int] = None,
+        ordered: bool = False,
+        plan: bool = False,
+        s3_options: Optional[S3Options] = None
+) -> Iterator[list]:
+    """
+    Delete all resources with some (<tag_key>, <tag_value>) tag pair, given some region. IAM
+    entities are rescanned on every call, unless <iam_cache> is True, in which case they are
+    looked up in a process-level cache shared by every call that opts in. If <stream> is True,
+    resources are deleted as soon as discovery finds them, while later pages and the IAM scan
+    are still being fetched. Discovery can be limited to
+    some "<service>" or "<service>:<resource_type>" specs (e.g. "ec2:instance") with
+    <resource_types>, and <exclude_resource_types> leaves matching resources untouched.
+    If an <inventory> populated by record_resources is given, resources are read from it
+    instead of being rediscovered, and are marked as deleted in it once destroyed. If
+    <prewarm_models> is True, the delete modules and service models of the selected resource
+    types are loaded on a background thread while discovery runs (see prewarm). Clients are
+    taken from <engine>, or from the process-level default engine if it is None. If <client_config>
+    is given, clients are instead created for this call with its settings applied on top of the
+    engine's, and closed once it finishes. It is either a ClientConfig for every service or a
+    {<service>: ClientConfig} map, where a "*" entry applies to every service. If <max_workers>
+    is given, up to that many resources are destroyed at once on a thread pool, and only a bounded
+    number of them run ahead of the consumer. Their reports are yielded as they complete. If
+    <ordered> is True, reports are yielded in discovery order (or, with <plan>, in discovery order
+    within each level) instead, at the cost of waiting on each batch of EC2 instances in its place
+    rather than overlapping the wait with the other deletes. If <plan> is True, resources are
+    destroyed in dependency order (e.g. instances before their security groups and volumes, usage
+    plans before stages before rest APIs, and roles and users before their policies), one level at
+    a time with the resources of each level destroyed in parallel. Streaming sweeps can't be planned.
+    S3 buckets are emptied and deleted with the settings of <s3_options> (the S3Options defaults if
+    None).
+    """
+
+    if plan and stream:
+        raise ValueError("Streaming sweeps can't be planned, since not every resource is known up front")
+
+    engine = resolve_engine(engine)
+
+    if client_config is not None:
+        with engine.configured(*split_client_config(client_config)) as configured:
+            yield from delete_resources(
+                tag_key, tag_value, region, dry, iam_cache, stream, resource_types, exclude_resource_types,
+                inventory, prewarm_models, configured, max_workers=max_workers, ordered=ordered, plan=plan,
+                s3_options=s3_options
+            )
+        return
+
+    type_filter = TypeFilter(resource_types, exclude_resource_types)
+
+    if prewarm_models:
+        _start_prewarm(type_filter, engine)
 
-    resource_groups_tagging_client = boto3.client("resourcegroupstaggingapi", region_name=region)
-    # Retrieve ARNs of all objects with the supplied name/tag pair using the ResourceGroupsTaggingApi.
-    # Note that this API does not support *all* AWS resource types, so some manual ARN querying is
-    # performed below.
-    ret.extend(
-        aws.resource_groups_tagging.get_resources_by_tag(
-            resource_groups_tagging_client, tag_key, tag_value
+    if inventory is not None:
+        yield from _destroy_from_inventory(
+            inventory, tag_key, tag_value, region, dry, type_filter, engine, max_workers, ordered, plan, s3_options
         )
+        return
+
+    if stream:
+        yield from _stream_destroy(
+            _regional_discovery_sources(tag_key, tag_value, region, type_filter, engine) +
+            _global_discovery_sources(tag_key, tag_value, region, iam_cache, type_filter, engine),
+            region, dry, engine, max_workers, ordered, s3_options
+        )
+        return
+
+    # Retrieve ARNs of all objects with the supplied name/tag pair
+    resource_arns, discovery_failures = get_all_resources_with_tag(
+        tag_key, tag_value, region, iam_cache, type_filter, engine
     )
 
-    iam_client = boto3.client("iam", region_name=region)
-    # Retrieve ARNs of all IAM Users with supplied key/value tag pair
-    ret.extend(
-        aws.iam.get_all_user_arns_with_tags(iam_client, [(tag_key, tag_value)])
+    # Report any discovery source that failed, the resources found by other sources are still deleted
+    for failure in discovery_failures:
+        yield [failure]
+
+    yield from _destroy_arns(resource_arns, region, dry, engine, max_workers, ordered, plan, s3_options)
+
+
+def delete_resources_batch(
+        tags: List[Union[Tuple[str, str], str]],
+        region: str = "us-east-1",
+        dry=True,
+        tag_key: Optional[str] = None,
+        iam_cache: bool = False,
+        resource_types: Optional[List[str]] = None,
+        exclude_resource_types: Optional[List[str]] = None,
+        engine: Optional[Engine] = None,
+        s3_options: Optional[S3Options] = None
+) -> Iterator[list]:
+    """
+    Delete all resources with any of several tag pairs in some region, discovering all of them
+    in a single pass. Each entry of <tags> is either a (<tag_key>, <tag_value>) pair or a bare
+    tag value, which is paired with <tag_key>. Every log message carries a "tag" field holding
+    the {"Key": ..., "Value": ...} pair that selected its resource. S3 buckets are emptied and
+    deleted with the settings of <s3_options>, as in delete_resources.
+    """
+
+    yield from _delete_resources_with_tags(
+        _normalize_tags(tags, tag_key), region, dry, iam_cache,
+        type_filter=TypeFilter(resource_types, exclude_resource_types), engine=resolve_engine(engine),
+        s3_options=s3_options
     )
-    # Retrieve ARNs of all IAM Roles with supplied key/value tag pair
-    ret.extend(
-        aws.iam.get_all_role_arns_with_tags(iam_client, [(tag_key, tag_value)])
+
+
+def delete_resources_matching(
+        tag_key: str,
+        value_pattern: str,
+        region: str = "us-east-1",
+        dry=True,
+        iam_cache: bool = False,
+        resource_types: Optional[List[str]] = None,
+        exclude_resource_types: Optional[List[str]] = None,
+        engine: Optional[Engine] = None,
+        s3_options: Optional[S3Options] = None
+) -> Iterator[list]:
+    """
+    Delete all resources in some region whose <tag_key> tag has a value matching a glob pattern,
+    e.g. "B3DTEST_*" to match every value with that prefix. Matching values are listed with the
+    ResourceGroupsTaggingApi and the IAM tag index, then swept together as in delete_resources_batch,
+    so every log message carries a "tag" field holding the pair that selected its resource. If the
+    values can't be listed from one of those sources, a failure log message is yielded for it and
+    the values from the other are still swept. S3 buckets are emptied and deleted with the settings
+    of <s3_options>, as in delete_resources.
+    """
+
+    engine = resolve_engine(engine)
+    resource_groups_tagging_client = engine.client("resourcegroupstaggingapi", region)
+    iam_client = engine.client("iam", region)
+    iam_index = None
+    values = []
+
+    # A source whose values can't be listed is reported, and values from the other source are still swept
+    try:
+        values += aws.resource_groups_tagging.get_tag_values(resource_groups_tagging_client, tag_key)
+    except Exception as e:  # pylint: disable=broad-except
+        yield [log_msg.log_msg_discovery_failure("resourcegroupstaggingapi", e)]
+    try:
+        iam_index = aws.iam.get_tag_index(iam_client, use_cache=iam_cache)
+        values += aws.iam.tag_values(iam_index, tag_key)
+    except Exception as e:  # pylint: disable=broad-except
+        yield [log_msg.log_msg_discovery_failure("iam", e)]
+
+    yield from _delete_resources_with_tags(
+        [(tag_key, value) for value in dict.fromkeys(values) if fnmatch.fnmatchcase(value, value_pattern)],
+        region, dry, iam_cache, iam_index, TypeFilter(resource_types, exclude_resource_types), engine, s3_options
     )
-    # Retrieve ARNs of all IAM Policies with supplied key/value tag pair
-    ret.extend(
-        aws.iam.get_all_policy_arns_with_tags(iam_client, [(tag_key, tag_value)])
+
+
+def _delete_resources_with_tags(
+        tags: List[Tuple[str, str]],
+        region: str,
+        dry: bool,
+        iam_cache: bool,
+        iam_index: Optional[Dict] = None,
+        type_filter: TypeFilter = TypeFilter(),
+        engine: Optional[Engine] = None,
+        s3_options: Optional[S3Options] = None
+) -> Iterator[list]:
+    """
+    Discover resources with any of several tag pairs in one pass, destroy them, and add a "tag"
+    field to every log message
+    """
+
+    if len(tags) == 0:
+        return
+
+    resource_tags, discovery_failures = _get_all_resources_with_tags(
+        tags, region, iam_cache, iam_index, type_filter, engine
     )
 
-    return ret
+    for failure in discovery_failures:
+        yield [failure]
+
+    unsupported = collections.Counter()
+    for arn, report in _destroy_each(list(resource_tags), region, dry, unsupported, engine, s3_options=s3_options):
+        key, value = resource_tags[arn]
+        yield log_msg.annotate(report, tag={"Key": key, "Value": value})
+    yield from unsupported_summary(unsupported)
+
+
+def record_resources(
+        tag_key: str,
+        tag_value: str,
+        inventory: Inventory,
+        region: str = "us-east-1",
+        iam_cache: bool = False,
+        edges: bool = True,
+        resource_types: Optional[List[str]] = None,
+        exclude_resource_types: Optional[List[str]] = None,
+        engine: Optional[Engine] = None
+) -> List[Dict]:
+    """
+    Discover all resources with some (<tag_key>, <tag_value>) tag pair in some region and write
+    them, with their tags and discovery source, to an inventory. Resources are streamed into the
+    inventory in batches as discovery produces them. If <edges> is True, dependency edges between
+    the recorded resources and the resources they are attached to are recorded afterwards. Returns
+    log messages for any discovery source that failed.
+    """
+
+    engine = resolve_engine(engine)
+    type_filter = TypeFilter(resource_types, exclude_resource_types)
+    resource_groups_tagging_client = engine.client("resourcegroupstaggingapi", region)
+    iam_client = engine.client("iam", region)
+
+    def _tagging_source():
+        for r in aws.resource_groups_tagging.iter_resources_by_tag_values(
+            resource_groups_tagging_client, tag_key, [tag_value], type_filter.resource_type_filters()
+        ):
+            yield _inventory_row(r["ResourceARN"], r["Tags"], "resourcegroupstaggingapi")
+
+    def _iam_source():
+        for e in aws.iam.get_all_entities_with_tags(iam_client, [(tag_key, tag_value)], use_cache=iam_cache):
+            yield _inventory_row(e["Arn"], e["Tags"], "iam")
+
+    failures = []
 
+    def _rows():
+        for row, failure in utils.concurrency.merge_generators(
+            [
+                functools.partial(_stream_discovery_source, name, source)
+                for name, source in [("resourcegroupstaggingapi", _tagging_source), ("iam", _iam_source)]
+            ],
+            DISCOVERY_MAX_WORKERS, STREAM_BUFFER_SIZE
+        ):
+            if failure is not None:
+                failures.append(failure)
+            elif type_filter.selects(row["service"], row["resource_type"]):
+                yield row
 
-def _parse_api_gateway_arn(arn: str):
+    inventory.add_resources(_rows())
+
+    if edges:
+        inventory.add_edges(_dependency_edges(inventory, tag_key, tag_value, region, engine))
+
+    return failures
+
+
+def _inventory_row(arn: str, tags: List[Dict], source: str) -> Dict:
     """
-    Custom parsing rules for API Gateway ARNs
+    Produce an inventory row for a discovered resource
     """
 
-    splt = arn.split(":")
-    resource_path = splt[-1].split("/")
+    parsed_arn = utils.arn.parse(arn)
+    return {
+        "arn": arn,
+        "partition": parsed_arn.partition,
+        "service": parsed_arn.service,
+        "region": parsed_arn.region,
+        "account": parsed_arn.account,
+        "resource_type": parsed_arn.resource_type,
+        "resource_id": parsed_arn.resource_id,
+        "source": source,
+        "tags": tags
+    }
+
 
-    if len(resource_path) > 3 and resource_path[3] == "stages":
-        # Form /restapis/<api_id>/stages/<stage_name>
-        return "apigateway", "stages"
-    # Form /<resource-type>/<resource_id>
-    return "apigateway", resource_path[1]
+def _dependency_edges(
+        inventory: Inventory, tag_key: str, tag_value: str, region: str, engine: Optional[Engine] = None
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    Yield (<from_arn>, <to_arn>, <relation>) edges for the recorded resources with some tag pair
+    (see planner.dependency_edges)
+    """
+    return planner.dependency_edges(
+        inventory.arns(tag_key=tag_key, tag_value=tag_value, region=region), region, engine
+    )
 
 
-def _parse_arn(arn: str):
+def _destroy_from_inventory(
+        inventory: Inventory,
+        tag_key: str,
+        tag_value: str,
+        region: str,
+        dry: bool,
+        type_filter: TypeFilter,
+        engine: Optional[Engine] = None,
+        max_workers: Optional[int] = None,
+        ordered: bool = False,
+        plan: bool = False,
+        s3_options: Optional[S3Options] = None
+) -> Iterator[list]:
     """
-    Parse an ARN with the following form:
-    'arn:aws:<SERVICE>:<REGION>:<ACCT_ID>:<RESOURCE_TYPE>/<RESOURCE_ID>'
-    and return (<SERVICE>, <RESOURCE_TYPE>) tuples for each ARN.
+    Destroy the resources recorded in an inventory with some tag pair, marking each resource whose
+    report is entirely successful (or empty, when there was nothing left to delete) as deleted. If
+    <plan> is True, they are destroyed in the order given by the dependency edges recorded in the
+    inventory.
     """
 
-    splt = arn.split(":")
+    unsupported = collections.Counter()
+    resource_arns = type_filter.parse_selected(inventory.arns(tag_key=tag_key, tag_value=tag_value, region=region))
+    if plan:
+        pairs = _destroy_levels(
+            planner.delete_levels(resource_arns, inventory.edges()), region, dry, unsupported, engine,
+            max_workers, ordered, s3_options, include_empty=True
+        )
+    else:
+        pairs = _destroy_each(
+            resource_arns, region, dry, unsupported, engine, max_workers, ordered, s3_options, include_empty=True
+        )
+
+    for arn, report in pairs:
+        if not dry and all(msg["result"] == "success" for msg in report):
+            inventory.mark_deleted([str(arn)])
+        if len(report) > 0:
+            yield report
+    yield from unsupported_summary(unsupported)
 
-    # API Gateway ARNs have at least one corner case
-    if splt[2] == "apigateway":
-        return _parse_api_gateway_arn(arn)
 
-    if splt[2] == "s3":
-        # The ResourceGroupsTaggingApi only supports S3 buckets and we
-        # don't support a manual search-object-with-tag process for other
-        # S3 objects at this time
-        return "s3", "bucket"
+def _stream_destroy(
+        sources: List[Tuple[str, Callable[[], Iterable]]],
+        region: str,
+        dry: bool,
+        engine: Optional[Engine] = None,
+        max_workers: Optional[int] = None,
+        ordered: bool = False,
+        s3_options: Optional[S3Options] = None
+) -> Iterator[list]:
+    """
+    Destroy resources as the discovery sources produce them, yielding failure reports for
+    sources that fail along the way
+    """
+
+    unsupported = collections.Counter()
+    failures = []
 
-    if splt[2] == "lambda":
-        return "lambda", splt[-2]
+    def _discovered_arns() -> Iterator[Arn]:
+        for arn, failure in _stream_discovery_sources(sources):
+            if failure is not None:
+                failures.append(failure)
+            else:
+                yield arn
 
-    return splt[2], splt[-1].split("/")[0]
+    for _, report in _destroy_each(
+        _discovered_arns(), region, dry, unsupported, engine, max_workers, ordered, s3_options
+    ):
+        while len(failures) > 0:
+            yield [failures.pop(0)]
+        yield report
+    for failure in failures:
+        yield [failure]
+    yield from unsupported_summary(unsupported)
 
 
-def _map_arn(arn: str):
+def _destroy_arns(
+        resource_arns: Iterable[Arn],
+        region: str,
+        dry: bool,
+        engine: Optional[Engine] = None,
+        max_workers: Optional[int] = None,
+        ordered: bool = False,
+        plan: bool = False,
+        s3_options: Optional[S3Options] = None
+) -> Iterator[list]:
     """
-    Map an ARN to its corresponding entry in DELETE_PROTOCOL_OBJECT_MAP. If it has no
-    corresponding entry (i.e. - this library doesn't currently support that resource
-    type), then the UnsupportedResource delete object is returned.
+    Destroy each resource (see _destroy_each) and yield its (nonempty) report, followed by a single
+    summary report for any resources of unsupported types. If <plan> is True, the dependencies
+    between the resources are looked up first, and the resources are destroyed level by level
+    (see _destroy_levels).
     """
 
-    parsed_arn = _parse_arn(arn)
-    try:
-        return DELETE_PROTOCOL_OBJECT_MAP[parsed_arn[0]][parsed_arn[1]]
-    except KeyError:
-        return DELETE_PROTOCOL_OBJECT_MAP["unsupported-service"]["unsupported-resource"]
+    unsupported = collections.Counter()
+    if plan:
+        resource_arns = list(resource_arns)
+        try:
+            edges = list(planner.dependency_edges(resource_arns, region, engine))
+        except Exception as e:  # pylint: disable=broad-except
+            # Without the dependencies, every resource is still destroyed, just in discovery order
+            yield [log_msg.log_msg_plan_failure(e)]
+            edges = []
+        pairs = _destroy_levels(
+            planner.delete_levels(resource_arns, edges), region, dry, unsupported, engine, max_workers, ordered,
+            s3_options
+        )
+    else:
+        pairs = _destroy_each(resource_arns, region, dry, unsupported, engine, max_workers, ordered, s3_options)
 
+    for _, report in pairs:
+        yield report
+    yield from unsupported_summary(unsupported)
 
-def _map_arns(arns: list) -> zip:
+
+def _destroy_levels(
+        levels: List[List[Arn]],
+        region: str,
+        dry: bool,
+        unsupported: collections.Counter,
+        engine: Optional[Engine] = None,
+        max_workers: Optional[int] = None,
+        ordered: bool = False,
+        s3_options: Optional[S3Options] = None,
+        include_empty: bool = False
+) -> Iterator[Tuple[Arn, list]]:
     """
-    Map each ARN to its corresponding delete protocol object.
+    Destroy each level of a delete plan (see planner.delete_levels) in turn, with up to <max_workers>
+    (PLAN_MAX_WORKERS if None) resources of a level destroyed at once. Every resource of a level,
+    including the termination of its EC2 instances, is finished before the next level starts.
     """
 
-    mapped_arns = [_map_arn(arn) for arn in arns]
-    return zip(arns, mapped_arns)
+    for level in levels:
+        yield from _destroy_each(
+            level, region, dry, unsupported, engine, PLAN_MAX_WORKERS if max_workers is None else max_workers,
+            ordered, s3_options, include_empty
+        )
 
 
-def delete_resources(tag_key: str, tag_value: str, region: str = "us-east-1", dry=True) -> Iterator[list]:
+def _destroy_each(
+        resource_arns: Iterable[Arn],
+        region: str,
+        dry: bool,
+        unsupported: collections.Counter,
+        engine: Optional[Engine] = None,
+        max_workers: Optional[int] = None,
+        ordered: bool = False,
+        s3_options: Optional[S3Options] = None,
+        include_empty: bool = False
+) -> Iterator[Tuple[Arn, list]]:
     """
-    Delete all resources with some (<tag_key>, <tag_value>) tag pair, given some region
+    Destroy each resource in turn and yield (<arn>, <report>) pairs for nonempty reports, or for
+    every report if <include_empty> is True.
+    Resources of unsupported types are not destroyed, but are counted in <unsupported>, keyed
+    on their (<service>, <resource_type>) pair. Resources of the same type are destroyed together
+    with their delete object's destroy_many (see destroy_groups), and a list of resources is grouped
+    by type first. EC2 instances are terminated in batches that are waited on in the background,
+    so their reports are yielded as each of them is terminated while the other resources are
+    destroyed. Security groups and volumes are the exception: they can't be deleted while an instance
+    still uses them, so they are held back until every instance has terminated. If <max_workers> is
+    given, up to that many groups are destroyed at once, and their reports are yielded as they
+    complete. If <ordered> is True, reports are instead yielded in the order of <resource_arns>:
+    resources are not grouped by type first, and instances are waited on in their place rather than
+    in the background. S3 buckets are destroyed with <s3_options> (see dispatch.map_arns).
     """
 
-    # Retrieve ARNs of all objects with the supplied name/tag pair
-    resource_arns = _get_all_resources_with_tag(tag_key, tag_value, region)
+    instance_procedure = DELETE_PROTOCOL_OBJECT_MAP["ec2"]["instance"]
+    held_back_procedures = {
+        DELETE_PROTOCOL_OBJECT_MAP["ec2"]["security-group"], DELETE_PROTOCOL_OBJECT_MAP["ec2"]["volume"]
+    }
 
     # Map each ARN to it's corresponding delete object
-    mapped_arns = _map_arns(resource_arns)
+    mapped_arns = map_arns(resource_arns, s3_options)
+    if isinstance(resource_arns, list) and not ordered:
+        # Start terminating every instance before anything else, so the wait overlaps the other deletes
+        mapped_arns = group_by_type(mapped_arns, instance_procedure)
+
+    terminations = utils.concurrency.BackgroundGenerators()
+    held_back = []
+
+    def _destroyable() -> Iterator[Tuple[Any, List[Arn]]]:
+        terminating = False
+        for obj, arns in destroy_groups(mapped_arns, unsupported):
+            if obj is instance_procedure and not ordered:
+                terminations.start(functools.partial(obj.destroy_many, arns, region, dry, engine))
+                terminating = True
+            elif terminating and obj in held_back_procedures:
+                held_back.append((obj, arns))
+            else:
+                yield obj, arns
 
     # For each resource, detach it from all dependent objects, delete it, and produce a report
     # of all performed actions, whether they were successful, and error messages for any actions
     # that were unsuccessful.
-    for arn, obj in mapped_arns:
+    def _destroy(group: Tuple[Any, List[Arn]]) -> List[Tuple[Arn, list]]:
+        obj, arns = group
+        pairs = list(obj.destroy_many(arns, region, dry, engine=engine))
+        if ordered:
+            # destroy_many may yield as each resource finishes (e.g. instances as they terminate)
+            positions = {arn: i for i, arn in enumerate(arns)}
+            pairs.sort(key=lambda pair: positions.get(pair[0], len(arns)))
+        return pairs
 
-        report = obj.destroy(arn, region, dry)
-        # Some reports are empty (e.g. KMS keys that have already been scheduled for deletion are
-        # picked up by the ResourceGroupsTaggingApi)
-        if len(report) > 0:
-            yield report
+    def _reports(groups: Iterable[Tuple[Any, List[Arn]]]) -> Iterator[Tuple[Arn, list]]:
+        if max_workers is None:
+            results = map(_destroy, groups)
+        else:
+            results = utils.concurrency.bounded_map(_destroy, groups, max_workers, ordered=ordered)
+
+        for pairs in results:
+            for arn, report in pairs:
+                # Some reports are empty (e.g. KMS keys that have already been scheduled for deletion are
+                # picked up by the ResourceGroupsTaggingApi)
+                if include_empty or len(report) > 0:
+                    yield arn, report
+
+            yield from terminations.ready()
+
+    yield from _reports(_destroyable())
+    yield from terminations.drain()
+
+    # The security groups and volumes that the terminated instances may have been using are free by now
+    yield from _reports(held_back)
+
+
+def _sweep(
+        sources: List[Tuple[str, Callable]], region: str, label: str, dry: bool,
+        arn_filter: Callable[[Arn], bool] = lambda arn: True, engine: Optional[Engine] = None,
+        s3_options: Optional[S3Options] = None
+) -> Iterator[list]:
+    """
+    Discover and destroy the resources found by some discovery sources, adding a "region" field
+    with value <label> to every log message. Failures are reported rather than raised so that
+    one region can't end a multi-region sweep.
+    """
+
+    try:
+        resource_arns, discovery_failures = _run_discovery_sources(sources)
+        for failure in discovery_failures:
+            yield log_msg.annotate([failure], region=label)
+        for report in _destroy_arns(
+            [arn for arn in resource_arns if arn_filter(arn)], region, dry, engine, s3_options=s3_options
+        ):
+            yield log_msg.annotate(report, region=label)
+    except Exception as e:  # pylint: disable=broad-except
+        yield log_msg.annotate([log_msg.log_msg_sweep_failure(label, e)], region=label)
+
+
+def delete_resources_multi_region(
+        tag_key: str,
+        tag_value: str,
+        regions: Optional[List[str]] = None,
+        dry=True,
+        iam_cache: bool = False,
+        global_region: str = "us-east-1",
+        max_workers: int = MULTI_REGION_MAX_WORKERS,
+        resource_types: Optional[List[str]] = None,
+        exclude_resource_types: Optional[List[str]] = None,
+        engine: Optional[Engine] = None,
+        s3_options: Optional[S3Options] = None
+) -> Iterator[list]:
+    """
+    Delete all resources with some (<tag_key>, <tag_value>) tag pair across several regions. If
+    <regions> is None, every region enabled for this account is swept (if they can't be listed, a
+    failure report is yielded first and only global resources are swept). Each region is discovered
+    and deleted on its own worker, while global (IAM) resources are discovered and deleted exactly
+    once, from <global_region>. Reports are yielded as soon as any worker produces them, and every
+    log message carries a "region" field ("global" for IAM resources). S3 buckets are emptied and
+    deleted with the settings of <s3_options>, as in delete_resources.
+    """
+
+    engine = resolve_engine(engine)
+    type_filter = TypeFilter(resource_types, exclude_resource_types)
+
+    if regions is None:
+        try:
+            regions = aws.ec2.get_enabled_regions(engine.client("ec2", global_region))
+        except Exception as e:  # pylint: disable=broad-except
+            # Global resources are still swept, but the failure is reported before anything else
+            yield log_msg.annotate([log_msg.log_msg_regions_failure(e)], region=global_region)
+            regions = []
+
+    # Each worker gets its clients from the shared engine, which creates each of them only once
+    sweeps = [
+        functools.partial(
+            _sweep, _global_discovery_sources(tag_key, tag_value, global_region, iam_cache, type_filter, engine),
+            global_region, "global", dry, engine=engine, s3_options=s3_options
+        )
+    ] + [
+        functools.partial(
+            _sweep, _regional_discovery_sources(tag_key, tag_value, region, type_filter, engine),
+            region, region, dry, lambda arn: not arn.is_global, engine, s3_options
+        )
+        for region in dict.fromkeys(regions)
+    ]
+
+    yield from utils.concurrency.merge_generators(sweeps, max_workers)
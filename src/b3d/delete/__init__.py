@@ -1,9 +1,14 @@
 """
 Abstract class definition for AWS resource delete procedures
 """
+from __future__ import annotations
 import abc
-from typing import List, Dict
-import boto3
+from typing import Iterator, List, Dict, Tuple, Union, Optional
+from b3d.engine import Engine
+from b3d.utils.arn import Arn, parse
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
 
 
 class Service(abc.ABC):
@@ -24,15 +29,15 @@ class Service(abc.ABC):
         """
 
         @staticmethod
-        def extract_resource_id_from_arn(arn: str) -> str:
+        def extract_resource_id_from_arn(arn: Union[str, Arn]) -> str:
             """
-            Extract resource ID from ARN string
+            Extract resource ID from an ARN
             """
-            return arn.split("/")[-1]
+            return parse(arn).resource_id
 
         @staticmethod
         @abc.abstractmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
             """
             Determine if this resource exists.
             """
@@ -46,7 +51,29 @@ class Service(abc.ABC):
 
         @staticmethod
         @abc.abstractmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None) -> List[Dict]:
+            """
+            Destroy the resource corresponding to this ARN, which has been parsed once at discovery,
+            with clients from <engine> (the default engine if None).
+            """
+
+        @staticmethod
+        def batch_size() -> int:
             """
-            Destroy the resource corresponding to this ARN.
+            Return the largest number of resources of this type that destroy_many is given at once
+            (1 unless destroy_many is overridden with a bulk implementation)
             """
+            return 1
+
+        @classmethod
+        def destroy_many(
+                cls, arns: List[Arn], region: str, dry: bool = True, engine: Optional[Engine] = None
+        ) -> Iterator[Tuple[Arn, List[Dict]]]:
+            """
+            Destroy several resources of this type, yielding an (<arn>, <report>) pair for each of them.
+            By default each resource is destroyed in turn with destroy; resource types whose service has
+            a bulk delete call override this (along with batch_size) to destroy them together.
+            """
+
+            for arn in arns:
+                yield arn, cls.destroy(arn, region, dry, engine=engine)
@@ -1,11 +1,16 @@
 """
 Delete procedures for ApiGateway resources
 """
-from typing import List, Dict
-import boto3
+from __future__ import annotations
+from typing import List, Dict, Optional
 from b3d.delete import Service
 from b3d import aws
 from b3d.utils import log_msg
+from b3d.engine import Engine, resolve as resolve_engine
+from b3d.utils.arn import Arn
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
 
 
 class ApiGateway(Service):
@@ -52,17 +57,17 @@ class ApiGateway(Service):
             return "restapis"
 
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
             return aws.api_gateway.get_rest_api(
                 cl, ApiGateway.RestApi.extract_resource_id_from_arn(resource_arn)
             ) is not None
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None) -> List[Dict]:
 
             resps = []
-            cl = boto3.client("apigateway", region_name=region)
-            api_id = ApiGateway.RestApi.extract_resource_id_from_arn(arn)
+            cl = resolve_engine(engine).client("apigateway", region)
+            api_id = arn.resource_id
 
             if not ApiGateway.RestApi.query(cl, arn):
                 return resps
@@ -93,7 +98,7 @@ class ApiGateway(Service):
             return "usageplans"
 
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
             return aws.api_gateway.get_usage_plan(
                 cl, ApiGateway.UsagePlan.extract_resource_id_from_arn(resource_arn)
             ) is not None
@@ -126,11 +131,11 @@ class ApiGateway(Service):
             return resps
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None) -> List[Dict]:
 
             resps = []
-            cl = boto3.client("apigateway", region_name=region)
-            usage_plan_id = ApiGateway.UsagePlan.extract_resource_id_from_arn(arn)
+            cl = resolve_engine(engine).client("apigateway", region)
+            usage_plan_id = arn.resource_id
 
             if not ApiGateway.UsagePlan.query(cl, arn):
                 return resps
@@ -160,11 +165,11 @@ class ApiGateway(Service):
             return "stages"
 
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
             return True
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None) -> List[Dict]:
             return []
 
     class ApiKey(Service.Resource):
@@ -177,16 +182,16 @@ class ApiGateway(Service):
             return "apikeys"
 
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
             return aws.api_gateway.get_api_key(
                 cl, ApiGateway.ApiKey.extract_resource_id_from_arn(resource_arn)
             ) is not None
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None) -> List[Dict]:
 
-            cl = boto3.client("apigateway", region_name=region)
-            api_key_id = ApiGateway.ApiKey.extract_resource_id_from_arn(arn)
+            cl = resolve_engine(engine).client("apigateway", region)
+            api_key_id = arn.resource_id
 
             if not ApiGateway.ApiKey.query(cl, arn):
                 return []
@@ -1,11 +1,16 @@
 """
 Delete procedures for EC2 resources
 """
-from typing import List, Dict
-import boto3
+from __future__ import annotations
+from typing import Iterator, List, Dict, Optional, Tuple
 from b3d.delete import Service
-from b3d import aws
+from b3d import aws, utils
 from b3d.utils import log_msg
+from b3d.engine import Engine, resolve as resolve_engine
+from b3d.utils.arn import Arn
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
 
 
 class EC2(Service):
@@ -27,7 +32,7 @@ class EC2(Service):
             return "instance"
 
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
 
             instance_data = aws.ec2.get_instance(
                 cl, EC2.Instance.extract_resource_id_from_arn(resource_arn)
@@ -42,20 +47,10 @@ class EC2(Service):
                 return False
 
         @staticmethod
-        def _detach_all_security_groups(cl: boto3.client, instance_id: str, dry: bool):
+        def _detach_security_groups(cl: boto3.client, instance_id: str, all_groups: List[str], dry: bool):
 
             resps = []
 
-            instance_resp = aws.ec2.get_instance(cl, instance_id)
-            try:
-                all_groups = [
-                    sg["GroupId"] for sg in
-                    instance_resp["Reservations"][0]["Instances"][0].get("SecurityGroups", [])
-                ]
-            # Instance terminated but not cleaned up yet
-            except IndexError:
-                return []
-
             for sg in all_groups:
                 resps.append(
                     log_msg.log_msg_detach(
@@ -72,28 +67,94 @@ class EC2(Service):
             return resps
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None) -> List[Dict]:
+            return next((report for _, report in EC2.Instance.destroy_many([arn], region, dry, engine)), [])
 
-            resps = []
-            cl = boto3.client("ec2", region_name=region)
-            instance_id = EC2.Instance.extract_resource_id_from_arn(arn)
+        @staticmethod
+        def batch_size() -> int:
+            return aws.ec2.TERMINATE_MAX_INSTANCES
 
-            if not EC2.Instance.query(cl, arn):
-                return resps
+        @staticmethod
+        def destroy_many(
+                arns: List[Arn], region: str, dry: bool = True, engine: Optional[Engine] = None
+        ) -> Iterator[Tuple[Arn, List[Dict]]]:
+            """
+            Destroy several instances together. Security groups are detached from each instance, the
+            instances are terminated with one call per TERMINATE_MAX_INSTANCES of them, and then all of
+            them are waited on by a single polling loop. Yields (<arn>, <report>) pairs as each instance
+            is terminated. Instances that no longer exist or are already terminated are skipped.
+            """
 
-            # Detach all security groups from this instance
-            resps.extend(EC2.Instance._detach_all_security_groups(cl, instance_id, dry))
+            cl = resolve_engine(engine).client("ec2", region)
+            finished, terminating = EC2.Instance.begin_termination(cl, arns, dry)
+            yield from finished
 
-            # Terminate this instance
-            resps.append(
-                log_msg.log_msg_destroy(
-                    resource_type="instance",
-                    resource_id=instance_id,
-                    resp=aws.ec2.delete_instance(cl, instance_id, dry=dry)
+            # Wait for every terminating instance at once
+            for instance_id, terminated in aws.ec2.wait_for_instances_terminated(cl, list(terminating)):
+                yield EC2.Instance.termination_report(terminating[instance_id], terminated)
+
+        @staticmethod
+        def begin_termination(
+                cl: boto3.client, arns: List[Arn], dry: bool
+        ) -> Tuple[List[Tuple[Arn, List[Dict]]], Dict[str, Tuple[Arn, List[Dict], Dict]]]:
+            """
+            Detach security groups from some instances and terminate them in batches, without waiting.
+            Returns the (<arn>, <report>) pairs of instances that are already done with (batches that
+            failed, instances that could not be described, and dry runs), and the instances being
+            terminated, as {<instance_id>: (<arn>, <report so far>, <terminate response>)}.
+            """
+
+            arns_by_id = {arn.resource_id: arn for arn in arns}
+
+            resp = aws.ec2.describe_instances_by_ids(cl, list(arns_by_id))
+            if resp["ResponseMetadata"]["HTTPStatusCode"] != 200:
+                return [
+                    (arn, [log_msg.log_msg_destroy(resource_type="instance", resource_id=instance_id, resp=resp)])
+                    for instance_id, arn in arns_by_id.items()
+                ], {}
+
+            # Detach all security groups from each instance
+            reports = {
+                instance["InstanceId"]: EC2.Instance._detach_security_groups(
+                    cl, instance["InstanceId"], [sg["GroupId"] for sg in instance.get("SecurityGroups", [])], dry
                 )
-            )
+                for instance in resp["Instances"]
+                if instance["State"]["Name"] != "terminated"
+            }
+
+            # Terminate the instances in batches, reporting right away on batches that fail (and dry runs)
+            finished = []
+            terminating = {}
+            for batch in utils.concurrency.chunks(reports, aws.ec2.TERMINATE_MAX_INSTANCES):
+                resp = aws.ec2.terminate_instances(cl, batch, dry=dry)
+                for instance_id in batch:
+                    if dry or resp["ResponseMetadata"]["HTTPStatusCode"] != 200:
+                        finished.append((arns_by_id[instance_id], reports[instance_id] + [
+                            log_msg.log_msg_destroy(resource_type="instance", resource_id=instance_id, resp=resp)
+                        ]))
+                    else:
+                        terminating[instance_id] = (arns_by_id[instance_id], reports[instance_id], resp)
+
+            return finished, terminating
 
-            return resps
+        @staticmethod
+        def termination_report(
+                termination: Tuple[Arn, List[Dict], Dict], terminated: bool, waited: Optional[float] = None
+        ) -> Tuple[Arn, List[Dict]]:
+            """
+            Produce the (<arn>, <report>) pair for an instance that begin_termination started terminating,
+            once it is either terminated or no longer waited on (after <waited> seconds, by default the
+            longest wait of wait_for_instances_terminated)
+            """
+
+            arn, report, resp = termination
+            if not terminated:
+                if waited is None:
+                    waited = aws.ec2.TERMINATED_POLL_INTERVAL * (aws.ec2.TERMINATED_MAX_POLLS - 1)
+                resp = aws.ec2.instance_not_terminated_resp(arn.resource_id, waited)
+            return arn, report + [
+                log_msg.log_msg_destroy(resource_type="instance", resource_id=arn.resource_id, resp=resp)
+            ]
 
     class SecurityGroup(Service.Resource):
         """
@@ -105,7 +166,7 @@ class EC2(Service):
             return "security-group"
 
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
             return aws.ec2.get_security_group(
                 cl, EC2.SecurityGroup.extract_resource_id_from_arn(resource_arn)
             ) is not None
@@ -140,11 +201,11 @@ class EC2(Service):
             return resps
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None) -> List[Dict]:
 
             resps = []
-            cl = boto3.client("ec2", region_name=region)
-            security_group_id = EC2.SecurityGroup.extract_resource_id_from_arn(arn)
+            cl = resolve_engine(engine).client("ec2", region)
+            security_group_id = arn.resource_id
 
             if not EC2.SecurityGroup.query(cl, arn):
                 return resps
@@ -173,7 +234,7 @@ class EC2(Service):
             return "volume"
 
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
             return aws.ec2.get_volume(
                 cl, EC2.Volume.extract_resource_id_from_arn(resource_arn)
             ) is not None
@@ -208,11 +269,11 @@ class EC2(Service):
             return resps
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None) -> List[Dict]:
 
             resps = []
-            cl = boto3.client("ec2", region_name=region)
-            volume_id = EC2.Volume.extract_resource_id_from_arn(arn)
+            cl = resolve_engine(engine).client("ec2", region)
+            volume_id = arn.resource_id
 
             # Abort if this resource doesn't exist
             if not EC2.Volume.query(cl, arn):
@@ -1,11 +1,16 @@
 """
 Delete procedures for IAM resources
 """
-from typing import List, Dict
-import boto3
+from __future__ import annotations
+from typing import List, Dict, Optional
 from b3d.delete import Service
 from b3d import aws
 from b3d.utils import log_msg
+from b3d.engine import Engine, resolve as resolve_engine
+from b3d.utils.arn import Arn
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
 
 
 class IAM(Service):
@@ -17,6 +22,16 @@ class IAM(Service):
     def service_type() -> str:
         return "iam"
 
+    @staticmethod
+    def _forget_tags(arn: str, resp: dict, dry: bool) -> dict:
+        """
+        Drop a deleted entity from the process-level IAM tag index and pass its delete response through
+        """
+
+        if not dry and resp["ResponseMetadata"]["HTTPStatusCode"] in [200, 202, 204]:
+            aws.iam.TAG_INDEX_CACHE.invalidate(arn)
+        return resp
+
     class User(Service.Resource):
         """
         Delete procedure for User objects
@@ -27,7 +42,7 @@ class IAM(Service):
             return "user"
 
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
             return aws.iam.get_user(
                 cl, IAM.User.extract_resource_id_from_arn(resource_arn)
             ) is not None
@@ -104,14 +119,15 @@ class IAM(Service):
             return resps
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None) -> List[Dict]:
 
             resps = []
-            cl = boto3.client("iam", region_name=region)
-            user_name = IAM.User.extract_resource_id_from_arn(arn)
+            cl = resolve_engine(engine).client("iam", region)
+            user_name = arn.resource_id
 
             # Abort if this resource doesn't exist
             if not IAM.User.query(cl, arn):
+                aws.iam.TAG_INDEX_CACHE.invalidate(str(arn))
                 return resps
 
             # Remove permissions boundary for this user, if one exists
@@ -131,8 +147,8 @@ class IAM(Service):
             resps.append(
                 log_msg.log_msg_destroy(
                     resource_type="user",
-                    resource_id=arn,
-                    resp=aws.iam.delete_user(cl, user_name, dry)
+                    resource_id=str(arn),
+                    resp=IAM._forget_tags(str(arn), aws.iam.delete_user(cl, user_name, dry), dry)
                 )
             )
 
@@ -148,8 +164,8 @@ class IAM(Service):
             return "policy"
 
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
-            return aws.iam.get_policy(cl, resource_arn) is not None
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
+            return aws.iam.get_policy(cl, str(resource_arn)) is not None
 
         @staticmethod
         def _detach_from_users(cl: boto3.client, policy_arn: str, user_names: list, dry: bool) -> List[Dict]:
@@ -251,49 +267,51 @@ class IAM(Service):
             return resps
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None) -> List[Dict]:
 
             resps = []
-            cl = boto3.client("iam", region_name=region)
+            cl = resolve_engine(engine).client("iam", region)
+            policy_arn = str(arn)
 
             # Abort if this resource doesn't exist
             if not IAM.Policy.query(cl, arn):
+                aws.iam.TAG_INDEX_CACHE.invalidate(policy_arn)
                 return resps
 
             # Get IDs of all Users, Groups, and Roles that this policy is attached to
-            entities_attached = aws.iam.list_entities_policy_attached(cl, arn)
+            entities_attached = aws.iam.list_entities_policy_attached(cl, policy_arn)
 
             # Detach this policy from users
             resps.extend(
                 IAM.Policy._detach_from_users(
-                    cl, arn, [u.get("UserName") for u in entities_attached.get("PolicyUsers", [])], dry
+                    cl, policy_arn, [u.get("UserName") for u in entities_attached.get("PolicyUsers", [])], dry
                 )
             )
 
             # Detach this policy from groups
             resps.extend(
                 IAM.Policy._detach_from_groups(
-                    cl, arn, [g.get("GroupName") for g in entities_attached.get("PolicyGroups", [])], dry
+                    cl, policy_arn, [g.get("GroupName") for g in entities_attached.get("PolicyGroups", [])], dry
                 )
             )
 
             # Detach this policy from roles
             resps.extend(
                 IAM.Policy._detach_from_roles(
-                    cl, arn, [r.get("RoleName") for r in entities_attached.get("PolicyRoles", [])], dry
+                    cl, policy_arn, [r.get("RoleName") for r in entities_attached.get("PolicyRoles", [])], dry
                 )
             )
 
             resps.extend(
-                IAM.Policy._delete_non_default_versions(cl, arn, dry)
+                IAM.Policy._delete_non_default_versions(cl, policy_arn, dry)
             )
 
             # Delete default policy version
             resps.append(
                 log_msg.log_msg_destroy(
                     resource_type="policy",
-                    resource_id=IAM.Policy.extract_resource_id_from_arn(arn),
-                    resp=aws.iam.delete_policy(cl, arn, dry)
+                    resource_id=arn.resource_id,
+                    resp=IAM._forget_tags(policy_arn, aws.iam.delete_policy(cl, policy_arn, dry), dry)
                 )
             )
 
@@ -309,7 +327,7 @@ class IAM(Service):
             return "role"
 
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
             return aws.iam.get_role(
                 cl, IAM.Role.extract_resource_id_from_arn(resource_arn)
             ) is not None
@@ -357,14 +375,15 @@ class IAM(Service):
             return resps
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None) -> List[Dict]:
 
             resps = []
-            cl = boto3.client("iam", region_name=region)
-            role_name = IAM.Role.extract_resource_id_from_arn(arn)
+            cl = resolve_engine(engine).client("iam", region)
+            role_name = arn.resource_id
 
             # Abort if this resource doesn't exist
             if not IAM.Role.query(cl, arn):
+                aws.iam.TAG_INDEX_CACHE.invalidate(str(arn))
                 return resps
 
             # Remove permissions boundary from this role, if it exists
@@ -382,7 +401,7 @@ class IAM(Service):
                 log_msg.log_msg_destroy(
                     resource_type="role",
                     resource_id=role_name,
-                    resp=aws.iam.delete_role(cl, role_name, dry)
+                    resp=IAM._forget_tags(str(arn), aws.iam.delete_role(cl, role_name, dry), dry)
                 )
             )
 
@@ -1,11 +1,16 @@
 """
 Delete procedures for KMS resources
 """
-from typing import List, Dict
-import boto3
+from __future__ import annotations
+from typing import List, Dict, Optional
 from b3d.delete import Service
 from b3d import aws
 from b3d.utils import log_msg
+from b3d.engine import Engine, resolve as resolve_engine
+from b3d.utils.arn import Arn
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
 
 
 class KMS(Service):
@@ -27,7 +32,7 @@ class KMS(Service):
             return "key"
 
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
 
             key_data = aws.kms.get_key(
                 cl, KMS.Key.extract_resource_id_from_arn(resource_arn)
@@ -39,11 +44,11 @@ class KMS(Service):
             return key_data["KeyMetadata"].get("KeyState") != "PendingDeletion"
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None) -> List[Dict]:
 
             resps = []
-            cl = boto3.client("kms", region_name=region)
-            key_id = KMS.Key.extract_resource_id_from_arn(arn)
+            cl = resolve_engine(engine).client("kms", region)
+            key_id = arn.resource_id
 
             if not KMS.Key.query(cl, arn):
                 return resps
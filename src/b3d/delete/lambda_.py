@@ -1,11 +1,16 @@
 """
 Delete procedures for Lambda resources
 """
-from typing import List, Dict
-import boto3
+from __future__ import annotations
+from typing import List, Dict, Optional
 from b3d.delete import Service
 from b3d import aws
 from b3d.utils import log_msg
+from b3d.engine import Engine, resolve as resolve_engine
+from b3d.utils.arn import Arn
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
 
 
 class Lambda(Service):
@@ -22,26 +27,22 @@ class Lambda(Service):
         Delete procedure for Function objects
         """
 
-        @staticmethod
-        def extract_resource_id_from_arn(arn: str) -> str:
-            return arn.split(":")[-1]
-
         @staticmethod
         def resource_type() -> str:
             return "function"
 
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
             return aws.lambda_.get_function(
                 cl, Lambda.Function.extract_resource_id_from_arn(resource_arn)
             ) is not None
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None) -> List[Dict]:
 
             resps = []
-            cl = boto3.client("lambda", region_name=region)
-            function_name = Lambda.Function.extract_resource_id_from_arn(arn)
+            cl = resolve_engine(engine).client("lambda", region)
+            function_name = arn.resource_id
 
             if not Lambda.Function.query(cl, arn):
                 return resps
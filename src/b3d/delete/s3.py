@@ -1,9 +1,26 @@
 """ Delete procedures for S3 resources """
-from typing import List, Dict
-import boto3
+from __future__ import annotations
+import functools
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 from b3d.delete import Service
 from b3d import aws
 from b3d.utils import log_msg
+from b3d.engine import Engine, resolve as resolve_engine
+from b3d.utils.arn import Arn
+from b3d.utils.concurrency import bounded_map, chunks, merge_generators
+from b3d.utils.lazy import lazy_import
+from b3d.utils.s3_options import S3Options
+
+boto3 = lazy_import("boto3")
+
+
+# Number of delete calls that run at once while a bucket is purged
+PURGE_MAX_WORKERS = 8
+# Number of listed pages of object versions or multipart uploads that are removed in each round of a
+# purge, before the next round lists them from the start of the bucket again
+PURGE_ROUND_PAGES = 2 * PURGE_MAX_WORKERS
+# ID of the lifecycle rule that marks a bucket as left to expire its contents
+LIFECYCLE_RULE_ID = "b3d-expire-all"
 
 
 class S3(Service):
@@ -17,53 +34,238 @@ class S3(Service):
 
     class Bucket(Service.Resource):
         """
-        Delete procedure for Bucket objects
+        Delete procedure for Bucket objects, which destroy_many empties and deletes with the settings
+        of <options> (see with_options)
         """
 
-        @staticmethod
-        def extract_resource_id_from_arn(arn: str) -> str:
-            return arn.split(":")[-1]
+        options = S3Options()
 
         @staticmethod
         def resource_type() -> str:
             return "bucket"
 
+        @classmethod
+        def with_options(cls, options: S3Options) -> type:
+            """
+            Return a delete procedure for buckets that destroys them with <options>, for the resources
+            of a single call
+            """
+            return type(cls.__name__, (cls,), {"options": options})
+
+        @classmethod
+        def destroy_many(
+                cls, arns: List[Arn], region: str, dry: bool = True, engine: Optional[Engine] = None
+        ) -> Iterator[Tuple[Arn, List[Dict]]]:
+            for arn in arns:
+                yield arn, S3.Bucket.destroy(arn, region, dry, engine, cls.options)
+
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
             return aws.s3.get_bucket(
                 cl, S3.Bucket.extract_resource_id_from_arn(resource_arn)
             ) is not None
 
         @staticmethod
-        def _delete_objects(cl: boto3.client, bucket_name: str, objects: list, dry: bool) -> dict:
+        def _purge_counts() -> Dict:
+            """
+            Return the counts of a purge that has removed nothing yet (see _purge)
+            """
+            return {"count": 0, "failed": 0, "err": None, "retries": 0, "slept": 0.0}
+
+        @staticmethod
+        def _purge(pages: Iterable[list], remove: Callable[[list], Dict], counts: Optional[Dict] = None) -> Dict:
+            """
+            Remove pages of a bucket's contents with <remove>, which returns a delete_objects style
+            response, on up to PURGE_MAX_WORKERS threads. Pages are only taken from <pages> while
+            fewer than 2 * PURGE_MAX_WORKERS of them are in flight, so memory stays bounded however
+            large the bucket is. Returns the counts of what was removed ("count", "failed", "err" of
+            the first failure, "retries" and "slept"), added to <counts> if given.
+            """
+
+            if counts is None:
+                counts = S3.Bucket._purge_counts()
+
+            def _remove(page: list) -> Tuple[list, Dict]:
+                return page, remove(page)
+
+            for page, resp in bounded_map(_remove, (page for page in pages if len(page) > 0), PURGE_MAX_WORKERS):
+                if resp["ResponseMetadata"]["HTTPStatusCode"] in aws.retry.SUCCESS_STATUS_CODES:
+                    errors = resp.get("Errors", [])
+                else:
+                    errors = [resp.get("Error", {})] * len(page)
+
+                counts["count"] += len(page) - len(errors)
+                counts["failed"] += len(errors)
+                if len(errors) > 0 and counts["err"] is None:
+                    counts["err"] = {"Code": errors[0].get("Code"), "Message": errors[0].get("Message")}
+                counts["retries"] += resp.get("RetryStats", {}).get("retries", 0)
+                counts["slept"] = round(counts["slept"] + resp.get("RetryStats", {}).get("slept", 0.0), 3)
+
+            return counts
+
+        @staticmethod
+        def _listing_rounds(
+                list_pages: Callable[..., Iterable[List[Dict]]], dry: bool, failures: List[Dict]
+        ) -> Iterator[List[List[Dict]]]:
+            """
+            Yield the pages listed by <list_pages> in rounds of up to PURGE_ROUND_PAGES pages, each of
+            which the caller removes before taking the next. Listings resume from a marker entry, which
+            may already have been removed by the time the next page is requested, so every round lists
+            from the start of the bucket again instead. Entries that are listed again after their round
+            could not be removed, and are left out of later rounds. A dry run removes nothing, so its
+            rounds come from a single listing. <list_pages> appends the response of a page that can't
+            be listed to <failures>, after which no further round is listed.
+            """
+
+            if dry:
+                yield from chunks(
+                    (page for page in list_pages(failures=failures) if len(page) > 0), PURGE_ROUND_PAGES
+                )
+                return
+
+            attempted, failed = set(), set()
+            while True:
+                pages = []
+                for page in list_pages(failures=failures):
+                    fresh = []
+                    for entry in page:
+                        key = tuple(entry.values())
+                        if key in attempted:
+                            failed.add(key)
+                        elif key not in failed:
+                            fresh.append(entry)
+                    if len(fresh) > 0:
+                        pages.append(fresh)
+                    if len(pages) >= PURGE_ROUND_PAGES:
+                        break
+
+                if len(pages) > 0:
+                    yield pages
+                if len(pages) == 0 or len(failures) > 0:
+                    return
+
+                # Every entry of a round sorts before those that are still unlisted, so the next round
+                # meets all of this round's failures before it takes any new entry
+                attempted = {tuple(entry.values()) for page in pages for entry in page}
+
+        @staticmethod
+        def _purge_report(
+                counts: Dict, bucket_name: str, resource_type: str, action: str, failures: List[Dict]
+        ) -> List[Dict]:
+            """
+            Produce a single log message from the counts of a purge, or none if there was nothing to remove,
+            followed by one for each listing response in <failures>
+            """
+
+            resps = [log_msg.log_msg_listing_failure(resource_type, bucket_name, resp) for resp in failures]
+            if counts["count"] + counts["failed"] == 0:
+                return resps
+            return [log_msg.log_msg_purge(resource_type, bucket_name, action, counts)] + resps
+
+        @staticmethod
+        def _object_key_pages(
+                cl: boto3.client, bucket_name: str, delimiter: Optional[str], failures: List[Dict]
+        ) -> Iterator[List[str]]:
+            """
+            Yield the keys of the objects in a bucket, a page at a time. If <delimiter> is given, the
+            keys under each top-level prefix are listed concurrently, up to PURGE_MAX_WORKERS at once.
+            The response of each listing that fails part way is appended to <failures>.
+            """
+
+            if delimiter is None:
+                for keys, _ in aws.s3.get_object_key_pages(cl, bucket_name, failures=failures):
+                    yield keys
+                return
+
+            prefixes = []
+            for keys, common_prefixes in aws.s3.get_object_key_pages(
+                cl, bucket_name, delimiter=delimiter, failures=failures
+            ):
+                prefixes.extend(common_prefixes)
+                yield keys
+
+            def _prefix_key_pages(prefix: str) -> Iterator[List[str]]:
+                for keys, _ in aws.s3.get_object_key_pages(cl, bucket_name, prefix, failures=failures):
+                    yield keys
+
+            yield from merge_generators(
+                [functools.partial(_prefix_key_pages, prefix) for prefix in prefixes], PURGE_MAX_WORKERS,
+                buffer_size=PURGE_MAX_WORKERS
+            )
+
+        @staticmethod
+        def _delete_bucket(cl: boto3.client, bucket_name: str, dry: bool) -> Dict:
             return log_msg.log_msg_destroy(
-                resource_type="objects",
-                resource_id=" | ".join(objects),
-                resp=aws.s3.delete_objects(cl, bucket_name, objects, dry)
+                resource_type="bucket",
+                resource_id=bucket_name,
+                resp=aws.s3.delete_bucket(cl, bucket_name, dry)
             )
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(
+                arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None,
+                options: Optional[S3Options] = None
+        ) -> List[Dict]:
 
-            resps = []
-            cl = boto3.client("s3", region_name=region)
-            bucket_name = S3.Bucket.extract_resource_id_from_arn(arn)
+            options = S3.Bucket.options if options is None else options
+            cl = resolve_engine(engine).client("s3", region)
+            bucket_name = arn.resource_id
 
             if not S3.Bucket.query(cl, arn):
-                return resps
+                return []
 
-            # Remove all objects stored in this bucket
-            objects = aws.s3.get_objects_in_bucket(cl, bucket_name)
-            if len(objects) > 0:
-                resps.append(S3.Bucket._delete_objects(cl, bucket_name, objects, dry))
+            # Instead of being emptied now, a bucket can be left to empty itself through a lifecycle
+            # configuration, which a later sweep finds and deletes the bucket once it is empty
+            if options.lifecycle_teardown:
+                if not aws.s3.is_empty(cl, bucket_name):
+                    if LIFECYCLE_RULE_ID in aws.s3.get_lifecycle_rule_ids(cl, bucket_name):
+                        return [log_msg.log_msg_scheduled(bucket_name)]
+                    return [log_msg.log_msg_scheduled(
+                        bucket_name, aws.s3.put_expiration_lifecycle(cl, bucket_name, LIFECYCLE_RULE_ID, dry)
+                    )]
+                return [S3.Bucket._delete_bucket(cl, bucket_name, dry)]
 
-            # Delete this bucket
-            resps.append(
-                log_msg.log_msg_destroy(
-                    resource_type="bucket",
-                    resource_id=bucket_name,
-                    resp=aws.s3.delete_bucket(cl, bucket_name, dry)
+            # Abort in-progress multipart uploads, one upload per call. Listings that fail are reported
+            # along with the counts, and leave the bucket to fail to be deleted
+            counts, failures = S3.Bucket._purge_counts(), []
+            for pages in S3.Bucket._listing_rounds(
+                functools.partial(aws.s3.get_multipart_upload_pages, cl, bucket_name), dry, failures
+            ):
+                S3.Bucket._purge(
+                    ([upload] for page in pages for upload in page),
+                    lambda uploads: aws.s3.abort_multipart_upload(cl, bucket_name, uploads[0], dry),
+                    counts
                 )
-            )
+            resps = S3.Bucket._purge_report(counts, bucket_name, "multipart uploads", "aborted", failures)
+
+            # Remove all objects stored in this bucket, including every version and delete marker of
+            # each object if the bucket is versioned
+            if aws.s3.is_versioned(cl, bucket_name):
+                counts, failures = S3.Bucket._purge_counts(), []
+                for pages in S3.Bucket._listing_rounds(
+                    functools.partial(aws.s3.get_object_version_pages, cl, bucket_name), dry, failures
+                ):
+                    S3.Bucket._purge(
+                        pages,
+                        lambda versions: aws.s3.delete_object_versions(
+                            cl, bucket_name, versions, dry, options.bypass_governance_retention
+                        ),
+                        counts
+                    )
+                resps += S3.Bucket._purge_report(
+                    counts, bucket_name, "object versions and delete markers", "deleted", failures
+                )
+            else:
+                failures = []
+                resps += S3.Bucket._purge_report(
+                    S3.Bucket._purge(
+                        S3.Bucket._object_key_pages(cl, bucket_name, options.prefix_delimiter, failures),
+                        lambda keys: aws.s3.delete_objects(cl, bucket_name, keys, dry)
+                    ),
+                    bucket_name, "objects", "deleted", failures
+                )
+
+            # Delete this bucket
+            resps.append(S3.Bucket._delete_bucket(cl, bucket_name, dry))
 
             return resps
@@ -1,11 +1,17 @@
 """
 Delete procedures for S3 resources
 """
-from typing import List, Dict
-import boto3
+from __future__ import annotations
+from typing import Iterator, List, Dict, Optional, Tuple
 from b3d.delete import Service
 from b3d import aws
 from b3d.utils import log_msg
+from b3d.engine import Engine, resolve as resolve_engine
+from b3d.utils.arn import Arn
+from b3d.utils.concurrency import chunks
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
 
 
 class SSM(Service):
@@ -27,16 +33,16 @@ class SSM(Service):
             return "parameter"
 
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
             return aws.ssm.get_parameter(
                 cl, SSM.Parameter.extract_resource_id_from_arn(resource_arn)
             ) is not None
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True) -> List[Dict]:
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None) -> List[Dict]:
 
-            cl = boto3.client("ssm", region_name=region)
-            parameter_name = SSM.Parameter.extract_resource_id_from_arn(arn)
+            cl = resolve_engine(engine).client("ssm", region)
+            parameter_name = arn.resource_id
 
             if not SSM.Parameter.query(cl, arn):
                 return []
@@ -48,3 +54,34 @@ class SSM(Service):
                     resp=aws.ssm.delete_parameter(cl, parameter_name, dry)
                 )
             ]
+
+        @staticmethod
+        def batch_size() -> int:
+            return aws.ssm.PARAMETERS_MAX_NAMES
+
+        @staticmethod
+        def destroy_many(
+                arns: List[Arn], region: str, dry: bool = True, engine: Optional[Engine] = None
+        ) -> Iterator[Tuple[Arn, List[Dict]]]:
+            """
+            Destroy several parameters with one delete_parameters call per PARAMETERS_MAX_NAMES of them,
+            yielding an (<arn>, <report>) pair for each one. Parameters that no longer exist get empty
+            reports, as with destroy.
+            """
+
+            cl = resolve_engine(engine).client("ssm", region)
+
+            for batch in chunks(arns, aws.ssm.PARAMETERS_MAX_NAMES):
+                arns_by_name = {arn.resource_id: arn for arn in batch}
+                names = list(arns_by_name)
+                if dry:
+                    names = aws.ssm.get_existing_parameter_names(cl, names)
+
+                # If the call itself fails, every parameter in the batch is reported as failed
+                resp = aws.ssm.delete_parameters(cl, names, dry)
+                deleted = set(names) - set(resp.get("InvalidParameters", []))
+
+                for name, arn in arns_by_name.items():
+                    yield arn, [] if name not in deleted else [
+                        log_msg.log_msg_destroy(resource_type="parameter", resource_id=name, resp=resp)
+                    ]
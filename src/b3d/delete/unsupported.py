@@ -1,9 +1,15 @@
 """
 Delete procedures for unsupported resources
 """
-import boto3
+from __future__ import annotations
+from typing import Optional
 from b3d.delete import Service
 from b3d.utils import log_msg
+from b3d.engine import Engine
+from b3d.utils.arn import Arn
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
 
 
 class UnsupportedService(Service):
@@ -25,9 +31,9 @@ class UnsupportedService(Service):
             return "unsupported-resource"
 
         @staticmethod
-        def query(cl: boto3.client, resource_arn: str) -> bool:
+        def query(cl: boto3.client, resource_arn: Arn) -> bool:
             return True
 
         @staticmethod
-        def destroy(arn: str, region: str, dry: bool = True):
-            return log_msg.log_msg_unsupported_resource(arn)
+        def destroy(arn: Arn, region: str, dry: bool = True, engine: Optional[Engine] = None):
+            return [log_msg.log_msg_unsupported_resource(str(arn))]
@@ -0,0 +1,167 @@
+"""
+Selecting resource types, mapping ARNs to their delete objects and grouping them to be destroyed
+together, shared by the synchronous (b3d_) and asyncio (aio) APIs.
+"""
+from __future__ import annotations
+import collections
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, Union
+from b3d import utils
+from b3d.utils import log_msg
+from b3d.utils.arn import Arn
+from b3d.utils.s3_options import S3Options
+
+
+# Delete modules are imported lazily, the first time one of their resource types is looked up
+DELETE_PROTOCOL_OBJECT_MAP = utils.registry.DELETE_REGISTRY
+# ResourceTypeFilters for services whose resource types in DELETE_PROTOCOL_OBJECT_MAP don't match the
+# ResourceGroupsTaggingApi's own naming, so the whole service is queried instead
+RESOURCE_TYPE_FILTER_OVERRIDES = {
+    "apigateway": "apigateway",
+    "s3": "s3"
+}
+
+
+class TypeFilter:
+    """
+    Selects resource types to discover from "<service>" or "<service>:<resource_type>" specs
+    (using the names in DELETE_PROTOCOL_OBJECT_MAP, e.g. "ec2:instance"). If <include> is None,
+    every type is selected unless it matches <exclude>.
+    """
+
+    def __init__(self, include: Optional[List[str]] = None, exclude: Optional[List[str]] = None):
+        self.include = None if include is None else set(include)
+        self.exclude = set(exclude or [])
+
+    def selects(self, service: str, resource_type: str) -> bool:
+        """
+        Determine whether some (<service>, <resource_type>) pair is selected by this filter
+        """
+
+        specs = {service, f"{service}:{resource_type}"}
+        return (self.include is None or len(specs & self.include) > 0) and len(specs & self.exclude) == 0
+
+    def selects_arn(self, arn: Arn) -> bool:
+        """
+        Determine whether the resource type of some ARN is selected by this filter
+        """
+        return self.selects(arn.service, arn.resource_type)
+
+    def resource_type_filters(self) -> List[str]:
+        """
+        Derive ResourceTypeFilters for the ResourceGroupsTaggingApi from the supported, selected,
+        regional resource types in DELETE_PROTOCOL_OBJECT_MAP
+        """
+
+        return list(dict.fromkeys(
+            RESOURCE_TYPE_FILTER_OVERRIDES.get(service, f"{service}:{resource_type}")
+            for service, resources in DELETE_PROTOCOL_OBJECT_MAP.items()
+            if service not in ["unsupported-service", "iam"]
+            for resource_type in resources
+            if self.selects(service, resource_type)
+        ))
+
+    def parse_selected(self, arns: Iterable[str]) -> Iterator[Arn]:
+        """
+        Parse each discovered ARN, once, and keep those whose resource type is selected by this filter
+        """
+
+        for arn in arns:
+            parsed = utils.arn.parse(arn)
+            if self.selects_arn(parsed):
+                yield parsed
+
+
+def delete_object(service: str, resource_type: str):
+    """
+    Look up the entry in DELETE_PROTOCOL_OBJECT_MAP for some (<service>, <resource_type>) pair,
+    which the registry memoizes since every resource of the same type maps to the same entry
+    """
+
+    try:
+        return DELETE_PROTOCOL_OBJECT_MAP.lookup(service, resource_type)
+    except KeyError:
+        return DELETE_PROTOCOL_OBJECT_MAP["unsupported-service"]["unsupported-resource"]
+
+
+def map_arn(arn: Union[str, Arn]):
+    """
+    Map an ARN to its corresponding entry in DELETE_PROTOCOL_OBJECT_MAP. If it has no
+    corresponding entry (i.e. - this library doesn't currently support that resource
+    type), then the UnsupportedResource delete object is returned.
+    """
+
+    parsed_arn = utils.arn.parse(arn)
+    return delete_object(parsed_arn.service, parsed_arn.resource_type)
+
+
+def map_arns(arns: Iterable[Union[str, Arn]], s3_options: Optional[S3Options] = None) -> Iterator[Tuple[Arn, Any]]:
+    """
+    Parse each ARN (unless it already has been) and map it to its corresponding delete protocol object.
+    If <s3_options> is given, delete objects that take them (S3 buckets) are bound to them with their
+    with_options, each of them only once.
+    """
+
+    bound = {}
+    for arn in arns:
+        parsed_arn = utils.arn.parse(arn)
+        obj = delete_object(parsed_arn.service, parsed_arn.resource_type)
+        if s3_options is not None and hasattr(obj, "with_options"):
+            if obj not in bound:
+                bound[obj] = obj.with_options(s3_options)
+            obj = bound[obj]
+        yield parsed_arn, obj
+
+
+def group_by_type(mapped_arns: Iterable[Tuple[Arn, Any]], first: Any) -> List[Tuple[Arn, Any]]:
+    """
+    Reorder (<arn>, <delete object>) pairs so that resources of the same type are next to each other,
+    with the types in order of first appearance, except that resources of type <first> come first
+    """
+
+    by_type = {}
+    for arn, obj in mapped_arns:
+        by_type.setdefault(obj, []).append((arn, obj))
+    return [pair for obj in sorted(by_type, key=lambda obj: obj is not first) for pair in by_type[obj]]
+
+
+def destroy_groups(
+        mapped_arns: Iterable[Tuple[Arn, Any]], unsupported: collections.Counter
+) -> Iterator[Tuple[Any, List[Arn]]]:
+    """
+    Split (<arn>, <delete object>) pairs into (<delete object>, <arns>) groups to be destroyed with
+    a single destroy_many call: runs of consecutive resources of the same type, of up to the type's
+    batch_size. A group is yielded as soon as it is full or the next resource is of another type.
+    Resources of unsupported types are not grouped, but are counted in <unsupported>, keyed on their
+    (<service>, <resource_type>) pair.
+    """
+
+    unsupported_resource = DELETE_PROTOCOL_OBJECT_MAP["unsupported-service"]["unsupported-resource"]
+    group_obj, group = None, []
+
+    for arn, obj in mapped_arns:
+        if obj is unsupported_resource:
+            unsupported[(arn.service, arn.resource_type)] += 1
+            continue
+
+        if obj is not group_obj and len(group) > 0:
+            yield group_obj, group
+            group = []
+        group_obj = obj
+        group.append(arn)
+        if len(group) >= obj.batch_size():
+            yield group_obj, group
+            group = []
+
+    if len(group) > 0:
+        yield group_obj, group
+
+
+def unsupported_summary(unsupported: collections.Counter) -> Iterator[list]:
+    """
+    Yield a single report summarizing the resources of unsupported types that were skipped, if any
+    """
+
+    if len(unsupported) > 0:
+        yield [log_msg.log_msg_unsupported_summary(
+            {f"{service}:{resource_type}": count for (service, resource_type), count in unsupported.items()}
+        )]
@@ -0,0 +1,199 @@
+"""
+Reusable engine that owns the boto3 clients used to discover and destroy resources
+"""
+from __future__ import annotations
+import threading
+from importlib import import_module
+from typing import Dict, Optional, Tuple, Union
+from b3d.aws.rate_limit import DEFAULT_RATE_LIMITER, RateLimiter
+from b3d.utils.client_config import ClientConfig, config_for
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
+
+
+class Engine:
+    """
+    Creates one boto3 client per (<service>, <region>) pair and reuses it, along with its pool of HTTP
+    connections, for every resource and every call made through this engine. boto3 clients are thread
+    safe once created, and creation is serialized here because boto3 sessions are not.
+
+    Clients come from <session> (the default boto3 session if None). Entries of <clients>, keyed on
+    either "<service>" or ("<service>", "<region>"), are used instead of creating clients, which lets
+    callers plug in their own clients or local stand-ins. Created clients use the settings of <config>,
+    with the entry of <service_config> for their service (if any) applied on top, and their calls
+    are throttled by <rate_limiter> (the process-level DEFAULT_RATE_LIMITER if None). The entry points
+    of b3d_ are available as methods, e.g. Engine(session).delete_resources(...).
+    """
+
+    def __init__(
+            self,
+            session: Optional[boto3.Session] = None,
+            clients: Optional[Dict[Union[str, Tuple[str, str]], object]] = None,
+            config: Optional[ClientConfig] = None,
+            service_config: Optional[Dict[str, ClientConfig]] = None,
+            rate_limiter: Optional[RateLimiter] = None
+    ):
+        self._session = session
+        self._injected = {
+            (key, None) if isinstance(key, str) else tuple(key): client for key, client in (clients or {}).items()
+        }
+        self._config = config
+        self._service_config = dict(service_config or {})
+        self.rate_limiter = DEFAULT_RATE_LIMITER if rate_limiter is None else rate_limiter
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> boto3.Session:
+        """
+        The boto3 session that this engine creates clients from
+        """
+
+        if self._session is None:
+            if boto3.DEFAULT_SESSION is None:
+                boto3.setup_default_session()
+            return boto3.DEFAULT_SESSION
+        return self._session
+
+    def config(self, service: str) -> ClientConfig:
+        """
+        Return the settings that clients for some service are created with
+        """
+        return config_for(service, self._config, self._service_config)
+
+    def configured(
+            self, config: Optional[ClientConfig] = None, service_config: Optional[Dict[str, ClientConfig]] = None
+    ) -> Engine:
+        """
+        Return a new engine with the same session and given clients as this one, whose settings are
+        this engine's with <config> and <service_config> applied on top. Clients that this engine
+        has already created are not shared, since they were created with the old settings.
+        """
+
+        merged_service_config = dict(self._service_config)
+        for service, overrides in (service_config or {}).items():
+            merged_service_config[service] = merged_service_config.get(service, ClientConfig()).merge(overrides)
+
+        engine = Engine(
+            self._session, None, (self._config or ClientConfig()).merge(config), merged_service_config,
+            self.rate_limiter
+        )
+        engine._injected = dict(self._injected)  # pylint: disable=protected-access
+        return engine
+
+    def client(self, service: str, region: str) -> boto3.client:
+        """
+        Return the client for some service in some region, creating it on first use
+        """
+
+        try:
+            return self._clients[(service, region)]
+        except KeyError:
+            pass
+
+        for key in [(service, region), (service, None)]:
+            if key in self._injected:
+                return self._injected[key]
+
+        with self._lock:
+            if (service, region) not in self._clients:
+                config = self.config(service)
+                client = self.session.client(
+                    service, region_name=region, endpoint_url=config.endpoint_url, config=config.botocore_config()
+                )
+                self.rate_limiter.install(client)
+                self._clients[(service, region)] = client
+            return self._clients[(service, region)]
+
+    def metrics(self) -> Dict[str, Dict]:
+        """
+        Return the current state of this engine's rate limiter (see RateLimiter.metrics)
+        """
+        return self.rate_limiter.metrics()
+
+    def close(self):
+        """
+        Close the HTTP connections of every client that this engine created, and forget them. Clients
+        that were given to this engine are left open.
+        """
+
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for client in clients.values():
+            # Clients only have close() in newer versions of botocore
+            if hasattr(client, "close"):
+                client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def delete_resources(self, *args, **kwargs):
+        """
+        b3d.delete_resources, using this engine's clients
+        """
+        return _b3d().delete_resources(*args, engine=self, **kwargs)
+
+    def delete_resources_async(self, *args, **kwargs):
+        """
+        b3d.delete_resources_async, using this engine's clients
+        """
+        return import_module("b3d.aio").delete_resources_async(*args, engine=self, **kwargs)
+
+    def delete_resources_batch(self, *args, **kwargs):
+        """
+        b3d.delete_resources_batch, using this engine's clients
+        """
+        return _b3d().delete_resources_batch(*args, engine=self, **kwargs)
+
+    def delete_resources_matching(self, *args, **kwargs):
+        """
+        b3d.delete_resources_matching, using this engine's clients
+        """
+        return _b3d().delete_resources_matching(*args, engine=self, **kwargs)
+
+    def delete_resources_multi_region(self, *args, **kwargs):
+        """
+        b3d.delete_resources_multi_region, using this engine's clients
+        """
+        return _b3d().delete_resources_multi_region(*args, engine=self, **kwargs)
+
+    def record_resources(self, *args, **kwargs):
+        """
+        b3d.record_resources, using this engine's clients
+        """
+        return _b3d().record_resources(*args, engine=self, **kwargs)
+
+
+def _b3d():
+    """
+    Import the b3d_ module, which itself depends on this one
+    """
+    return import_module("b3d.b3d_")
+
+
+_DEFAULT_ENGINE = None
+_DEFAULT_ENGINE_LOCK = threading.Lock()
+
+
+def default_engine() -> Engine:
+    """
+    Return the process-level engine used by calls that aren't given one
+    """
+
+    global _DEFAULT_ENGINE  # pylint: disable=global-statement
+    if _DEFAULT_ENGINE is None:
+        with _DEFAULT_ENGINE_LOCK:
+            if _DEFAULT_ENGINE is None:
+                _DEFAULT_ENGINE = Engine()
+    return _DEFAULT_ENGINE
+
+
+def resolve(engine: Optional[Engine] = None) -> Engine:
+    """
+    Return <engine>, or the default engine if it is None
+    """
+    return default_engine() if engine is None else engine
@@ -0,0 +1,215 @@
+"""
+Persistent SQLite inventory of discovered resources, their tags and the dependency edges
+between them
+"""
+import time
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from b3d.utils.concurrency import chunks
+from b3d.utils.lazy import lazy_import
+
+sqlite3 = lazy_import("sqlite3")
+
+
+# Number of rows written per executemany call, and read per query when iterating
+BATCH_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    arn TEXT PRIMARY KEY,
+    partition TEXT NOT NULL,
+    service TEXT NOT NULL,
+    region TEXT NOT NULL,
+    account TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    deleted_at REAL
+);
+CREATE INDEX IF NOT EXISTS resources_by_type ON resources (service, resource_type, region);
+CREATE INDEX IF NOT EXISTS resources_by_region ON resources (region);
+CREATE TABLE IF NOT EXISTS tags (
+    arn TEXT NOT NULL REFERENCES resources (arn),
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (arn, key)
+);
+CREATE INDEX IF NOT EXISTS tags_by_pair ON tags (key, value);
+CREATE TABLE IF NOT EXISTS edges (
+    from_arn TEXT NOT NULL,
+    to_arn TEXT NOT NULL,
+    relation TEXT NOT NULL,
+    PRIMARY KEY (from_arn, to_arn, relation)
+);
+CREATE INDEX IF NOT EXISTS edges_by_target ON edges (to_arn);
+"""
+
+
+class Inventory:
+    """
+    Indexed SQLite store of discovered resources. Each resource row holds its ARN, the parts
+    parsed from it, the discovery source that found it, when it was first and last seen, and
+    when b3d deleted it. Tags and dependency edges (e.g. instance -> security group) are held in
+    their own tables. Writes are batched and reads are paged, so memory use doesn't grow with
+    the size of the inventory.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        """
+        Close the underlying database connection
+        """
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_resources(self, resources: Iterable[Dict]) -> int:
+        """
+        Insert or refresh resources, each a dictionary with "arn", "partition", "service", "region",
+        "account", "resource_type", "resource_id", "source" and "tags" (a list of {"Key", "Value"}
+        dictionaries) keys. Returns the number of resources written.
+        """
+
+        written = 0
+        for chunk in chunks(resources, BATCH_SIZE):
+            now = time.time()
+            with self._lock, self._conn:
+                # Tags are replaced rather than merged, so tags removed since the last sweep are dropped
+                self._conn.executemany("DELETE FROM tags WHERE arn = ?", [(r["arn"],) for r in chunk])
+                self._conn.executemany(
+                    "INSERT INTO resources VALUES "
+                    "(:arn, :partition, :service, :region, :account, :resource_type, :resource_id, :source, "
+                    ":now, :now, NULL) "
+                    "ON CONFLICT (arn) DO UPDATE SET last_seen = :now, source = :source, deleted_at = NULL",
+                    [{**r, "now": now} for r in chunk]
+                )
+                self._conn.executemany(
+                    "INSERT INTO tags VALUES (?, ?, ?)",
+                    [(r["arn"], t["Key"], t["Value"]) for r in chunk for t in r.get("tags", [])]
+                )
+            written += len(chunk)
+
+        return written
+
+    def add_edges(self, edges: Iterable[Tuple[str, str, str]]) -> int:
+        """
+        Insert (<from_arn>, <to_arn>, <relation>) dependency edges. Returns the number written.
+        """
+
+        written = 0
+        for chunk in chunks(edges, BATCH_SIZE):
+            with self._lock, self._conn:
+                self._conn.executemany("INSERT OR IGNORE INTO edges VALUES (?, ?, ?)", chunk)
+            written += len(chunk)
+
+        return written
+
+    def mark_deleted(self, arns: Iterable[str]):
+        """
+        Record that some resources have been deleted
+        """
+
+        for chunk in chunks(arns, BATCH_SIZE):
+            now = time.time()
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "UPDATE resources SET deleted_at = ? WHERE arn = ?", [(now, arn) for arn in chunk]
+                )
+
+    @staticmethod
+    def _where(
+            tag_key: Optional[str] = None,
+            tag_value: Optional[str] = None,
+            region: Optional[str] = None,
+            service: Optional[str] = None,
+            resource_type: Optional[str] = None,
+            include_deleted: bool = False
+    ) -> Tuple[str, List]:
+        """
+        Build a WHERE clause (and its parameters) over the resources table. Global resources, whose
+        ARNs have no region, match every region.
+        """
+
+        clauses = ["1"]
+        params = []
+        if not include_deleted:
+            clauses.append("r.deleted_at IS NULL")
+        if region is not None:
+            clauses.append("r.region IN (?, '')")
+            params.append(region)
+        if service is not None:
+            clauses.append("r.service = ?")
+            params.append(service)
+        if resource_type is not None:
+            clauses.append("r.resource_type = ?")
+            params.append(resource_type)
+        if tag_key is not None:
+            clauses.append(
+                "EXISTS (SELECT 1 FROM tags t WHERE t.arn = r.arn AND t.key = ?"
+                + (" AND t.value = ?)" if tag_value is not None else ")")
+            )
+            params.extend([tag_key] if tag_value is None else [tag_key, tag_value])
+
+        return " AND ".join(clauses), params
+
+    def arns(self, **filters) -> Iterator[str]:
+        """
+        Lazily list the ARNs of resources matching some filters (tag_key, tag_value, region,
+        service, resource_type, include_deleted), in the order they were first recorded
+        """
+
+        where, params = self._where(**filters)
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT r.rowid, r.arn FROM resources r WHERE {where} AND r.rowid > ? "
+                    f"ORDER BY r.rowid LIMIT {BATCH_SIZE}",
+                    params + [last_rowid]
+                ).fetchall()
+            if len(rows) == 0:
+                return
+            for _, arn in rows:
+                yield arn
+            last_rowid = rows[-1][0]
+
+    def count(self, **filters) -> int:
+        """
+        Count the resources matching some filters (see arns)
+        """
+
+        where, params = self._where(**filters)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM resources r WHERE {where}", params).fetchone()[0]
+
+    def edges(self, arn: Optional[str] = None, relation: Optional[str] = None) -> List[Tuple[str, str, str]]:
+        """
+        List (<from_arn>, <to_arn>, <relation>) edges, optionally only those touching some ARN
+        and/or of some relation
+        """
+
+        clauses = ["1"]
+        params = []
+        if arn is not None:
+            clauses.append("(from_arn = ? OR to_arn = ?)")
+            params.extend([arn, arn])
+        if relation is not None:
+            clauses.append("relation = ?")
+            params.append(relation)
+
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT from_arn, to_arn, relation FROM edges WHERE {' AND '.join(clauses)}", params
+            ).fetchall()
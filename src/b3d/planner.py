@@ -0,0 +1,148 @@
+"""
+Dependency-aware ordering of deletes: finds the dependencies between discovered resources and
+splits them into levels, so that no resource is deleted before the resources that depend on it
+"""
+from __future__ import annotations
+import collections
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from b3d import aws
+from b3d.engine import Engine, resolve as resolve_engine
+from b3d.utils.arn import Arn, parse
+from b3d.utils.concurrency import chunks
+from b3d.utils.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
+botocore_exceptions = lazy_import("botocore.exceptions")
+
+
+# Relations whose <from_arn> resource must be deleted before its <to_arn> resource (e.g. an instance
+# before the security group it uses). For every other relation, such as "attached-to", the <to_arn>
+# resource is deleted first (e.g. an instance before the volume attached to it).
+DELETED_BEFORE_TARGET = {"uses", "part-of"}
+
+
+def _ec2_edges(cl: boto3.client, instances: List[Arn], volumes: List[Arn]) -> Iterator[Tuple[str, str, str]]:
+
+    for arns in chunks(instances):
+        prefix = f"arn:{arns[0].partition}:ec2:{arns[0].region}:{arns[0].account}"
+        resp = aws.ec2.describe_instances_by_ids(cl, [arn.resource_id for arn in arns])
+        if resp["ResponseMetadata"]["HTTPStatusCode"] != 200:
+            # Planning fails as a whole rather than missing the dependencies of these instances
+            raise botocore_exceptions.ClientError(resp, "DescribeInstances")
+        for instance in resp["Instances"]:
+            instance_arn = f"{prefix}:instance/{instance['InstanceId']}"
+            for sg in instance.get("SecurityGroups", []):
+                yield instance_arn, f"{prefix}:security-group/{sg['GroupId']}", "uses"
+            for bdm in instance.get("BlockDeviceMappings", []):
+                if "Ebs" in bdm:
+                    yield f"{prefix}:volume/{bdm['Ebs']['VolumeId']}", instance_arn, "attached-to"
+
+    for arns in chunks(volumes):
+        prefix = f"arn:{arns[0].partition}:ec2:{arns[0].region}:{arns[0].account}"
+        for volume in aws.ec2.describe_volumes_by_ids(cl, [arn.resource_id for arn in arns]):
+            for attachment in volume.get("Attachments", []):
+                yield (
+                    f"{prefix}:volume/{volume['VolumeId']}", f"{prefix}:instance/{attachment['InstanceId']}",
+                    "attached-to"
+                )
+
+
+def _api_gateway_edges(cl: boto3.client, usage_plans: List[Arn], stages: List[Arn]) -> Iterator[Tuple[str, str, str]]:
+
+    for stage in stages:
+        yield str(stage), stage.arn.split("/stages/")[0], "part-of"
+
+    for usage_plan in usage_plans:
+        resp = aws.api_gateway.get_usage_plan(cl, usage_plan.resource_id)
+        prefix = f"arn:{usage_plan.partition}:apigateway:{usage_plan.region}::"
+        for api_stage in (resp or {}).get("apiStages", []):
+            rest_api_arn = f"{prefix}/restapis/{api_stage['apiId']}"
+            yield str(usage_plan), f"{rest_api_arn}/stages/{api_stage['stage']}", "uses"
+            yield str(usage_plan), rest_api_arn, "uses"
+
+
+def _iam_edges(cl: boto3.client, policies: List[Arn], entities: List[Arn]) -> Iterator[Tuple[str, str, str]]:
+
+    # Attached entities are listed by name, so their ARNs (which include their paths) are looked up
+    # among the given resources
+    arns_by_name = {(arn.resource_type, arn.arn.split("/")[-1]): str(arn) for arn in entities}
+
+    for policy in policies:
+        attached = aws.iam.list_entities_policy_attached(cl, str(policy))
+        prefix = f"arn:{policy.partition}:iam::{policy.account}"
+        for kind, key, name_key in [
+            ("role", "PolicyRoles", "RoleName"), ("user", "PolicyUsers", "UserName"),
+            ("group", "PolicyGroups", "GroupName")
+        ]:
+            for entity in attached.get(key, []):
+                name = entity[name_key]
+                yield str(policy), arns_by_name.get((kind, name), f"{prefix}:{kind}/{name}"), "attached-to"
+
+
+def dependency_edges(
+        arns: Iterable[Union[str, Arn]], region: str, engine: Optional[Engine] = None
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    Yield (<from_arn>, <to_arn>, <relation>) edges for some resources in some region: instance "uses"
+    security group, volume "attached-to" instance, usage plan "uses" stage and rest API, stage "part-of"
+    rest API, and policy "attached-to" role, user or group. Clients are only created (from <engine>,
+    or the default engine if None) for services that have resources with dependencies.
+    """
+
+    by_type = collections.defaultdict(list)
+    for arn in map(parse, arns):
+        by_type[(arn.service, arn.resource_type)].append(arn)
+
+    engine = resolve_engine(engine)
+    if by_type[("ec2", "instance")] or by_type[("ec2", "volume")]:
+        yield from _ec2_edges(
+            engine.client("ec2", region), by_type[("ec2", "instance")], by_type[("ec2", "volume")]
+        )
+    if by_type[("apigateway", "usageplans")] or by_type[("apigateway", "stages")]:
+        yield from _api_gateway_edges(
+            engine.client("apigateway", region), by_type[("apigateway", "usageplans")],
+            by_type[("apigateway", "stages")]
+        )
+    if by_type[("iam", "policy")]:
+        yield from _iam_edges(
+            engine.client("iam", region), by_type[("iam", "policy")],
+            by_type[("iam", "role")] + by_type[("iam", "user")]
+        )
+
+
+def delete_levels(arns: Iterable[Arn], edges: Iterable[Tuple[str, str, str]]) -> List[List[Arn]]:
+    """
+    Split some resources into levels, such that every resource comes after the resources it has to
+    wait for (given by <edges>), and resources in the same level don't depend on each other. Edges
+    to resources outside of <arns> are ignored. Each level keeps the order of <arns>. Resources
+    caught in a dependency cycle are put into a final level.
+    """
+
+    nodes: Dict[str, Arn] = {str(arn): arn for arn in arns}
+    position = {key: i for i, key in enumerate(nodes)}
+    successors = collections.defaultdict(set)
+    waiting_on = dict.fromkeys(nodes, 0)
+
+    for from_arn, to_arn, relation in edges:
+        first, then = (from_arn, to_arn) if relation in DELETED_BEFORE_TARGET else (to_arn, from_arn)
+        if first in nodes and then in nodes and first != then and then not in successors[first]:
+            successors[first].add(then)
+            waiting_on[then] += 1
+
+    levels = []
+    ready = [key for key in nodes if waiting_on[key] == 0]
+    while len(ready) > 0:
+        levels.append([nodes[key] for key in ready])
+        unblocked = []
+        for key in ready:
+            for then in successors[key]:
+                waiting_on[then] -= 1
+                if waiting_on[then] == 0:
+                    unblocked.append(then)
+        ready = sorted(unblocked, key=position.get)
+
+    placed = sum(len(level) for level in levels)
+    if placed < len(nodes):
+        levels.append([nodes[key] for key in nodes if waiting_on[key] > 0])
+
+    return levels
@@ -1,3 +1,3 @@
 """ Misc utils module """
 from b3d.utils.loading import build_resource_map
-from b3d.utils import log_msg
+from b3d.utils import arn, cache, client_config, concurrency, log_msg, registry, s3_options
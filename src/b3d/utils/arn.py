@@ -0,0 +1,90 @@
+"""
+Immutable ARN value object, parsed once when a resource is discovered and shared by the
+whole delete pipeline
+"""
+from typing import NamedTuple, Union
+
+
+class _ArnFields(NamedTuple):
+    arn: str
+    partition: str
+    service: str
+    region: str
+    account: str
+    resource_type: str
+    resource_id: str
+
+
+class Arn(_ArnFields):
+    """
+    An ARN of the form 'arn:<PARTITION>:<SERVICE>:<REGION>:<ACCT_ID>:<RESOURCE_TYPE>/<RESOURCE_ID>',
+    split into its components. Resource types use the names in DELETE_PROTOCOL_OBJECT_MAP. An Arn is
+    an immutable, slotted tuple that compares and hashes equal to its ARN string, and str() gives that
+    string back for API calls.
+    """
+
+    __slots__ = ()
+
+    def __str__(self) -> str:
+        return self.arn
+
+    def __repr__(self) -> str:
+        return f"Arn({self.arn!r})"
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Arn):
+            return self.arn == other.arn
+        if isinstance(other, str):
+            return self.arn == other
+        return NotImplemented
+
+    def __ne__(self, other) -> bool:
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __hash__(self) -> int:
+        return hash(self.arn)
+
+    @property
+    def is_global(self) -> bool:
+        """
+        Whether this ARN refers to a global (IAM) resource rather than a regional one
+        """
+        return self.service == "iam"
+
+
+# Builds an Arn without the keyword handling of the generated NamedTuple constructor, since parse
+# runs once for every discovered resource
+_new = tuple.__new__
+
+
+def parse(arn: Union[str, Arn]) -> Arn:
+    """
+    Parse an ARN string into an Arn. Arns are returned unchanged, so callers can accept either.
+    """
+
+    if isinstance(arn, Arn):
+        return arn
+
+    splt = arn.split(":")
+    service = splt[2]
+
+    # API Gateway ARNs have at least one corner case
+    if service == "apigateway":
+        resource_path = splt[-1].split("/")
+        if len(resource_path) > 3 and resource_path[3] == "stages":
+            # Form /restapis/<api_id>/stages/<stage_name>
+            return _new(Arn, (arn, splt[1], service, splt[3], splt[4], "stages", resource_path[-1]))
+        # Form /<resource-type>/<resource_id>
+        return _new(Arn, (arn, splt[1], service, splt[3], splt[4], resource_path[1], resource_path[-1]))
+
+    if service == "s3":
+        # The ResourceGroupsTaggingApi only supports S3 buckets and we
+        # don't support a manual search-object-with-tag process for other
+        # S3 objects at this time
+        return _new(Arn, (arn, splt[1], service, splt[3], splt[4], "bucket", splt[-1]))
+
+    if service == "lambda":
+        return _new(Arn, (arn, splt[1], service, splt[3], splt[4], splt[-2], splt[-1]))
+
+    return _new(Arn, (arn, splt[1], service, splt[3], splt[4], splt[5].split("/", 1)[0], arn[arn.rfind("/") + 1:]))
@@ -0,0 +1,55 @@
+"""
+Process-level cache for discovery results that can be shared across calls and threads
+"""
+import time
+import threading
+from typing import Callable, Dict, Optional
+
+
+class TagIndexCache:
+    """
+    Holds a single tag index (a dictionary keyed on entity kind, then on ARN) for up to
+    <ttl> seconds. Concurrent callers that find the cache empty or expired wait on the
+    same rebuild rather than each building their own index.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Dict]] = None
+        self._expires_at = 0.0
+
+    def get(self, build: Callable[[], Dict[str, Dict]]) -> Dict[str, Dict]:
+        """
+        Return the cached index, calling <build> to replace it if it is missing or expired
+        """
+
+        with self._lock:
+            if self._index is None or time.monotonic() >= self._expires_at:
+                self._index = build()
+                self._expires_at = time.monotonic() + self.ttl
+            return self._index
+
+    def invalidate(self, arn: str):
+        """
+        Remove a single entity from the cached index, e.g. once it has been deleted. Each
+        affected kind is replaced rather than mutated so that callers iterating over an
+        index they were handed earlier are unaffected.
+        """
+
+        with self._lock:
+            if self._index is None:
+                return
+            self._index = {
+                kind: {a: tags for a, tags in entities.items() if a != arn} if arn in entities else entities
+                for kind, entities in self._index.items()
+            }
+
+    def clear(self):
+        """
+        Drop the cached index so that the next lookup rebuilds it
+        """
+
+        with self._lock:
+            self._index = None
+            self._expires_at = 0.0
@@ -0,0 +1,96 @@
+"""
+Transport settings for the boto3 clients that b3d creates, which can be set for all services and
+overridden for individual ones
+"""
+from __future__ import annotations
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+from b3d.utils.lazy import lazy_import
+
+botocore_config = lazy_import("botocore.config")
+
+
+# Retry modes understood by botocore, see
+# https://boto3.amazonaws.com/v1/documentation/api/latest/guide/retries.html
+RETRY_MODES = ("legacy", "standard", "adaptive")
+
+
+class _ClientConfigFields(NamedTuple):
+    max_pool_connections: Optional[int] = None
+    retry_mode: Optional[str] = None
+    max_attempts: Optional[int] = None
+    connect_timeout: Optional[float] = None
+    read_timeout: Optional[float] = None
+    endpoint_url: Optional[str] = None
+
+
+class ClientConfig(_ClientConfigFields):
+    """
+    Settings for the boto3 clients of some service: the size of each client's HTTP connection pool,
+    the botocore retry mode ("legacy", "standard" or "adaptive") and total number of attempts per
+    call, connect and read timeouts in seconds, and an endpoint URL to send requests to instead of
+    the AWS endpoint (e.g. a local stand-in). Settings left as None keep the botocore default.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, *args, **kwargs):
+        config = super().__new__(cls, *args, **kwargs)
+        if config.retry_mode is not None and config.retry_mode not in RETRY_MODES:
+            raise ValueError(f"Unknown retry mode {config.retry_mode!r}, expected one of {', '.join(RETRY_MODES)}")
+        for field in ["max_pool_connections", "max_attempts", "connect_timeout", "read_timeout"]:
+            value = getattr(config, field)
+            if value is not None and value <= 0:
+                raise ValueError(f"{field} must be positive, got {value!r}")
+        return config
+
+    def merge(self, other: Optional[ClientConfig]) -> ClientConfig:
+        """
+        Return a copy of this config with every setting that is not None in <other> applied on top
+        """
+
+        if other is None:
+            return self
+        return self._replace(**{field: value for field, value in other._asdict().items() if value is not None})
+
+    def botocore_config(self) -> Optional[botocore_config.Config]:
+        """
+        Return the botocore Config for these settings, or None if all of them are left at their
+        defaults. endpoint_url is passed to the client directly, so it is not part of the Config.
+        """
+
+        kwargs = {
+            field: getattr(self, field)
+            for field in ["max_pool_connections", "connect_timeout", "read_timeout"]
+            if getattr(self, field) is not None
+        }
+        retries = {
+            key: value for key, value in [("mode", self.retry_mode), ("total_max_attempts", self.max_attempts)]
+            if value is not None
+        }
+        if retries:
+            kwargs["retries"] = retries
+        return botocore_config.Config(**kwargs) if kwargs else None
+
+
+def config_for(
+        service: str, config: Optional[ClientConfig] = None, service_config: Optional[Dict[str, ClientConfig]] = None
+) -> ClientConfig:
+    """
+    Return the settings for some service: <config>, with the entry of <service_config> for that
+    service (if any) applied on top
+    """
+    return (config or ClientConfig()).merge((service_config or {}).get(service))
+
+
+def split_client_config(
+        client_config: Union[ClientConfig, Dict[str, ClientConfig]]
+) -> Tuple[Optional[ClientConfig], Dict[str, ClientConfig]]:
+    """
+    Split either a ClientConfig for every service, or a {<service>: ClientConfig} map whose "*"
+    entry applies to every service, into (<config>, <service_config>)
+    """
+
+    if isinstance(client_config, ClientConfig):
+        return client_config, {}
+    service_config = dict(client_config)
+    return service_config.pop("*", None), service_config
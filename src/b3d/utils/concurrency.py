@@ -0,0 +1,182 @@
+"""
+Helpers for running report-producing generators on worker threads
+"""
+import collections
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, List, Optional
+
+
+# Marks the end of a single producer's output on the shared queue
+_DONE = object()
+# Default number of items that producers may buffer ahead of the consumer
+DEFAULT_BUFFER_SIZE = 64
+
+
+def chunks(items: Iterable, size: int = 200) -> Iterator[List]:
+    """
+    Split an iterable into lists of at most <size> items without materializing it
+    """
+
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
+def merge_generators(
+        producers: List[Callable[[], Iterator]], max_workers: int, buffer_size: int = DEFAULT_BUFFER_SIZE
+) -> Iterator:
+    """
+    Run each producer (a callable returning an iterator) on a bounded thread pool and yield
+    items as soon as any producer emits them. At most <buffer_size> items are held while
+    waiting for the consumer, so slow consumers apply backpressure to the producers. If the
+    consumer stops iterating early, producers stop at their next item. An exception raised by
+    a producer is re-raised to the consumer.
+    """
+
+    items = queue.Queue(maxsize=buffer_size)
+    stop = threading.Event()
+
+    def _put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(producer: Callable[[], Iterator]):
+        try:
+            if stop.is_set():
+                return
+            for item in producer():
+                if not _put((None, item)):
+                    return
+        except Exception as e:  # pylint: disable=broad-except
+            _put((e, None))
+        finally:
+            _put(_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    for producer in producers:
+        executor.submit(_run, producer)
+
+    try:
+        remaining = len(producers)
+        while remaining > 0:
+            entry = items.get()
+            if entry is _DONE:
+                remaining -= 1
+                continue
+            err, item = entry
+            if err is not None:
+                raise err
+            yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
+
+
+class BackgroundGenerators:
+    """
+    Runs producers (callables returning iterators) on their own daemon threads while the caller
+    carries on with other work, collecting their items on a shared queue. ready() yields the items
+    produced so far without waiting, and drain() waits for every producer to finish. An exception
+    raised by a producer is re-raised to the consumer.
+    """
+
+    def __init__(self):
+        self._items = queue.Queue()
+        self._running = 0
+
+    def start(self, producer: Callable[[], Iterator]):
+        """
+        Start running a producer on a new daemon thread
+        """
+
+        self._running += 1
+        threading.Thread(target=self._run, args=(producer,), daemon=True).start()
+
+    def _run(self, producer: Callable[[], Iterator]):
+        try:
+            for item in producer():
+                self._items.put((None, item))
+        except Exception as e:  # pylint: disable=broad-except
+            self._items.put((e, None))
+        finally:
+            self._items.put(_DONE)
+
+    def _handle(self, entry) -> list:
+        if entry is _DONE:
+            self._running -= 1
+            return []
+        err, item = entry
+        if err is not None:
+            raise err
+        return [item]
+
+    def ready(self) -> Iterator:
+        """
+        Yield the items that producers have emitted so far
+        """
+
+        while self._running > 0:
+            try:
+                entry = self._items.get_nowait()
+            except queue.Empty:
+                return
+            yield from self._handle(entry)
+
+    def drain(self) -> Iterator:
+        """
+        Yield items as producers emit them, until every producer has finished
+        """
+
+        while self._running > 0:
+            yield from self._handle(self._items.get())
+
+
+def bounded_map(
+        fn: Callable, items: Iterable, max_workers: int, max_in_flight: Optional[int] = None, ordered: bool = False
+) -> Iterator:
+    """
+    Apply <fn> to each item on a thread pool of <max_workers> threads and yield the results, either
+    as they complete or, if <ordered> is True, in the order of <items>. Items are only taken from
+    <items> (on the consumer's thread) while fewer than <max_in_flight> results (twice <max_workers>
+    if None) are running or waiting to be consumed, so a slow consumer holds back new work. An
+    exception raised by <fn> is re-raised to the consumer.
+    """
+
+    max_in_flight = 2 * max_workers if max_in_flight is None else max_in_flight
+    pending = collections.deque()
+
+    def _take(block: bool) -> Iterator:
+        if ordered:
+            while len(pending) > 0 and (block or pending[0].done()):
+                block = False
+                yield pending.popleft().result()
+            return
+        done = wait(pending, return_when=FIRST_COMPLETED).done if block else [f for f in pending if f.done()]
+        for future in done:
+            pending.remove(future)
+            yield future.result()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for item in items:
+                pending.append(executor.submit(fn, item))
+                if len(pending) >= max_in_flight:
+                    yield from _take(block=True)
+                yield from _take(block=False)
+            while len(pending) > 0:
+                yield from _take(block=True)
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,39 @@
+"""
+Deferred imports for heavy dependencies (e.g. boto3), so that importing b3d stays cheap for
+processes that never make an AWS API call
+"""
+from importlib import import_module
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported the first time one of its attributes is accessed.
+    Modules that use one as a type annotation must defer evaluation of their annotations.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        """
+        Import the module, if it hasn't been imported yet, and return it
+        """
+
+        if self._module is None:
+            # import_module holds the import lock, so concurrent first accesses import the module once
+            self._module = import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r}>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Return a stand-in for some module that imports it on first use
+    """
+    return LazyModule(name)
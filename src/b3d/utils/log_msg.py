@@ -1,6 +1,7 @@
 """
 Functions that are used to generate different types of log messages
 """
+from typing import Optional
 
 
 def _new_log_msg(result: str = None, err: str = None, msg: str = None):
@@ -11,6 +12,18 @@ def _new_log_msg(result: str = None, err: str = None, msg: str = None):
     }
 
 
+def _add_retry_stats(log_msg: dict, resp: dict) -> dict:
+    """
+    Record how many times the call behind a log message was retried, and how many seconds were
+    spent waiting between attempts
+    """
+
+    stats = resp.get("RetryStats", {})
+    log_msg["retries"] = stats.get("retries", 0)
+    log_msg["slept"] = stats.get("slept", 0.0)
+    return log_msg
+
+
 def log_msg_destroy(resource_type: str, resource_id: str, resp: dict) -> dict:
     """
     Produce a log message that describes the resource being deleted and whether the
@@ -28,9 +41,63 @@ def log_msg_destroy(resource_type: str, resource_id: str, resp: dict) -> dict:
         prefix = "Successfully deleted"
     log_msg["msg"] = f"{prefix} {resource_type} with ID {resource_id}"
 
+    return _add_retry_stats(log_msg, resp)
+
+
+def log_msg_purge(resource_type: str, bucket_name: str, action: str, counts: dict) -> dict:
+    """
+    Produce a log message that counts the contents of a bucket (e.g. "objects") that were
+    removed, and those that could not be, given the <counts> of a purge ("count", "failed",
+    "err" of the first failure, "retries" and "slept")
+    """
+
+    log_msg = _new_log_msg(err=counts["err"])
+    total = counts["count"] + counts["failed"]
+    if counts["failed"] > 0:
+        log_msg["result"] = "failure"
+        log_msg["msg"] = f"Unable to purge bucket {bucket_name}: {counts['failed']} of {total} {resource_type} " \
+            f"were not {action}"
+    else:
+        log_msg["result"] = "success"
+        log_msg["msg"] = f"Successfully {action} {total} {resource_type} in bucket {bucket_name}"
+    for field in ["count", "failed", "retries", "slept"]:
+        log_msg[field] = counts[field]
     return log_msg
 
 
+def log_msg_listing_failure(resource_type: str, bucket_name: str, resp: dict) -> dict:
+    """
+    Produce a log message for the contents of a bucket (e.g. "objects") that could not be listed, so
+    those left unlisted were not removed
+    """
+    return _new_log_msg(
+        result="failure",
+        err=resp.get("Error", {}),
+        msg=f"Unable to list {resource_type} in bucket {bucket_name}"
+    )
+
+
+def log_msg_scheduled(bucket_name: str, resp: Optional[dict] = None) -> dict:
+    """
+    Produce a log message for a bucket whose contents are left to expire through its lifecycle
+    configuration, which a later sweep deletes once it is empty. <resp> is the response of the call
+    that put the lifecycle configuration, or None if an earlier sweep already put it.
+    """
+
+    log_msg = _new_log_msg()
+    if resp is not None and resp["ResponseMetadata"]["HTTPStatusCode"] not in [200, 202, 204]:
+        log_msg["result"] = "failure"
+        log_msg["err"] = resp.get("Error", {})
+        log_msg["msg"] = f"Unable to schedule deletion of bucket with ID {bucket_name}"
+    else:
+        log_msg["result"] = "scheduled"
+        prefix = "Still waiting for" if resp is None else "Scheduled"
+        log_msg["msg"] = f"{prefix} expiration of the contents of bucket with ID {bucket_name}, which is " \
+            f"deleted by a later sweep once it is empty"
+
+    return _add_retry_stats(log_msg, resp or {})
+
+
 def log_msg_detach(
         resource_type_detached_from: str, resource_type_detached: str,
         resource_id_detached_from: str, resource_id_detached: str,
@@ -52,7 +119,7 @@ def log_msg_detach(
     log_msg["msg"] = f"{prefix} {resource_type_detached} with ID {resource_id_detached} " \
                      f"from {resource_type_detached_from} with ID {resource_id_detached_from}"
 
-    return log_msg
+    return _add_retry_stats(log_msg, resp)
 
 
 def log_msg_disable(resource_type: str, resource_id: str, resp: dict):
@@ -71,7 +138,7 @@ def log_msg_disable(resource_type: str, resource_id: str, resp: dict):
         prefix = "Successfully disabled"
     log_msg["msg"] = f"{prefix} {resource_type} with ID {resource_id}"
 
-    return log_msg
+    return _add_retry_stats(log_msg, resp)
 
 
 def log_msg_unsupported_resource(resource_arn: str):
@@ -83,3 +150,89 @@ def log_msg_unsupported_resource(resource_arn: str):
         msg=f"Unable to delete resource with ARN {resource_arn} because "
         f"this library currently doesn't support that resource type."
     )
+
+
+def log_msg_unsupported_summary(counts: dict) -> dict:
+    """
+    Produce a single log message counting the resources, by "<service>:<resource_type>", that
+    were skipped because this library doesn't currently support their types
+    """
+    return _new_log_msg(
+        result="failure",
+        msg=f"Skipped {sum(counts.values())} resources because this library currently doesn't support "
+        f"their types: {', '.join(f'{t} ({n})' for t, n in sorted(counts.items()))}"
+    )
+
+
+def _err_from_exception(err: Exception) -> dict:
+    """
+    Produce an error record for an exception, matching the shape of AWS API error responses
+    """
+
+    response = getattr(err, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {})
+    return {"Code": type(err).__name__, "Message": str(err)}
+
+
+def log_msg_discovery_failure(source: str, err: Exception) -> dict:
+    """
+    Produce a log message for a discovery source that was unable to list resources
+    """
+    return _new_log_msg(
+        result="failure",
+        err=_err_from_exception(err),
+        msg=f"Unable to discover resources using source {source}"
+    )
+
+
+def log_msg_plan_failure(err: Exception) -> dict:
+    """
+    Produce a log message for a delete plan whose dependencies could not be looked up
+    """
+    return _new_log_msg(
+        result="failure",
+        err=_err_from_exception(err),
+        msg="Unable to look up dependencies between resources, so they are deleted in discovery order"
+    )
+
+
+def log_msg_timeout(resource_arn: str, timeout: float) -> dict:
+    """
+    Produce a log message for a resource whose delete was cancelled after some number of seconds
+    """
+    return _new_log_msg(
+        result="failure",
+        err={"Code": "Timeout", "Message": f"Cancelled after {timeout} seconds"},
+        msg=f"Timed out after {timeout} seconds deleting resource with ARN {resource_arn}"
+    )
+
+
+def log_msg_sweep_failure(region: str, err: Exception) -> dict:
+    """
+    Produce a log message for a region that could not be swept
+    """
+    return _new_log_msg(
+        result="failure",
+        err=_err_from_exception(err),
+        msg=f"Unable to complete sweep of region {region}"
+    )
+
+
+def log_msg_regions_failure(err: Exception) -> dict:
+    """
+    Produce a log message for a multi-region sweep that could not list the enabled regions
+    """
+    return _new_log_msg(
+        result="failure",
+        err=_err_from_exception(err),
+        msg="Unable to list the regions enabled for this account, so only global resources were swept"
+    )
+
+
+def annotate(report: list, **fields) -> list:
+    """
+    Return a copy of a report with extra fields (e.g. the region a resource was deleted from)
+    added to each of its log messages
+    """
+    return [{**msg, **fields} for msg in report]
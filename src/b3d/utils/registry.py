@@ -0,0 +1,179 @@
+"""
+Lazily-resolved registry of resource delete procedures, keyed on AWS service and resource type
+"""
+import threading
+from collections.abc import Mapping
+from importlib import import_module
+from typing import Dict, Iterator, Optional, Union
+
+
+# Entry point group that third-party packages can use to register delete procedures. Each entry
+# point is named "<service>:<resource_type>" and refers to a Service.Resource subclass, e.g.
+#   [project.entry-points."b3d.delete"]
+#   "sqs:queue" = "my_package.delete:SQS.Queue"
+ENTRY_POINT_GROUP = "b3d.delete"
+
+# Delete procedure for every resource type supported by b3d, as "<module>:<attribute path>" references,
+# so that a delete module is only imported the first time one of its resource types is looked up
+MANIFEST = {
+    "apigateway": {
+        "apikeys": "b3d.delete.api_gateway:ApiGateway.ApiKey",
+        "restapis": "b3d.delete.api_gateway:ApiGateway.RestApi",
+        "stages": "b3d.delete.api_gateway:ApiGateway.Stage",
+        "usageplans": "b3d.delete.api_gateway:ApiGateway.UsagePlan"
+    },
+    "ec2": {
+        "instance": "b3d.delete.ec2:EC2.Instance",
+        "security-group": "b3d.delete.ec2:EC2.SecurityGroup",
+        "volume": "b3d.delete.ec2:EC2.Volume"
+    },
+    "iam": {
+        "policy": "b3d.delete.iam:IAM.Policy",
+        "role": "b3d.delete.iam:IAM.Role",
+        "user": "b3d.delete.iam:IAM.User"
+    },
+    "kms": {
+        "key": "b3d.delete.kms:KMS.Key"
+    },
+    "lambda": {
+        "function": "b3d.delete.lambda_:Lambda.Function"
+    },
+    "s3": {
+        "bucket": "b3d.delete.s3:S3.Bucket"
+    },
+    "ssm": {
+        "parameter": "b3d.delete.ssm:SSM.Parameter"
+    },
+    "unsupported-service": {
+        "unsupported-resource": "b3d.delete.unsupported:UnsupportedService.UnsupportedResource"
+    }
+}
+
+
+def resolve(reference: str):
+    """
+    Import the object that some "<module>:<attribute path>" reference points to
+    """
+
+    module, _, path = reference.partition(":")
+    obj = import_module(module)
+    for attr in path.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _entry_points() -> list:
+    """
+    List the entry points registered under ENTRY_POINT_GROUP by installed packages
+    """
+
+    try:
+        from importlib.metadata import entry_points  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        # Python 3.7 has no importlib.metadata, so only the manifest and register() are available
+        return []
+
+    eps = entry_points()
+    if hasattr(eps, "select"):
+        return list(eps.select(group=ENTRY_POINT_GROUP))
+    return list(eps.get(ENTRY_POINT_GROUP, []))
+
+
+class _ServiceView(Mapping):
+    """
+    Read-only view of the resource types registered for a single service, which imports a delete
+    procedure only when its resource type is looked up
+    """
+
+    def __init__(self, registry: "DeleteRegistry", service: str):
+        self._registry = registry
+        self._service = service
+
+    def __getitem__(self, resource_type: str):
+        return self._registry.lookup(self._service, resource_type)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._registry.references()[self._service])
+
+    def __len__(self) -> int:
+        return len(self._registry.references()[self._service])
+
+
+class DeleteRegistry(Mapping):
+    """
+    Nested {<service>: {<resource_type>: <delete procedure>}} mapping, built from MANIFEST, the
+    ENTRY_POINT_GROUP entry points of installed packages and register() calls. Listing services and
+    resource types imports nothing; each delete procedure is imported the first time it is looked up.
+    """
+
+    def __init__(self, manifest: Optional[Dict[str, Dict[str, str]]] = None, entry_points: bool = True):
+        self._lock = threading.Lock()
+        self._manifest = MANIFEST if manifest is None else manifest
+        self._use_entry_points = entry_points
+        self._references = None
+        self._resolved = {}
+
+    def references(self) -> Dict[str, Dict[str, Union[str, type]]]:
+        """
+        Return the {<service>: {<resource_type>: <reference or class>}} map, reading entry points
+        the first time it is needed
+        """
+
+        if self._references is None:
+            with self._lock:
+                if self._references is None:
+                    references = {service: dict(resources) for service, resources in self._manifest.items()}
+                    for ep in _entry_points() if self._use_entry_points else []:
+                        service, _, resource_type = ep.name.partition(":")
+                        references.setdefault(service, {})[resource_type] = ep.value
+                    self._references = references
+        return self._references
+
+    def register(self, service: str, resource_type: str, procedure: Union[str, type]):
+        """
+        Register the delete procedure for some (<service>, <resource_type>) pair, either a Service.Resource
+        subclass or a "<module>:<attribute path>" reference to one, replacing any existing procedure
+        """
+
+        references = self.references()
+        with self._lock:
+            references.setdefault(service, {})[resource_type] = procedure
+            self._resolved.pop((service, resource_type), None)
+
+    def lookup(self, service: str, resource_type: str):
+        """
+        Return the delete procedure for some (<service>, <resource_type>) pair, importing it if this
+        is the first lookup. Raises KeyError if none is registered.
+        """
+
+        try:
+            return self._resolved[(service, resource_type)]
+        except KeyError:
+            pass
+
+        procedure = self.references()[service][resource_type]
+        if isinstance(procedure, str):
+            procedure = resolve(procedure)
+        self._resolved[(service, resource_type)] = procedure
+        return procedure
+
+    def __getitem__(self, service: str) -> _ServiceView:
+        if service not in self.references():
+            raise KeyError(service)
+        return _ServiceView(self, service)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.references())
+
+    def __len__(self) -> int:
+        return len(self.references())
+
+
+DELETE_REGISTRY = DeleteRegistry()
+
+
+def register(service: str, resource_type: str, procedure: Union[str, type]):
+    """
+    Register the delete procedure for some (<service>, <resource_type>) pair with the default registry
+    """
+    DELETE_REGISTRY.register(service, resource_type, procedure)
@@ -0,0 +1,23 @@
+"""
+Settings for how S3 buckets are emptied and deleted, which are given per call rather than set
+process-wide
+"""
+from __future__ import annotations
+from typing import NamedTuple, Optional
+
+
+class S3Options(NamedTuple):
+    """
+    Settings for the S3 buckets destroyed by a call. If <prefix_delimiter> is set (e.g. to "/"), the
+    keys under each top-level prefix of a bucket are listed concurrently, rather than by a single
+    listing of the whole bucket. If <bypass_governance_retention> is True, object versions under
+    Object Lock governance retention are deleted anyway, which needs the s3:BypassGovernanceRetention
+    permission. Versions under compliance retention can never be deleted. If <lifecycle_teardown> is
+    True, buckets that aren't empty are left to expire their contents through a lifecycle
+    configuration, and deleted by a later sweep once they are empty, rather than emptied with
+    delete calls.
+    """
+
+    prefix_delimiter: Optional[str] = None
+    bypass_governance_retention: bool = False
+    lifecycle_teardown: bool = False
@@ -4,7 +4,8 @@ All fixtures used by test functions
 import random
 import string
 import pytest
-from tests import utils
+from b3d import Engine
+from tests import config, utils
 
 
 @pytest.fixture
@@ -18,3 +19,19 @@ def generate_tag():
     }
 
     utils.cleanup_terraform_files_on_disk()
+
+
+@pytest.fixture
+def mocked_aws(monkeypatch):
+    """
+    Stand in for AWS with moto, with fake credentials so that no real account can be touched.
+    Yields an engine whose clients are only used by a single test.
+    """
+
+    moto = pytest.importorskip("moto")
+    for name in ["AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SECURITY_TOKEN", "AWS_SESSION_TOKEN"]:
+        monkeypatch.setenv(name, "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", config.AWS_REGION)
+
+    with moto.mock_aws(), Engine() as engine:
+        yield engine
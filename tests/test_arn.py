@@ -0,0 +1,69 @@
+"""
+Tests for parsing ARNs into their components, including the services whose ARNs don't follow
+the usual '<resource_type>/<resource_id>' form
+"""
+import pytest
+from b3d.utils.arn import Arn, parse
+
+
+@pytest.fixture(
+    params=[
+        (
+            "arn:aws:apigateway:us-east-1::/restapis/a1b2c3/stages/prod",
+            ("apigateway", "us-east-1", "", "stages", "prod")
+        ),
+        (
+            "arn:aws:apigateway:us-east-1::/restapis/a1b2c3",
+            ("apigateway", "us-east-1", "", "restapis", "a1b2c3")
+        ),
+        (
+            "arn:aws:apigateway:us-east-1::/usageplans/u1",
+            ("apigateway", "us-east-1", "", "usageplans", "u1")
+        ),
+        (
+            "arn:aws:lambda:us-east-1:123456789012:function:my-function",
+            ("lambda", "us-east-1", "123456789012", "function", "my-function")
+        ),
+        (
+            "arn:aws:s3:::my-bucket",
+            ("s3", "", "", "bucket", "my-bucket")
+        ),
+        (
+            "arn:aws:ec2:us-east-1:123456789012:security-group/sg-1",
+            ("ec2", "us-east-1", "123456789012", "security-group", "sg-1")
+        ),
+        (
+            "arn:aws:iam::123456789012:role/path/to/my-role",
+            ("iam", "", "123456789012", "role", "my-role")
+        )
+    ]
+)
+def arn_components(request):
+    """
+    Return an ARN and its expected (service, region, account, resource_type, resource_id)
+    """
+    return request.param
+
+
+def test_parse(arn_components):
+    arn, (service, region, account, resource_type, resource_id) = arn_components
+    parsed = parse(arn)
+
+    assert parsed.service == service
+    assert parsed.region == region
+    assert parsed.account == account
+    assert parsed.resource_type == resource_type
+    assert parsed.resource_id == resource_id
+    assert parsed.partition == "aws"
+
+
+def test_parse_round_trip():
+    arn = "arn:aws:lambda:us-east-1:123456789012:function:my-function"
+    parsed = parse(arn)
+
+    assert isinstance(parsed, Arn)
+    assert parse(parsed) is parsed
+    assert str(parsed) == arn
+    assert parsed == arn and hash(parsed) == hash(arn)
+    assert parse("arn:aws:iam::123456789012:user/u").is_global
+    assert not parsed.is_global
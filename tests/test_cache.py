@@ -0,0 +1,136 @@
+"""
+Tests for the process-level TTL cache of the IAM tag index, which calls that opt in with
+iam_cache=True share across regions
+"""
+import threading
+import time
+import pytest
+from b3d import aws, b3d_
+from b3d.utils.cache import TagIndexCache
+import tests.config as config
+
+
+INDEX = {
+    "user": {"arn:aws:iam::123456789012:user/u": [{"Key": "Name", "Value": "a"}]},
+    "role": {"arn:aws:iam::123456789012:role/r": [{"Key": "Name", "Value": "a"}]}
+}
+
+
+class Clock:
+    """
+    Stand-in for time.monotonic that only moves when told to
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Replace the clock of the cache module with one that the test moves by hand
+    """
+
+    fake = Clock()
+    monkeypatch.setattr("b3d.utils.cache.time.monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def shared_cache():
+    """
+    Start and end with an empty process-level tag index cache
+    """
+
+    aws.iam.TAG_INDEX_CACHE.clear()
+    yield aws.iam.TAG_INDEX_CACHE
+    aws.iam.TAG_INDEX_CACHE.clear()
+
+
+def test_ttl_expiry(clock):
+    cache = TagIndexCache(ttl=10.0)
+    builds = []
+
+    def _build():
+        builds.append(clock.now)
+        return {"user": {}, "build": len(builds)}
+
+    assert cache.get(_build)["build"] == 1
+    clock.now += 9.9
+    assert cache.get(_build)["build"] == 1
+    clock.now += 0.1
+    assert cache.get(_build)["build"] == 2
+    assert builds == [1000.0, 1010.0]
+
+    cache.clear()
+    assert cache.get(_build)["build"] == 3
+
+
+def test_invalidate():
+    cache = TagIndexCache()
+    handed_out = cache.get(lambda: INDEX)
+
+    cache.invalidate("arn:aws:iam::123456789012:user/u")
+    cache.invalidate("arn:aws:iam::123456789012:user/missing")
+
+    index = cache.get(lambda: pytest.fail("rebuilt"))
+    assert index["user"] == {}
+    assert index["role"] is INDEX["role"]
+    # An index that was handed out earlier is never changed
+    assert handed_out is INDEX and len(INDEX["user"]) == 1
+
+    # Invalidating an empty cache does nothing
+    TagIndexCache().invalidate("arn:aws:iam::123456789012:user/u")
+
+
+def test_concurrent_callers_share_one_build():
+    cache = TagIndexCache()
+    builds = []
+    release = threading.Event()
+
+    def _build():
+        builds.append(None)
+        release.wait(1)
+        return INDEX
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(_build))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert len(results) == 4 and all(result is INDEX for result in results)
+
+
+def test_shared_across_regions_and_calls(mocked_aws, shared_cache, monkeypatch):
+    builds = []
+    build_tag_index = aws.iam.build_tag_index
+
+    def _build(cl, *args, **kwargs):
+        builds.append(cl)
+        return build_tag_index(cl, *args, **kwargs)
+
+    monkeypatch.setattr(aws.iam, "build_tag_index", _build)
+    mocked_aws.client("iam", config.AWS_REGION).create_user(UserName="u", Tags=[{"Key": "Name", "Value": "a"}])
+
+    for region in ["us-east-1", "us-west-2", "us-east-1"]:
+        arns, _ = b3d_.get_all_resources_with_tag("Name", "a", region, iam_cache=True, engine=mocked_aws)
+        assert [str(arn) for arn in arns] == ["arn:aws:iam::123456789012:user/u"]
+    assert len(builds) == 1
+
+    # Calls that don't opt in always rescan, and leave the shared index alone
+    b3d_.get_all_resources_with_tag("Name", "a", "us-west-2", engine=mocked_aws)
+    assert len(builds) == 2
+
+    # Deleting a user drops it from the shared index, so later cached calls don't rediscover it
+    resps = list(b3d_.delete_resources("Name", "a", "us-west-2", dry=False, iam_cache=True, engine=mocked_aws))
+    assert [resp[-1]["result"] for resp in resps] == ["success"]
+    assert b3d_.get_all_resources_with_tag("Name", "a", "us-east-1", iam_cache=True, engine=mocked_aws)[0] == []
+    assert len(builds) == 2
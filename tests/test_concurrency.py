@@ -0,0 +1,113 @@
+"""
+Tests for running report-producing work on worker threads
+"""
+import threading
+import time
+import pytest
+from b3d.utils.concurrency import BackgroundGenerators, bounded_map, chunks, merge_generators
+
+
+def test_chunks():
+    assert list(chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunks([], 2)) == []
+
+
+def test_bounded_map_ordered():
+    # Later items finish first, but are yielded in the order of the input
+    results = bounded_map(lambda i: time.sleep(0.01 * (5 - i)) or i, range(5), max_workers=5, ordered=True)
+    assert list(results) == [0, 1, 2, 3, 4]
+
+
+def test_bounded_map_unordered_yields_as_completed():
+    results = list(bounded_map(lambda i: time.sleep(0.02 * (3 - i)) or i, range(3), max_workers=3))
+    assert sorted(results) == [0, 1, 2]
+    assert results[0] == 2
+
+
+def test_bounded_map_backpressure():
+    taken = []
+
+    def _items():
+        for i in range(100):
+            taken.append(i)
+            yield i
+
+    results = bounded_map(lambda i: i, _items(), max_workers=2, max_in_flight=4)
+    next(results)
+    # Only a bounded number of items are taken ahead of the consumer
+    assert len(taken) <= 5
+    results.close()
+
+
+def test_bounded_map_raises():
+    def _fail(i):
+        if i == 2:
+            raise ValueError("failed")
+        return i
+
+    with pytest.raises(ValueError):
+        list(bounded_map(_fail, range(5), max_workers=2))
+
+
+def test_merge_generators():
+    producers = [lambda: iter([1, 2, 3]), lambda: iter([]), lambda: iter([4, 5])]
+    assert sorted(merge_generators(producers, max_workers=2)) == [1, 2, 3, 4, 5]
+
+
+def test_merge_generators_interleaves():
+    release = threading.Event()
+
+    def _slow():
+        release.wait(1)
+        yield "slow"
+
+    def _fast():
+        yield "fast"
+
+    merged = merge_generators([_slow, _fast], max_workers=2)
+    # The fast producer's item arrives while the slow producer is still blocked
+    assert next(merged) == "fast"
+    release.set()
+    assert list(merged) == ["slow"]
+
+
+def test_merge_generators_raises():
+    def _fail():
+        yield 1
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError):
+        list(merge_generators([_fail], max_workers=1))
+
+
+def test_merge_generators_stops_producers_early():
+    produced = []
+
+    def _endless():
+        for i in range(10000):
+            produced.append(i)
+            yield i
+
+    merged = merge_generators([_endless], max_workers=1, buffer_size=2)
+    assert next(merged) == 0
+    merged.close()
+    count = len(produced)
+    time.sleep(0.3)
+    assert len(produced) == count < 10000
+
+
+def test_background_generators():
+    background = BackgroundGenerators()
+    release = threading.Event()
+
+    def _waiting():
+        release.wait(1)
+        yield "done"
+
+    background.start(lambda: iter(["first"]))
+    background.start(_waiting)
+    time.sleep(0.05)
+
+    assert list(background.ready()) == ["first"]
+    release.set()
+    assert list(background.drain()) == ["done"]
@@ -0,0 +1,101 @@
+"""
+Tests for selecting resource types to discover, and for grouping resources to be destroyed while
+counting those of unsupported types
+"""
+import collections
+from b3d import b3d_
+from b3d.delete.ssm import SSM
+from b3d.dispatch import TypeFilter, destroy_groups, map_arns, unsupported_summary
+import tests.config as config
+
+
+PREFIX = "arn:aws:ec2:us-east-1:123456789012"
+TAG = {"Key": "Name", "Value": "B3DTEST_dispatch"}
+
+
+def test_selects():
+    assert TypeFilter().selects("ec2", "instance")
+    assert TypeFilter(["ec2"]).selects("ec2", "instance")
+    assert TypeFilter(["ec2:instance"]).selects("ec2", "instance")
+    assert not TypeFilter(["ec2:volume"]).selects("ec2", "instance")
+    assert not TypeFilter([]).selects("ec2", "instance")
+    assert not TypeFilter(exclude=["ec2"]).selects("ec2", "instance")
+    assert TypeFilter(exclude=["ec2:volume"]).selects("ec2", "instance")
+    # Exclusions win over inclusions
+    assert not TypeFilter(["ec2"], ["ec2:instance"]).selects("ec2", "instance")
+    assert TypeFilter(["ec2"], ["ec2:instance"]).selects("ec2", "volume")
+
+
+def test_resource_type_filters():
+    assert TypeFilter(["ssm", "ec2:instance"]).resource_type_filters() == ["ec2:instance", "ssm:parameter"]
+    # Types that the ResourceGroupsTaggingApi names differently are queried by service
+    assert TypeFilter(["s3"]).resource_type_filters() == ["s3"]
+    # IAM is global and isn't listed by the ResourceGroupsTaggingApi
+    assert TypeFilter(["iam"]).resource_type_filters() == []
+
+    every_type = TypeFilter().resource_type_filters()
+    assert "ec2:instance" in every_type and not any(t.startswith("iam") for t in every_type)
+    without_ec2 = TypeFilter(exclude=["ec2"]).resource_type_filters()
+    assert not any(t.startswith("ec2") for t in without_ec2)
+    assert len(without_ec2) == len(every_type) - sum(t.startswith("ec2") for t in every_type)
+
+
+def test_resource_type_filters_sent_to_get_resources(mocked_aws):
+    ssm = mocked_aws.client("ssm", config.AWS_REGION)
+    ssm.put_parameter(Name="p0", Value="value", Type="String", Tags=[TAG])
+    ec2 = mocked_aws.client("ec2", config.AWS_REGION)
+    ec2.create_security_group(
+        GroupName="b3d-test", Description="b3d test",
+        TagSpecifications=[{"ResourceType": "security-group", "Tags": [TAG]}]
+    )
+    mocked_aws.client("iam", config.AWS_REGION).create_user(UserName="u", Tags=[TAG])
+
+    sent = []
+    mocked_aws.client("resourcegroupstaggingapi", config.AWS_REGION).meta.events.register(
+        "before-parameter-build.resource-groups-tagging-api.GetResources",
+        lambda params, **kwargs: sent.append(params.get("ResourceTypeFilters"))
+    )
+
+    resps = list(b3d_.delete_resources(
+        TAG["Key"], TAG["Value"], config.AWS_REGION, dry=False, resource_types=["ssm"], engine=mocked_aws
+    ))
+
+    assert sent == [["ssm:parameter"]]
+    assert [r[-1]["result"] for r in resps] == ["success"] and "p0" in resps[0][-1]["msg"]
+    # Resources of the other types are left alone
+    assert len(ec2.describe_security_groups(GroupNames=["b3d-test"])["SecurityGroups"]) == 1
+    assert len(mocked_aws.client("iam", config.AWS_REGION).list_users()["Users"]) == 1
+
+
+def test_destroy_groups_counts_unsupported():
+    arns = [
+        f"{PREFIX}:instance/i-1", "arn:aws:foo:us-east-1:123456789012:bar/b-1", f"{PREFIX}:instance/i-2",
+        "arn:aws:foo:us-east-1:123456789012:bar/b-2", "arn:aws:foo:us-east-1:123456789012:baz/z-1",
+        f"{PREFIX}:volume/vol-1"
+    ]
+    unsupported = collections.Counter()
+
+    groups = [(obj, [str(arn) for arn in group]) for obj, group in destroy_groups(map_arns(arns), unsupported)]
+
+    # Unsupported resources don't split the run of instances around them
+    assert [group for _, group in groups] == [
+        [f"{PREFIX}:instance/i-1", f"{PREFIX}:instance/i-2"], [f"{PREFIX}:volume/vol-1"]
+    ]
+    assert unsupported == {("foo", "bar"): 2, ("foo", "baz"): 1}
+
+    summary = list(unsupported_summary(unsupported))
+    assert len(summary) == 1 and summary[0][0]["result"] == "failure"
+    assert summary[0][0]["msg"].startswith("Skipped 3 resources")
+    assert "foo:bar (2), foo:baz (1)" in summary[0][0]["msg"]
+
+    assert not list(unsupported_summary(collections.Counter()))
+
+
+def test_destroy_groups_batch_size(monkeypatch):
+    monkeypatch.setattr(SSM.Parameter, "batch_size", staticmethod(lambda: 2))
+    arns = [f"arn:aws:ssm:us-east-1:123456789012:parameter/p{i}" for i in range(5)] + [f"{PREFIX}:volume/vol-1"]
+
+    groups = [[arn.resource_id for arn in group] for _, group in destroy_groups(map_arns(arns), collections.Counter())]
+
+    # Runs of one type are split into groups of up to the type's batch size
+    assert groups == [["p0", "p1"], ["p2", "p3"], ["p4"], ["vol-1"]]
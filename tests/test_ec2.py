@@ -0,0 +1,132 @@
+"""
+Tests for terminating EC2 instances in batches and waiting on all of them with a single poll loop
+"""
+import pytest
+from b3d import aws, b3d_
+from b3d.delete.ec2 import EC2
+from b3d.utils.arn import parse
+import tests.config as config
+
+
+TAG = {"Key": "Name", "Value": "B3DTEST_ec2"}
+
+
+def instance_arn(instance_id: str):
+    """
+    Build the parsed ARN of an instance in the test region
+    """
+    return parse(f"arn:aws:ec2:{config.AWS_REGION}:123456789012:instance/{instance_id}")
+
+
+@pytest.fixture
+def ec2(mocked_aws):
+    """
+    Return an EC2 client, with a tagged security group and two tagged instances that use it
+    """
+
+    cl = mocked_aws.client("ec2", config.AWS_REGION)
+    group_id = cl.create_security_group(
+        GroupName="b3d-test", Description="b3d test",
+        TagSpecifications=[{"ResourceType": "security-group", "Tags": [TAG]}]
+    )["GroupId"]
+    cl.run_instances(
+        ImageId=cl.describe_images()["Images"][0]["ImageId"], MinCount=2, MaxCount=2,
+        SecurityGroupIds=[group_id], TagSpecifications=[{"ResourceType": "instance", "Tags": [TAG]}]
+    )
+    return cl
+
+
+def instance_ids(cl):
+    """
+    Return the IDs of every instance, in order
+    """
+    return sorted(i["InstanceId"] for r in cl.describe_instances()["Reservations"] for i in r["Instances"])
+
+
+@pytest.fixture
+def never_terminated(monkeypatch):
+    """
+    Make every instance look like it is still shutting down, without waiting between polls
+    """
+
+    monkeypatch.setattr(aws.ec2, "terminated_instance_ids", lambda cl, ids: [])
+    monkeypatch.setattr(aws.ec2.time, "sleep", lambda seconds: None)
+
+
+def test_wait_for_instances_terminated(ec2):
+    first, second = instance_ids(ec2)
+    ec2.terminate_instances(InstanceIds=[first])
+
+    waited = list(aws.ec2.wait_for_instances_terminated(ec2, [first, second], poll_interval=0, max_polls=2))
+
+    assert waited == [(first, True), (second, False)]
+
+
+def test_wait_for_instances_terminated_timeout(ec2, never_terminated):
+    ids = instance_ids(ec2)
+    waited = list(aws.ec2.wait_for_instances_terminated(ec2, ids, poll_interval=0, max_polls=1))
+    assert waited == [(instance_id, False) for instance_id in ids]
+
+
+def test_destroy_many_not_terminated(mocked_aws, ec2, never_terminated):
+    ids = instance_ids(ec2)
+
+    pairs = list(EC2.Instance.destroy_many([instance_arn(i) for i in ids], config.AWS_REGION, False, mocked_aws))
+
+    assert [arn.resource_id for arn, _ in pairs] == ids
+    for _, report in pairs:
+        assert report[-1]["result"] == "failure"
+        assert report[-1]["err"]["Code"] == "InstanceNotTerminated"
+        waited = aws.ec2.TERMINATED_POLL_INTERVAL * (aws.ec2.TERMINATED_MAX_POLLS - 1)
+        assert f"after {waited} seconds" in report[-1]["err"]["Message"]
+
+
+def test_termination_report():
+    arn = instance_arn("i-1")
+    resp = {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+    _, report = EC2.Instance.termination_report((arn, [], resp), False, 30)
+    assert report[-1]["result"] == "failure" and report[-1]["err"]["Code"] == "InstanceNotTerminated"
+    assert "after 30 seconds" in report[-1]["err"]["Message"]
+
+    _, report = EC2.Instance.termination_report((arn, [], resp), True)
+    assert report[-1]["result"] == "success"
+
+
+def test_describe_failure(mocked_aws, ec2, monkeypatch):
+    ids = instance_ids(ec2)
+    failure = {"Error": {"Code": "InternalError", "Message": "no"}, "ResponseMetadata": {"HTTPStatusCode": 500}}
+    monkeypatch.setattr(aws.ec2, "describe_instances_by_ids", lambda cl, instance_ids: failure)
+
+    pairs = list(EC2.Instance.destroy_many([instance_arn(i) for i in ids], config.AWS_REGION, False, mocked_aws))
+
+    # Each instance gets its own failure report, and none of them were terminated
+    assert [(arn.resource_id, report[-1]["result"]) for arn, report in pairs] == [(i, "failure") for i in ids]
+    assert {i["State"]["Name"] for r in ec2.describe_instances()["Reservations"] for i in r["Instances"]} == \
+        {"running"}
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"max_workers": 4}])
+def test_security_groups_wait_for_terminations(mocked_aws, ec2, monkeypatch, kwargs):
+    events = []
+    terminated_instance_ids = aws.ec2.terminated_instance_ids
+    destroy_many = EC2.SecurityGroup.destroy_many
+
+    def _terminated_instance_ids(cl, ids):
+        terminated = terminated_instance_ids(cl, ids)
+        events.extend("terminated" for _ in terminated)
+        return terminated
+
+    def _destroy_many(*args, **kwargs):
+        events.append("security-group")
+        return destroy_many(*args, **kwargs)
+
+    monkeypatch.setattr(aws.ec2, "terminated_instance_ids", _terminated_instance_ids)
+    monkeypatch.setattr(EC2.SecurityGroup, "destroy_many", _destroy_many)
+
+    resps = list(b3d_.delete_resources(
+        TAG["Key"], TAG["Value"], config.AWS_REGION, dry=False, engine=mocked_aws, **kwargs
+    ))
+
+    assert [r[-1]["result"] for r in resps] == ["success"] * 3
+    assert events == ["terminated", "terminated", "security-group"]
@@ -0,0 +1,85 @@
+"""
+Tests for the transport settings that an engine creates its boto3 clients with
+"""
+import pytest
+from b3d import b3d_
+from b3d.engine import Engine
+from b3d.utils.client_config import ClientConfig
+import tests.config as config
+
+
+SETTINGS = ClientConfig(
+    max_pool_connections=32, retry_mode="adaptive", max_attempts=7, connect_timeout=2.5, read_timeout=30
+)
+
+
+def assert_settings(cl, settings: ClientConfig):
+    """
+    Check that the botocore client <cl> was created with some settings
+    """
+
+    assert cl.meta.config.max_pool_connections == settings.max_pool_connections
+    assert cl.meta.config.retries["mode"] == settings.retry_mode
+    assert cl.meta.config.retries["total_max_attempts"] == settings.max_attempts
+    assert cl.meta.config.connect_timeout == settings.connect_timeout
+    assert cl.meta.config.read_timeout == settings.read_timeout
+
+
+def test_client_settings(mocked_aws):
+    with Engine(
+        mocked_aws.session, config=SETTINGS,
+        service_config={"ssm": ClientConfig(max_pool_connections=4, endpoint_url="http://localhost:4566")}
+    ) as engine:
+        assert_settings(engine.client("ec2", config.AWS_REGION), SETTINGS)
+        assert engine.client("ec2", config.AWS_REGION).meta.endpoint_url == "https://ec2.us-east-1.amazonaws.com"
+
+        ssm = engine.client("ssm", config.AWS_REGION)
+        assert_settings(ssm, SETTINGS._replace(max_pool_connections=4))
+        assert ssm.meta.endpoint_url == "http://localhost:4566"
+
+
+def test_default_settings(mocked_aws):
+    cl = mocked_aws.client("ec2", config.AWS_REGION)
+    assert cl.meta.config.max_pool_connections == 10
+    assert cl.meta.config.connect_timeout == 60
+
+
+def test_configured_engine(mocked_aws):
+    with mocked_aws.configured(SETTINGS, {"ssm": ClientConfig(read_timeout=5)}) as engine:
+        assert_settings(engine.client("ec2", config.AWS_REGION), SETTINGS)
+        assert_settings(engine.client("ssm", config.AWS_REGION), SETTINGS._replace(read_timeout=5))
+        # Clients created with the old settings aren't shared
+        assert engine.client("ec2", config.AWS_REGION) is not mocked_aws.client("ec2", config.AWS_REGION)
+
+
+def test_delete_resources_client_config(mocked_aws, monkeypatch):
+    mocked_aws.client("ssm", config.AWS_REGION).put_parameter(
+        Name="p0", Value="value", Type="String", Tags=[{"Key": "Name", "Value": "B3DTEST_engine"}]
+    )
+    tagging_endpoint = f"https://tagging.{config.AWS_REGION}.amazonaws.com"
+    clients = {}
+    client = Engine.client
+
+    def _client(self, service, region):
+        clients[service] = client(self, service, region)
+        return clients[service]
+
+    monkeypatch.setattr(Engine, "client", _client)
+
+    resps = list(b3d_.delete_resources(
+        "Name", "B3DTEST_engine", config.AWS_REGION, dry=False, engine=mocked_aws,
+        client_config={"*": SETTINGS, "resourcegroupstaggingapi": ClientConfig(endpoint_url=tagging_endpoint)}
+    ))
+
+    assert [r[-1]["result"] for r in resps] == ["success"]
+    for service in ["resourcegroupstaggingapi", "ssm"]:
+        assert_settings(clients[service], SETTINGS)
+    assert clients["resourcegroupstaggingapi"].meta.endpoint_url == tagging_endpoint
+
+
+@pytest.mark.parametrize("settings", [
+    {"retry_mode": "aggressive"}, {"max_pool_connections": 0}, {"connect_timeout": -1}
+])
+def test_invalid_settings(settings):
+    with pytest.raises(ValueError):
+        ClientConfig(**settings)
@@ -0,0 +1,478 @@
+"""
+For each test function below, resources are created in moto's stand-in for AWS and then deleted
+by one of b3d's entry points according to their tag. As with the terraform-backed tests, the
+output from b3d is checked for correctness, and a second sweep must find nothing left to delete.
+"""
+import asyncio
+import datetime
+import threading
+import time
+import pytest
+from b3d import Engine, Inventory, aws, b3d_
+from b3d.aio import delete_resources_async
+from b3d.aws.retry import RetryPolicy
+from b3d.delete import s3 as delete_s3
+from b3d.delete.ssm import SSM
+from b3d.utils.s3_options import S3Options
+import tests.config as config
+import tests.utils as utils
+
+
+TAG = {"Key": "Name", "Value": "B3DTEST_moto"}
+
+
+def create_parameters(engine, names, tag=None, region=config.AWS_REGION):
+    """
+    Create an SSM parameter for each name, tagged with <tag> (TAG if None)
+    """
+
+    ssm = engine.client("ssm", region)
+    for name in names:
+        ssm.put_parameter(Name=name, Value="value", Type="String", Tags=[tag or TAG])
+
+
+def create_instance(engine):
+    """
+    Create a tagged security group and a tagged instance that uses it, and return their IDs
+    """
+
+    ec2 = engine.client("ec2", config.AWS_REGION)
+    group_id = ec2.create_security_group(
+        GroupName="b3d-test", Description="b3d test",
+        TagSpecifications=[{"ResourceType": "security-group", "Tags": [TAG]}]
+    )["GroupId"]
+    instance_id = ec2.run_instances(
+        ImageId=ec2.describe_images()["Images"][0]["ImageId"], MinCount=1, MaxCount=1,
+        SecurityGroupIds=[group_id], TagSpecifications=[{"ResourceType": "instance", "Tags": [TAG]}]
+    )["Instances"][0]["InstanceId"]
+    return group_id, instance_id
+
+
+def create_bucket(engine, name, keys, versioned=False):
+    """
+    Create a tagged S3 bucket holding an object for each key
+    """
+
+    s3 = engine.client("s3", config.AWS_REGION)
+    s3.create_bucket(Bucket=name)
+    s3.put_bucket_tagging(Bucket=name, Tagging={"TagSet": [TAG]})
+    if versioned:
+        s3.put_bucket_versioning(Bucket=name, VersioningConfiguration={"Status": "Enabled"})
+    for key in keys:
+        s3.put_object(Bucket=name, Key=key, Body=b"")
+
+
+def delete(engine, **kwargs):
+    """
+    Use b3d to delete all resources with TAG
+    """
+    return list(b3d_.delete_resources(TAG["Key"], TAG["Value"], config.AWS_REGION, dry=False, engine=engine, **kwargs))
+
+
+def delete_async(engine, **kwargs):
+    """
+    Use b3d's asyncio API to delete all resources with TAG
+    """
+
+    async def _collect():
+        return [
+            resp async for resp in delete_resources_async(
+                TAG["Key"], TAG["Value"], config.AWS_REGION, dry=False, engine=engine, **kwargs
+            )
+        ]
+
+    return asyncio.run(_collect())
+
+
+@pytest.fixture(
+    params=[
+        {},
+        {"max_workers": 4},
+        {"max_workers": 4, "ordered": True},
+        {"stream": True},
+        {"plan": True}
+    ]
+)
+def delete_kwargs(request):
+    """
+    Return the keyword arguments that delete_resources is called with
+    """
+    return request.param
+
+
+def test_delete_resources(mocked_aws, delete_kwargs):
+    create_parameters(mocked_aws, [f"p{i}" for i in range(12)])
+    create_instance(mocked_aws)
+
+    utils.evaluate(delete(mocked_aws, **delete_kwargs), 14)
+    assert delete(mocked_aws, **delete_kwargs) == []
+
+
+def test_delete_resources_ordered(mocked_aws):
+    create_parameters(mocked_aws, ["p0", "p1"])
+    create_instance(mocked_aws)
+    create_parameters(mocked_aws, ["p2"])
+    discovered, _ = b3d_.get_all_resources_with_tag(
+        TAG["Key"], TAG["Value"], config.AWS_REGION, engine=mocked_aws
+    )
+
+    resps = delete(mocked_aws, max_workers=4, ordered=True)
+
+    utils.evaluate(resps, len(discovered))
+    for arn, resp in zip(discovered, resps):
+        assert arn.resource_id in resp[-1]["msg"]
+
+
+def test_delete_resources_plan(mocked_aws):
+    group_id, instance_id = create_instance(mocked_aws)
+
+    resps = delete(mocked_aws, plan=True)
+
+    utils.evaluate(resps, 2)
+    # The instance uses the security group, so it is deleted first
+    assert instance_id in resps[0][-1]["msg"]
+    assert group_id in resps[1][-1]["msg"]
+
+
+def test_delete_resources_matching(mocked_aws):
+    create_parameters(mocked_aws, ["p0"], {"Key": "Name", "Value": "B3DTEST_a"})
+    create_parameters(mocked_aws, ["p1"], {"Key": "Name", "Value": "B3DTEST_b"})
+    create_parameters(mocked_aws, ["kept"], {"Key": "Name", "Value": "OTHER"})
+    mocked_aws.client("iam", config.AWS_REGION).create_user(
+        UserName="u", Tags=[{"Key": "Name", "Value": "B3DTEST_c"}]
+    )
+
+    resps = list(b3d_.delete_resources_matching(
+        "Name", "B3DTEST_*", config.AWS_REGION, dry=False, engine=mocked_aws
+    ))
+
+    utils.evaluate(resps, 3)
+    assert mocked_aws.client("ssm", config.AWS_REGION).get_parameter(Name="kept")["Parameter"]["Name"] == "kept"
+
+
+def test_delete_resources_matching_failed_listing(mocked_aws, monkeypatch):
+    def _fail(*args, **kwargs):
+        raise RuntimeError("no tag values")
+
+    create_parameters(mocked_aws, ["p0"], {"Key": "Name", "Value": "B3DTEST_a"})
+    mocked_aws.client("iam", config.AWS_REGION).create_user(
+        UserName="u", Tags=[{"Key": "Name", "Value": "B3DTEST_c"}]
+    )
+    monkeypatch.setattr(aws.resource_groups_tagging, "get_tag_values", _fail)
+
+    resps = list(b3d_.delete_resources_matching(
+        "Name", "B3DTEST_*", config.AWS_REGION, dry=False, engine=mocked_aws
+    ))
+
+    # The failed listing is reported first, and values from the IAM tag index are still swept
+    assert resps[0][0]["result"] == "failure" and "resourcegroupstaggingapi" in resps[0][0]["msg"]
+    utils.evaluate(resps[1:], 1)
+    assert resps[1][0]["tag"]["Value"] == "B3DTEST_c"
+
+
+def test_delete_resources_multi_region(mocked_aws):
+    create_parameters(mocked_aws, ["p0"])
+    create_parameters(mocked_aws, ["p1"], region="us-west-2")
+    mocked_aws.client("iam", config.AWS_REGION).create_user(UserName="u", Tags=[TAG])
+
+    resps = list(b3d_.delete_resources_multi_region(
+        TAG["Key"], TAG["Value"], ["us-east-1", "us-west-2"], dry=False, engine=mocked_aws
+    ))
+
+    utils.evaluate(resps, 3)
+    assert sorted(r[0]["region"] for r in resps) == ["global", "us-east-1", "us-west-2"]
+
+
+def test_delete_resources_multi_region_failed_listing(mocked_aws, monkeypatch):
+    def _fail(cl):
+        raise RuntimeError("no regions")
+
+    monkeypatch.setattr(b3d_.aws.ec2, "get_enabled_regions", _fail)
+    mocked_aws.client("iam", config.AWS_REGION).create_user(UserName="u", Tags=[TAG])
+
+    resps = list(b3d_.delete_resources_multi_region(TAG["Key"], TAG["Value"], dry=False, engine=mocked_aws))
+
+    # The failure is reported first, and global resources are still deleted
+    assert resps[0][0]["result"] == "failure"
+    utils.evaluate(resps[1:], 1)
+
+
+def test_delete_resources_batch(mocked_aws):
+    other = {"Key": "Name", "Value": "B3DTEST_other"}
+    create_parameters(mocked_aws, ["p0", "p1"])
+    create_parameters(mocked_aws, ["q0"], other)
+
+    resps = list(b3d_.delete_resources_batch(
+        [TAG["Value"], (other["Key"], other["Value"])], config.AWS_REGION, dry=False, tag_key=TAG["Key"],
+        engine=mocked_aws
+    ))
+
+    utils.evaluate(resps, 3)
+    assert sorted(r[0]["tag"]["Value"] for r in resps) == [TAG["Value"], TAG["Value"], other["Value"]]
+
+
+def test_delete_resources_stream(mocked_aws, monkeypatch):
+    create_parameters(mocked_aws, ["p0", "p1", "p2"])
+    mocked_aws.client("iam", config.AWS_REGION).create_user(UserName="u", Tags=[TAG])
+    deleted = threading.Event()
+    deleted_before_listing_finished = []
+
+    def _deleting(fn):
+        def _call(*args, **kwargs):
+            deleted.set()
+            return fn(*args, **kwargs)
+        return _call
+
+    def _blocked_after_first(iter_resources):
+        def _iter(*args, **kwargs):
+            for i, resource in enumerate(iter_resources(*args, **kwargs)):
+                if i == 1:
+                    # The rest of the listing waits until something has been deleted
+                    deleted_before_listing_finished.append(deleted.wait(5))
+                yield resource
+        return _iter
+
+    monkeypatch.setattr(aws.ssm, "delete_parameters", _deleting(aws.ssm.delete_parameters))
+    monkeypatch.setattr(aws.iam, "delete_user", _deleting(aws.iam.delete_user))
+    monkeypatch.setattr(
+        aws.resource_groups_tagging, "iter_resources_by_tag_values",
+        _blocked_after_first(aws.resource_groups_tagging.iter_resources_by_tag_values)
+    )
+
+    utils.evaluate(delete(mocked_aws, stream=True), 4)
+    assert deleted_before_listing_finished == [True]
+    assert delete(mocked_aws, stream=True) == []
+
+
+def test_delete_resources_stream_failed_source(mocked_aws, monkeypatch):
+    def _fail(*args, **kwargs):
+        raise RuntimeError("iam unavailable")
+
+    create_parameters(mocked_aws, ["p0", "p1"])
+    monkeypatch.setattr(aws.iam, "get_all_arns_with_tags", _fail)
+
+    resps = delete(mocked_aws, stream=True)
+
+    # The failed source is reported, and what the other source found is still deleted
+    failures = [r for r in resps if r[0]["result"] == "failure"]
+    assert len(failures) == 1 and "iam unavailable" in str(failures[0][0]["err"])
+    utils.evaluate([r for r in resps if r not in failures], 2)
+
+
+def test_record_resources(mocked_aws):
+    create_parameters(mocked_aws, ["p0", "p1"])
+    group_id, instance_id = create_instance(mocked_aws)
+
+    with Inventory() as inventory:
+        failures = b3d_.record_resources(TAG["Key"], TAG["Value"], inventory, config.AWS_REGION, engine=mocked_aws)
+
+        assert failures == []
+        assert inventory.count(tag_key=TAG["Key"], tag_value=TAG["Value"]) == 4
+        assert inventory.count(service="ec2") == 2
+        assert [(e[0].split("/")[-1], e[1].split("/")[-1], e[2]) for e in inventory.edges(relation="uses")] == \
+            [(instance_id, group_id, "uses")]
+
+        utils.evaluate(delete(mocked_aws, inventory=inventory, plan=True), 4)
+        assert inventory.count() == 0
+        assert inventory.count(include_deleted=True) == 4
+
+
+def test_delete_from_inventory_marks_empty_reports(mocked_aws):
+    kms = mocked_aws.client("kms", config.AWS_REGION)
+    key_id = kms.create_key(Tags=[{"TagKey": TAG["Key"], "TagValue": TAG["Value"]}])["KeyMetadata"]["KeyId"]
+
+    with Inventory() as inventory:
+        b3d_.record_resources(TAG["Key"], TAG["Value"], inventory, config.AWS_REGION, engine=mocked_aws)
+        assert inventory.count() == 1
+
+        # A key that is already scheduled for deletion has nothing left to delete, so its report is empty
+        kms.schedule_key_deletion(KeyId=key_id)
+        assert delete(mocked_aws, inventory=inventory) == []
+        assert inventory.count() == 0
+
+
+def test_delete_resources_async(mocked_aws):
+    create_parameters(mocked_aws, [f"p{i}" for i in range(5)])
+    create_instance(mocked_aws)
+
+    utils.evaluate(delete_async(mocked_aws, max_concurrency=4), 7)
+    assert delete_async(mocked_aws, max_concurrency=4) == []
+
+
+def test_delete_resources_async_max_concurrency(mocked_aws, monkeypatch):
+    create_parameters(mocked_aws, [f"p{i}" for i in range(6)])
+    running, most_running = [0], [0]
+    lock = threading.Lock()
+    destroy_many = SSM.Parameter.destroy_many
+
+    def _counted_destroy_many(*args, **kwargs):
+        with lock:
+            running[0] += 1
+            most_running[0] = max(most_running[0], running[0])
+        time.sleep(0.05)
+        try:
+            return list(destroy_many(*args, **kwargs))
+        finally:
+            with lock:
+                running[0] -= 1
+
+    # One parameter per group, so that each of them is destroyed by its own destroy_many
+    monkeypatch.setattr(SSM.Parameter, "batch_size", staticmethod(lambda: 1))
+    monkeypatch.setattr(SSM.Parameter, "destroy_many", _counted_destroy_many)
+
+    utils.evaluate(delete_async(mocked_aws, max_concurrency=2), 6)
+    assert most_running[0] == 2
+
+
+def test_delete_resources_async_timeout(mocked_aws, monkeypatch):
+    create_parameters(mocked_aws, ["p0", "p1"])
+    destroy_many = SSM.Parameter.destroy_many
+
+    def _slow_destroy_many(*args, **kwargs):
+        time.sleep(0.5)
+        return destroy_many(*args, **kwargs)
+
+    monkeypatch.setattr(SSM.Parameter, "destroy_many", _slow_destroy_many)
+
+    resps = delete_async(mocked_aws, timeout=0.1)
+
+    assert len(resps) == 2
+    for resp in resps:
+        assert resp[-1]["result"] == "failure" and resp[-1]["err"]["Code"] == "Timeout"
+        assert "Timed out after 0.1 seconds" in resp[-1]["msg"]
+
+
+def test_delete_resources_async_instance_timeout(mocked_aws, monkeypatch):
+    _, instance_id = create_instance(mocked_aws)
+    # The instance never finishes shutting down
+    monkeypatch.setattr(aws.ec2, "terminated_instance_ids", lambda cl, ids: [])
+
+    resps = delete_async(mocked_aws, timeout=0.2, resource_types=["ec2:instance"])
+
+    assert len(resps) == 1 and instance_id in resps[0][-1]["msg"]
+    assert resps[0][-1]["err"]["Code"] == "InstanceNotTerminated"
+    # The time waited is the timeout (rounded), not the longest wait of the synchronous waiter
+    assert "after 0 seconds" in resps[0][-1]["err"]["Message"]
+
+
+@pytest.mark.parametrize("s3_options", [None, S3Options(prefix_delimiter="/")])
+def test_delete_buckets(mocked_aws, monkeypatch, s3_options):
+    # Small pages, so that the keys span several listings and delete_objects calls
+    monkeypatch.setattr(aws.s3, "DELETE_OBJECTS_MAX_KEYS", 3)
+    create_bucket(mocked_aws, "b3d-test-plain", [f"a/{i}" for i in range(5)] + ["b/0", "b/1", "c", "d/e/f"])
+    create_bucket(mocked_aws, "b3d-test-empty", [])
+
+    resps = delete(mocked_aws, s3_options=s3_options)
+
+    utils.evaluate(resps, 2)
+    # An empty bucket has nothing to purge, so only its delete is reported
+    assert [[msg.get("count") for msg in r] for r in sorted(resps, key=len)] == [[None], [9, None]]
+    assert mocked_aws.client("s3", config.AWS_REGION).list_buckets()["Buckets"] == []
+
+
+def test_delete_versioned_bucket(mocked_aws, monkeypatch):
+    # Pages of two versions, purged two pages at a time, so that the versions of a key span pages and
+    # the purge takes several rounds
+    monkeypatch.setattr(aws.s3, "DELETE_OBJECTS_MAX_KEYS", 2)
+    monkeypatch.setattr(delete_s3, "PURGE_ROUND_PAGES", 2)
+    create_bucket(mocked_aws, "b3d-test-versioned", ["k0", "k0", "k0", "k1", "k1", "k2"], versioned=True)
+    mocked_aws.client("s3", config.AWS_REGION).delete_object(Bucket="b3d-test-versioned", Key="k2")
+    listed = []
+    mocked_aws.client("s3", config.AWS_REGION).meta.events.register(
+        "before-parameter-build.s3.ListObjectVersions", lambda params, **kwargs: listed.append(dict(params))
+    )
+
+    resps = delete(mocked_aws)
+
+    utils.evaluate(resps, 1)
+    # Six versions and one delete marker
+    assert resps[0][0]["count"] == 7
+    assert any("VersionIdMarker" in params for params in listed)
+    assert mocked_aws.client("s3", config.AWS_REGION).list_buckets()["Buckets"] == []
+
+
+@pytest.mark.parametrize("bypass_governance_retention", [False, True])
+def test_delete_bucket_governance_retention(mocked_aws, monkeypatch, bypass_governance_retention):
+    # The bucket delete fails while the locked version is left, so don't wait on it
+    monkeypatch.setattr(aws.retry, "DEFAULT_RETRY_POLICY", RetryPolicy(max_elapsed=0))
+    cl = mocked_aws.client("s3", config.AWS_REGION)
+    cl.create_bucket(Bucket="b3d-test-locked", ObjectLockEnabledForBucket=True)
+    cl.put_bucket_tagging(Bucket="b3d-test-locked", Tagging={"TagSet": [TAG]})
+    cl.put_object(
+        Bucket="b3d-test-locked", Key="k", Body=b"", ObjectLockMode="GOVERNANCE",
+        ObjectLockRetainUntilDate=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)
+    )
+
+    resps = delete(mocked_aws, s3_options=S3Options(bypass_governance_retention=bypass_governance_retention))
+
+    assert len(resps) == 1
+    if bypass_governance_retention:
+        utils.evaluate(resps, 1)
+        assert cl.list_buckets()["Buckets"] == []
+    else:
+        assert [(msg["result"], msg.get("failed")) for msg in resps[0]] == [("failure", 1), ("failure", None)]
+        assert len(cl.list_object_versions(Bucket="b3d-test-locked")["Versions"]) == 1
+
+
+class PagedUploads:
+    """
+    Stand-in for an S3 client that pages list_multipart_uploads by MaxUploads and the (KeyMarker,
+    UploadIdMarker) pair as S3 does, which moto doesn't, and passes every other call through to <cl>
+    """
+
+    def __init__(self, cl):
+        self.cl = cl
+        self.listed = []
+
+    def __getattr__(self, name):
+        return getattr(self.cl, name)
+
+    def list_multipart_uploads(self, Bucket, MaxUploads=1000, KeyMarker=None, UploadIdMarker=None):
+        self.listed.append((KeyMarker, UploadIdMarker))
+        resp = self.cl.list_multipart_uploads(Bucket=Bucket)
+        uploads = sorted(resp.get("Uploads", []), key=lambda upload: (upload["Key"], upload["UploadId"]))
+        if KeyMarker is not None:
+            uploads = [u for u in uploads if (u["Key"], u["UploadId"]) > (KeyMarker, UploadIdMarker)]
+        resp["Uploads"], resp["IsTruncated"] = uploads[:MaxUploads], len(uploads) > MaxUploads
+        if resp["IsTruncated"]:
+            resp["NextKeyMarker"], resp["NextUploadIdMarker"] = uploads[MaxUploads - 1]["Key"], \
+                uploads[MaxUploads - 1]["UploadId"]
+        return resp
+
+
+def test_delete_bucket_multipart_uploads(mocked_aws, monkeypatch):
+    # Pages of two uploads, aborted two pages at a time, so that the uploads of a key span pages and
+    # the purge takes several rounds
+    monkeypatch.setattr(aws.s3, "DELETE_OBJECTS_MAX_KEYS", 2)
+    monkeypatch.setattr(delete_s3, "PURGE_ROUND_PAGES", 2)
+    create_bucket(mocked_aws, "b3d-test-uploads", ["k0"])
+    cl = PagedUploads(mocked_aws.client("s3", config.AWS_REGION))
+    for key in ["a", "a", "a", "b", "c", "c", "d"]:
+        cl.create_multipart_upload(Bucket="b3d-test-uploads", Key=key)
+
+    with Engine(mocked_aws.session, clients={"s3": cl}) as engine:
+        resps = delete(engine)
+
+    utils.evaluate(resps, 1)
+    assert [msg.get("count") for msg in resps[0]] == [7, 1, None]
+    assert "multipart uploads" in resps[0][0]["msg"]
+    # Rounds list from the start of the bucket again, and page within a round from the upload marker
+    assert (None, None) in cl.listed and any(upload_id is not None for _, upload_id in cl.listed)
+    assert mocked_aws.client("s3", config.AWS_REGION).list_buckets()["Buckets"] == []
+
+
+def test_delete_buckets_lifecycle_teardown(mocked_aws):
+    create_bucket(mocked_aws, "b3d-test-full", ["k"])
+    create_bucket(mocked_aws, "b3d-test-empty", [])
+    options = S3Options(lifecycle_teardown=True)
+
+    resps = delete(mocked_aws, s3_options=options)
+
+    assert sorted(r[0]["result"] for r in resps) == ["scheduled", "success"]
+    rules = mocked_aws.client("s3", config.AWS_REGION).get_bucket_lifecycle_configuration(Bucket="b3d-test-full")
+    assert delete_s3.LIFECYCLE_RULE_ID in [rule["ID"] for rule in rules["Rules"]]
+    # A bucket that is already expiring its contents is left alone
+    assert delete(mocked_aws, s3_options=options)[0][0]["result"] == "scheduled"
+
+    mocked_aws.client("s3", config.AWS_REGION).delete_object(Bucket="b3d-test-full", Key="k")
+    utils.evaluate(delete(mocked_aws, s3_options=options), 1)
@@ -0,0 +1,110 @@
+"""
+Tests for discovering tagged IAM entities from a single GetAccountAuthorizationDetails snapshot,
+checked against the per-entity get_* calls that discovery used to make for each of them
+"""
+import json
+import pytest
+from b3d import aws
+import tests.config as config
+
+
+TAG = ("Name", "B3DTEST_iam")
+OTHER_TAG = ("Name", "B3DTEST_other")
+POLICY_DOCUMENT = json.dumps({
+    "Version": "2012-10-17", "Statement": [{"Effect": "Allow", "Action": "s3:ListBucket", "Resource": "*"}]
+})
+
+
+def tags(*pairs):
+    """
+    Build a list of tags from (key, value) pairs
+    """
+    return [{"Key": key, "Value": value} for key, value in pairs]
+
+
+def per_entity_arns(iam, tag_pairs):
+    """
+    Find the users, roles and customer managed policies with any of some tag pairs the way discovery
+    used to: list each kind of entity, then get each entity to read its tags
+    """
+
+    def _tagged(entity):
+        return any((t["Key"], t["Value"]) in set(tag_pairs) for t in entity.get("Tags", []))
+
+    return {
+        "user": [u["Arn"] for u in iam.list_users()["Users"] if _tagged(iam.get_user(UserName=u["UserName"])["User"])],
+        "role": [r["Arn"] for r in iam.list_roles()["Roles"] if _tagged(iam.get_role(RoleName=r["RoleName"])["Role"])],
+        "policy": [
+            p["Arn"] for p in iam.list_policies(Scope="Local")["Policies"]
+            if _tagged(iam.get_policy(PolicyArn=p["Arn"])["Policy"])
+        ]
+    }
+
+
+@pytest.fixture
+def iam(mocked_aws):
+    """
+    Return an IAM client, with users, roles and policies that have TAG, OTHER_TAG, both or neither
+    """
+
+    cl = mocked_aws.client("iam", config.AWS_REGION)
+    for i, entity_tags in enumerate([tags(TAG), tags(OTHER_TAG), tags(TAG, ("team", "x")), []]):
+        cl.create_user(UserName=f"user{i}", Path="/b3d/", Tags=entity_tags)
+        cl.create_role(RoleName=f"role{i}", AssumeRolePolicyDocument="{}", Tags=entity_tags)
+        cl.create_policy(PolicyName=f"policy{i}", PolicyDocument=POLICY_DOCUMENT, Tags=entity_tags)
+    return cl
+
+
+def test_index_matches_per_entity_calls(iam):
+    index = aws.iam.build_tag_index(iam)
+
+    # The order of the entities of a kind is up to the listing, so they are compared as sets
+    for tag_pairs in [[TAG], [OTHER_TAG], [TAG, OTHER_TAG], [("team", "x")], [("Name", "missing")]]:
+        expected = per_entity_arns(iam, tag_pairs)
+        assert set(aws.iam.get_all_user_arns_with_tags(iam, tag_pairs)) == set(expected["user"])
+        assert set(aws.iam.get_all_role_arns_with_tags(iam, tag_pairs)) == set(expected["role"])
+        assert set(aws.iam.get_all_policy_arns_with_tags(iam, tag_pairs)) == set(expected["policy"])
+        assert sorted(aws.iam.get_all_arns_with_tags(iam, tag_pairs, index=index)) == \
+            sorted(expected["user"] + expected["role"] + expected["policy"])
+
+
+def test_index_keys_and_tags(iam):
+    index = aws.iam.build_tag_index(iam)
+
+    assert sorted(index) == ["policy", "role", "user"]
+    assert len(index["user"]) == len(index["role"]) == len(index["policy"]) == 4
+    assert index["user"]["arn:aws:iam::123456789012:user/b3d/user2"] == tags(TAG, ("team", "x"))
+    assert aws.iam.tag_values(index, "Name") == [TAG[1], OTHER_TAG[1]]
+
+
+def test_policy_tags_fall_back_to_list_policy_tags(iam, monkeypatch):
+    listed = []
+
+    def _list_policy_tags(cl, policy_arn):
+        listed.append(policy_arn)
+        return iam.list_policy_tags(PolicyArn=policy_arn)["Tags"]
+
+    monkeypatch.setattr(aws.iam, "list_policy_tags", _list_policy_tags)
+    index = aws.iam.build_tag_index(iam)
+
+    # ManagedPolicyDetail entries carry no tags, so every policy's tags are listed on their own
+    assert sorted(listed) == sorted(index["policy"])
+    assert sorted(aws.iam.arns_with_tags(index["policy"], [TAG])) == sorted(per_entity_arns(iam, [TAG])["policy"])
+
+
+def test_policy_tags_from_snapshot(iam, monkeypatch):
+    details = aws.iam.get_account_authorization_details(iam, ["LocalManagedPolicy"])
+    for policy in details["Policies"]:
+        policy["Tags"] = tags(TAG)
+
+    monkeypatch.setattr(aws.iam, "get_account_authorization_details", lambda cl, entity_types: details)
+    monkeypatch.setattr(aws.iam, "list_policy_tags", lambda cl, policy_arn: pytest.fail("listed policy tags"))
+
+    assert len(aws.iam.get_all_policy_arns_with_tags(iam, [TAG])) == 4
+
+
+def test_entities_with_tags(iam):
+    entities = aws.iam.get_all_entities_with_tags(iam, [OTHER_TAG])
+
+    assert [e["Arn"].split(":")[-1] for e in entities] == ["user/b3d/user1", "role/role1", "policy/policy1"]
+    assert all(e["Tags"] == tags(OTHER_TAG) for e in entities)
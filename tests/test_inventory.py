@@ -0,0 +1,92 @@
+"""
+Tests for querying the SQLite inventory of discovered resources
+"""
+import pytest
+from b3d import Inventory
+from b3d.utils.arn import parse
+
+
+def row(arn: str, tags: dict, source: str = "resourcegroupstaggingapi") -> dict:
+    """
+    Build an inventory row for some ARN, in the form written by record_resources
+    """
+
+    parsed = parse(arn)
+    return {
+        "arn": arn, "partition": parsed.partition, "service": parsed.service, "region": parsed.region,
+        "account": parsed.account, "resource_type": parsed.resource_type, "resource_id": parsed.resource_id,
+        "source": source, "tags": [{"Key": key, "Value": value} for key, value in tags.items()]
+    }
+
+
+INSTANCE = "arn:aws:ec2:us-east-1:123456789012:instance/i-1"
+SECURITY_GROUP = "arn:aws:ec2:us-east-1:123456789012:security-group/sg-1"
+PARAMETER = "arn:aws:ssm:us-west-2:123456789012:parameter/p"
+ROLE = "arn:aws:iam::123456789012:role/r"
+
+
+@pytest.fixture
+def inventory():
+    """
+    Return an in-memory inventory holding a few resources in two regions, plus a global role
+    """
+
+    with Inventory() as inv:
+        inv.add_resources([
+            row(INSTANCE, {"Name": "a", "team": "x"}),
+            row(SECURITY_GROUP, {"Name": "a"}),
+            row(PARAMETER, {"Name": "b"}),
+            row(ROLE, {"Name": "a"}, "iam")
+        ])
+        yield inv
+
+
+def test_query_by_tag(inventory):
+    assert list(inventory.arns(tag_key="Name", tag_value="a")) == [INSTANCE, SECURITY_GROUP, ROLE]
+    assert list(inventory.arns(tag_key="team")) == [INSTANCE]
+    assert inventory.count(tag_key="Name") == 4
+
+
+def test_query_by_region_includes_global(inventory):
+    assert list(inventory.arns(region="us-west-2")) == [PARAMETER, ROLE]
+    assert inventory.count(region="us-east-1") == 3
+
+
+def test_query_by_type(inventory):
+    assert list(inventory.arns(service="ec2")) == [INSTANCE, SECURITY_GROUP]
+    assert list(inventory.arns(service="ec2", resource_type="instance")) == [INSTANCE]
+
+
+def test_mark_deleted(inventory):
+    inventory.mark_deleted([INSTANCE])
+
+    assert INSTANCE not in inventory.arns()
+    assert inventory.count() == 3
+    assert inventory.count(include_deleted=True) == 4
+
+    # Rediscovering a resource clears its deletion and replaces its tags
+    inventory.add_resources([row(INSTANCE, {"Name": "c"})])
+    assert list(inventory.arns(tag_key="Name", tag_value="c")) == [INSTANCE]
+    assert list(inventory.arns(tag_key="team")) == []
+
+
+def test_edges(inventory):
+    written = inventory.add_edges([
+        (INSTANCE, SECURITY_GROUP, "uses"),
+        (INSTANCE, SECURITY_GROUP, "uses"),
+        (PARAMETER, ROLE, "attached-to")
+    ])
+
+    assert written == 3
+    assert inventory.edges(INSTANCE) == [(INSTANCE, SECURITY_GROUP, "uses")]
+    assert inventory.edges(relation="attached-to") == [(PARAMETER, ROLE, "attached-to")]
+    assert len(inventory.edges()) == 2
+
+
+def test_paged_reads(monkeypatch):
+    monkeypatch.setattr("b3d.inventory.BATCH_SIZE", 3)
+    arns = [f"arn:aws:ssm:us-east-1:123456789012:parameter/p{i}" for i in range(10)]
+
+    with Inventory() as inv:
+        inv.add_resources(row(arn, {"Name": "a"}) for arn in arns)
+        assert list(inv.arns(tag_key="Name", tag_value="a")) == arns
@@ -0,0 +1,59 @@
+"""
+Tests for splitting resources into delete levels from the dependency edges between them
+"""
+from b3d.planner import delete_levels
+from b3d.utils.arn import parse
+
+
+PREFIX = "arn:aws:ec2:us-east-1:123456789012"
+INSTANCE = parse(f"{PREFIX}:instance/i-1")
+SECURITY_GROUP = parse(f"{PREFIX}:security-group/sg-1")
+VOLUME = parse(f"{PREFIX}:volume/vol-1")
+REST_API = parse("arn:aws:apigateway:us-east-1::/restapis/a1")
+STAGE = parse("arn:aws:apigateway:us-east-1::/restapis/a1/stages/prod")
+USAGE_PLAN = parse("arn:aws:apigateway:us-east-1::/usageplans/u1")
+
+
+def test_no_edges_single_level():
+    assert delete_levels([SECURITY_GROUP, INSTANCE, VOLUME], []) == [[SECURITY_GROUP, INSTANCE, VOLUME]]
+
+
+def test_uses_deletes_source_first():
+    edges = [(str(INSTANCE), str(SECURITY_GROUP), "uses")]
+    assert delete_levels([SECURITY_GROUP, INSTANCE], edges) == [[INSTANCE], [SECURITY_GROUP]]
+
+
+def test_attached_to_deletes_target_first():
+    edges = [(str(VOLUME), str(INSTANCE), "attached-to")]
+    assert delete_levels([VOLUME, INSTANCE], edges) == [[INSTANCE], [VOLUME]]
+
+
+def test_chain_and_discovery_order_within_level():
+    edges = [
+        (str(USAGE_PLAN), str(STAGE), "uses"),
+        (str(USAGE_PLAN), str(REST_API), "uses"),
+        (str(STAGE), str(REST_API), "part-of"),
+        (str(INSTANCE), str(SECURITY_GROUP), "uses")
+    ]
+    levels = delete_levels([REST_API, SECURITY_GROUP, STAGE, INSTANCE, USAGE_PLAN], edges)
+    assert levels == [[INSTANCE, USAGE_PLAN], [SECURITY_GROUP, STAGE], [REST_API]]
+
+
+def test_edges_outside_resources_and_duplicates_ignored():
+    edges = [
+        (str(INSTANCE), str(SECURITY_GROUP), "uses"),
+        (str(INSTANCE), str(SECURITY_GROUP), "uses"),
+        (str(INSTANCE), f"{PREFIX}:security-group/sg-missing", "uses"),
+        (str(INSTANCE), str(INSTANCE), "uses")
+    ]
+    assert delete_levels([SECURITY_GROUP, INSTANCE], edges) == [[INSTANCE], [SECURITY_GROUP]]
+
+
+def test_cycle_put_into_final_level():
+    edges = [
+        (str(INSTANCE), str(SECURITY_GROUP), "uses"),
+        (str(SECURITY_GROUP), str(INSTANCE), "uses")
+    ]
+    levels = delete_levels([VOLUME, SECURITY_GROUP, INSTANCE], edges)
+    assert levels == [[VOLUME], [SECURITY_GROUP, INSTANCE]]
+    assert sum(len(level) for level in levels) == 3
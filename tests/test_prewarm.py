@@ -0,0 +1,49 @@
+"""
+Tests for loading what destroying resources needs on a background thread
+"""
+import threading
+import boto3
+import botocore.exceptions
+import botocore.loaders
+from b3d import aws, b3d_
+from b3d.engine import Engine
+
+
+def test_prewarm_loads_in_background(monkeypatch):
+    release = threading.Event()
+    loaded = []
+
+    def _load_service_models(services, session):
+        release.wait(5)
+        loaded.extend(services)
+
+    monkeypatch.setattr(aws.helpers, "load_service_models", _load_service_models)
+
+    thread = b3d_.prewarm(["ssm", "ec2:instance"], engine=Engine(session=boto3.Session()))
+
+    # The caller gets the thread back while the models are still loading
+    assert thread.daemon and thread.is_alive()
+    release.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert sorted(loaded) == ["ec2", "ssm"]
+
+
+def test_prewarm_missing_data(monkeypatch):
+    def _missing(self, name, *args, **kwargs):
+        raise botocore.exceptions.DataNotFoundError(data_path=name)
+
+    errors = []
+    monkeypatch.setattr(threading, "excepthook", errors.append)
+    monkeypatch.setattr(botocore.loaders.Loader, "load_service_model", _missing)
+
+    thread = b3d_.prewarm(["ssm"], engine=Engine(session=boto3.Session()))
+    thread.join(5)
+
+    # Loading the data that every service needs fails as well
+    monkeypatch.setattr(botocore.loaders.Loader, "load_data", _missing)
+    other_thread = b3d_.prewarm(["ssm"], engine=Engine(session=boto3.Session()))
+    other_thread.join(5)
+
+    assert not thread.is_alive() and not other_thread.is_alive()
+    assert errors == []
@@ -0,0 +1,85 @@
+"""
+Tests for the token bucket and adaptive concurrency limit behind client-side rate limiting
+"""
+import threading
+import time
+from b3d.aws.rate_limit import AimdController, Limit, RateLimiter, TokenBucket, operation_class
+
+
+def test_token_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=50.0, burst=3)
+
+    # The initial burst is taken without waiting
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.tokens < 1
+
+    # Once empty, each token takes about 1 / rate seconds to refill
+    start = time.monotonic()
+    waited = bucket.acquire()
+    assert waited > 0
+    assert time.monotonic() - start >= 0.01
+
+
+def test_token_bucket_refill_capped_at_burst():
+    bucket = TokenBucket(rate=1000.0, burst=2)
+    bucket.acquire()
+    time.sleep(0.01)
+    assert bucket.tokens == 2
+
+
+def test_aimd_increase_and_decrease():
+    controller = AimdController(initial=4, minimum=1, maximum=6)
+
+    for _ in range(4):
+        controller.acquire()
+        controller.release(throttled=False)
+    # Four successes at a limit of about 4 raise it by about one
+    assert 4.8 < controller.limit < 5.0
+
+    controller.acquire()
+    controller.release(throttled=True)
+    assert 2.4 < controller.limit < 2.5
+
+    for _ in range(3):
+        controller.acquire()
+        controller.release(throttled=True)
+    assert controller.limit == 1
+
+    for _ in range(200):
+        controller.acquire()
+        controller.release(throttled=False)
+    assert controller.limit == 6
+
+
+def test_aimd_bounds_in_flight():
+    controller = AimdController(initial=2, minimum=1, maximum=2)
+    controller.acquire()
+    controller.acquire()
+    acquired = threading.Event()
+
+    def _third():
+        controller.acquire()
+        acquired.set()
+
+    threading.Thread(target=_third, daemon=True).start()
+    assert not acquired.wait(0.05)
+
+    controller.release(throttled=False)
+    assert acquired.wait(1)
+    assert controller.in_flight == 2
+
+
+def test_rate_limiter_keys_and_metrics():
+    limiter = RateLimiter(limits={("iam", "write"): Limit(rate=100.0, burst=5)})
+
+    assert operation_class("DescribeInstances") == "read"
+    assert operation_class("DeleteUser") == "write"
+
+    key = limiter.acquire("iam", "DeleteUser")
+    assert key == ("iam", "write")
+    limiter.release(key, "Throttling")
+    limiter.release(limiter.acquire("iam", "DeleteRole"), None)
+
+    metrics = limiter.metrics()["iam:write"]
+    assert metrics["calls"] == 2
+    assert metrics["throttled"] == 1
@@ -0,0 +1,61 @@
+"""
+Tests for the lazily-resolved registry of delete procedures
+"""
+import sys
+import pytest
+from b3d.delete import Service
+from b3d.utils.registry import MANIFEST, DeleteRegistry
+
+
+class Queue(Service.Resource):
+    """
+    Delete procedure registered by the tests below
+    """
+
+    @staticmethod
+    def resource_type() -> str:
+        return "queue"
+
+
+def test_manifest_listed_without_imports():
+    assert set(DeleteRegistry(entry_points=False)) == set(MANIFEST)
+
+    # Listing never imports the module that a reference points to, only looking it up does
+    registry = DeleteRegistry(manifest={"sqs": {"queue": "b3d_tests_missing:Queue"}}, entry_points=False)
+    assert list(registry["sqs"]) == ["queue"]
+    assert len(registry["sqs"]) == 1
+    assert "b3d_tests_missing" not in sys.modules
+    with pytest.raises(ImportError):
+        registry.lookup("sqs", "queue")
+
+
+def test_lookup_imports_and_memoizes():
+    registry = DeleteRegistry(entry_points=False)
+    procedure = registry.lookup("kms", "key")
+
+    assert procedure.resource_type() == "key"
+    assert "b3d.delete.kms" in sys.modules
+    assert registry["kms"]["key"] is procedure
+
+
+def test_lookup_missing():
+    registry = DeleteRegistry(entry_points=False)
+
+    with pytest.raises(KeyError):
+        registry.lookup("sqs", "queue")
+    with pytest.raises(KeyError):
+        _ = registry["sqs"]
+    with pytest.raises(KeyError):
+        registry.lookup("ec2", "subnet")
+
+
+def test_register_class_and_reference():
+    registry = DeleteRegistry(manifest={}, entry_points=False)
+
+    registry.register("sqs", "queue", Queue)
+    assert registry.lookup("sqs", "queue") is Queue
+
+    # Registering again replaces the procedure, including one that was already looked up
+    registry.register("sqs", "queue", "b3d.delete.ssm:SSM.Parameter")
+    assert registry.lookup("sqs", "queue").resource_type() == "parameter"
+    assert list(registry) == ["sqs"]
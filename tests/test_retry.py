@@ -0,0 +1,103 @@
+"""
+Tests for classifying failed responses and the delays the retry policy gives them
+"""
+import pytest
+from b3d.aws.retry import RetryPolicy, call_with_retries
+
+
+def error_resp(code: str, status: int) -> dict:
+    """
+    Build a failed response in the form returned by make_call_catch_err
+    """
+    return {"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPStatusCode": status}}
+
+
+@pytest.fixture(
+    params=[
+        (error_resp("NoSuchEntity", 404), "permanent"),
+        (error_resp("AccessDenied", 403), "permanent"),
+        (error_resp("Throttling", 400), "throttling"),
+        (error_resp("SlowDown", 503), "throttling"),
+        (error_resp("DependencyViolation", 400), "dependency"),
+        (error_resp("DeleteConflict", 409), "dependency"),
+        (error_resp("RequestTimeout", 400), "transient"),
+        (error_resp("InternalError", 500), "transient"),
+        (error_resp("SomethingElse", 503), "transient"),
+        (error_resp("SomethingElse", 400), "permanent"),
+        ({"Error": {}, "ResponseMetadata": {}}, "transient")
+    ]
+)
+def classified_resp(request):
+    """
+    Return a failed response and the category it should be classified as
+    """
+    return request.param
+
+
+def test_classify(classified_resp):
+    resp, category = classified_resp
+    assert RetryPolicy().classify(resp) == category
+
+
+def test_delay():
+    policy = RetryPolicy(max_attempts=4, throttle_base=0.5, throttle_cap=1.0, dependency_interval=2.0)
+
+    assert policy.delay("permanent", 0) is None
+    assert policy.delay("dependency", 0) == 2.0
+    for retry in range(3):
+        assert 0 <= policy.delay("throttling", retry) <= min(1.0, 0.5 * 2 ** retry)
+        assert 0 <= policy.delay("transient", retry) <= 1.0
+    # The last attempt is never followed by a delay, except while waiting on a dependency
+    assert policy.delay("throttling", 3) is None
+    assert policy.delay("transient", 3) is None
+    assert policy.delay("dependency", 3) == 2.0
+    assert policy.delay("dependency", 100) == 2.0
+
+
+def test_call_with_retries():
+    resps = [
+        error_resp("Throttling", 400), error_resp("DependencyViolation", 400),
+        {"ResponseMetadata": {"HTTPStatusCode": 200}}
+    ]
+    slept = []
+    policy = RetryPolicy(throttle_base=0.01, dependency_interval=0.02)
+
+    resp = call_with_retries(lambda: resps.pop(0), policy, slept.append)
+
+    assert resp["ResponseMetadata"]["HTTPStatusCode"] == 200
+    assert resp["RetryStats"]["retries"] == 2
+    assert slept[1] == 0.02
+
+
+def test_call_with_retries_permanent():
+    calls = []
+
+    def _call():
+        calls.append(None)
+        return error_resp("NoSuchEntity", 404)
+
+    resp = call_with_retries(_call, RetryPolicy(), lambda delay: None)
+
+    assert len(calls) == 1
+    assert resp["RetryStats"] == {"retries": 0, "slept": 0.0}
+
+
+def test_call_with_retries_dependency_until_max_elapsed():
+    slept = []
+    policy = RetryPolicy(max_attempts=3, max_elapsed=10.0, dependency_interval=2.0)
+
+    resp = call_with_retries(lambda: error_resp("DependencyViolation", 400), policy, slept.append)
+
+    # Dependency errors are retried past max_attempts, for as long as max_elapsed allows
+    assert slept == [2.0] * 5
+    assert resp["RetryStats"] == {"retries": 5, "slept": 10.0}
+
+
+def test_call_with_retries_max_attempts():
+    slept = []
+    policy = RetryPolicy(max_attempts=3, max_elapsed=10.0, throttle_base=0.01)
+
+    resp = call_with_retries(lambda: error_resp("Throttling", 400), policy, slept.append)
+
+    assert len(slept) == 2
+    assert resp["RetryStats"]["retries"] == 2
@@ -5,8 +5,11 @@ import os
 import shutil
 import logging
 from b3d import delete_resources
+from b3d.utils.lazy import lazy_import
 import tests.config as config
-from terrorform import init, apply
+
+# Only the terraform-backed tests need terrorform, so the unit tests run without it
+terrorform = lazy_import("terrorform")
 
 
 logger = logging.getLogger("b3d.test")
@@ -43,8 +46,8 @@ def build(generate_tag, targets: list):
     """
 
     logger.info(f"using the following tag pair: {str(generate_tag)}")
-    init(kw_args=[("-chdir", config.TF_DEPLOYMENT_DIR)])
-    apply(
+    terrorform.init(kw_args=[("-chdir", config.TF_DEPLOYMENT_DIR)])
+    terrorform.apply(
         kw_args=[("-chdir", config.TF_DEPLOYMENT_DIR)] +
                 [("-target", t) for t in targets],
         vars_dict={